@@ -1,18 +1,134 @@
 import google.generativeai as genai
+import asyncio
 import sqlite3
 import os
-from datetime import datetime
+import time
+from datetime import datetime, timezone
 from typing import Dict, List, Optional
 import json
 import re
+import threading
+from collections import Counter
+from cachetools import LRUCache, TTLCache
+import numpy as np
+import orjson
+from aiolimiter import AsyncLimiter
+from google.api_core.exceptions import ResourceExhausted, ServiceUnavailable
+from tenacity import retry, retry_if_exception_type, stop_after_attempt, wait_exponential_jitter
+
+from utils.llm_cache import SemanticResponseCache
+from utils.full_text_search import build_match_query, ensure_fts_tables
+from utils.database import get_connection, get_readonly_connection, dict_row, cached_lookup, bump_knowledge_version
+from utils.models import MAX_OUTPUT_TOKENS, json_config, shared_model
+
+# Bump whenever the prompt templates change so stale cached analyses are ignored
+PROMPT_VERSION = "v3"
+
+# Patterns used by the _extract_* helpers, compiled once at import.
+# _SCORE_RE reads the factor scores out of prose when the model has no JSON mode.
+_SCORE_RE = re.compile(r'(overall|legal|factual|procedural|risk)[^\n]*?score[^\n]*?(\d+(?:\.\d+)?)', re.IGNORECASE)
+_JSON_FENCE_RE = re.compile(r'^```(?:json)?\s*|\s*```$')
+_PROBABILITY_RE = re.compile(r'(\d+(?:\.\d+)?)%')
+_TIMELINE_RE = re.compile(r'(\d+-\d+ months?|\d+ months?|\d+-\d+ years?)', re.IGNORECASE)
+_CASE_THEORY_RE = re.compile(r'primary legal theory:?\s*([^\n]+)', re.IGNORECASE)
+_BULLET_RE = re.compile(r'^[\-\*•]|^\d+\.')
+
+# Section bodies run from the header line up to the next all-caps line that is not a bullet
+_SECTION_BODY = r'[^\n]*\n((?:(?![ \t]*(?![-•\s]|\*\s)[^a-z\n]*[A-Z][^a-z\n]*$)[^\n]*(?:\n|\Z))*)'
+_DISCOVERY_SECTION_RE = re.compile(
+    r'^(?i:[^\n]*(?:discovery[^\n]*strategy|strategy[^\n]*discovery))' + _SECTION_BODY,
+    re.MULTILINE
+)
+_SETTLEMENT_SECTION_RE = re.compile(
+    r'^(?i:[^\n]*(?:settlement[^\n]*(?:strategy|consideration)|(?:strategy|consideration)[^\n]*settlement))' + _SECTION_BODY,
+    re.MULTILINE
+)
+_BULLET_LINE_RE = re.compile(r'^[ \t]*((?:[-*•]|\d+\.)[^\n]*)', re.MULTILINE)
+
+
+# Gemini's rate limiter answers spikes with 429/503s that succeed on retry
+_retry_transient = retry(
+    stop=stop_after_attempt(5),
+    wait=wait_exponential_jitter(1, 30),
+    retry=retry_if_exception_type((ResourceExhausted, ServiceUnavailable)),
+    reraise=True
+)
+
+# Shared requests-per-minute budget for concurrent async generation
+_GEMINI_LIMITER = AsyncLimiter(int(os.getenv('GEMINI_RPM', '60')), 60)
+
+# Case strength is requested as structured output: numeric scores plus the prose analysis
+SCORE_FIELDS = ('overall', 'legal', 'factual', 'procedural', 'risk')
+CASE_STRENGTH_SCHEMA = {
+    'type': 'object',
+    'properties': {
+        **{field: {'type': 'number'} for field in SCORE_FIELDS},
+        'analysis': {'type': 'string'}
+    },
+    'required': [*SCORE_FIELDS, 'analysis']
+}
+
+# Per-jurisdiction case_law embedding matrices: jurisdiction -> (signature, rows, matrix)
+_CASE_EMBEDDINGS = {}
+_CASE_EMBEDDINGS_LOCK = threading.Lock()
+
+EMBEDDING_MODEL = 'models/text-embedding-004'
+
+# Most texts the Gemini embedding endpoint accepts in one batch request
+EMBEDDING_BATCH_SIZE = 100
+
+# Cases scoring below this cosine similarity to the legal issues are not counted as similar
+CASE_SIMILARITY_FLOOR = 0.5
+
+# Jurisdictions whose embedding request just failed use keyword matching until this expires,
+# so an embedding outage does not cost every prediction a failed round trip
+EMBEDDING_RETRY_SECONDS = int(os.getenv('EMBEDDING_RETRY_SECONDS', '300'))
+_EMBEDDING_FAILURES = TTLCache(maxsize=256, ttl=EMBEDDING_RETRY_SECONDS)
+
+# Read-mostly authority lookups repeat across analyses; the TTL bounds staleness from
+# writers in other processes (e.g. init_database.py); in-process writers call bump_knowledge_version().
+_AUTHORITY_CACHE = TTLCache(maxsize=1024, ttl=3600)
+_TRENDS_CACHE = LRUCache(maxsize=64)
+
+
+def _now_iso() -> str:
+    """Timezone-aware UTC timestamp for analysis results"""
+    return datetime.fromtimestamp(time.time(), tz=timezone.utc).isoformat()
+
+
+# Fields of each authority row worth sending to Gemini; the rest only inflates input tokens
+CASE_LAW_PROMPT_FIELDS = ('case_name', 'citation', 'holding')
+STATUTE_PROMPT_FIELDS = ('statute_title', 'code_section', 'statute_text')
+PRECEDENT_PROMPT_FIELDS = ('legal_principle', 'binding_authority', 'precedent_weight', 'case_name', 'citation')
+SIMILAR_CASE_PROMPT_FIELDS = ('case_name', 'legal_issues', 'holding', 'decision_date', 'similarity')
+
+
+def _compact_rows(rows: List[Dict], fields: tuple, max_chars: int = 400) -> List[Dict]:
+    """Keep only the given fields of each row, truncating long text to max_chars"""
+    return [
+        {k: (v[:max_chars] if isinstance(v, str) else v) for k, v in row.items() if k in fields}
+        for row in rows
+    ]
+
+
+def _prompt_json(obj) -> str:
+    """Serialize prompt context compactly; Gemini gains nothing from pretty-printed JSON"""
+    return orjson.dumps(obj, default=str, option=orjson.OPT_NON_STR_KEYS).decode()
+
 
 class CaseAnalysisAgent:
     """AI agent for case strength assessment and legal strategy development"""
 
     def __init__(self):
-        # Configure Gemini AI
-        genai.configure(api_key=os.getenv('GEMINI_API_KEY'))
-        self.model = genai.GenerativeModel('gemini-pro')
+        # Gemini model is configured once and reused across instances
+        self.model = shared_model()
+
+        # Cache analyses of identical prompts. No semantic matching: the prompts share most of
+        # their text, and near-duplicate facts can differ in the detail that decides the outcome
+        self._cache = SemanticResponseCache(prompt_version=PROMPT_VERSION)
+
+        # Make sure the lookup indexes exist on databases created before they were added
+        self._ensure_indexes()
 
         # Case analysis prompt templates
         self.analysis_prompts = {
@@ -57,6 +173,9 @@ class CaseAnalysisAgent:
                 - Strategic recommendations
                 - Risk mitigation strategies
                 - Settlement considerations
+
+                Respond with a JSON object: the 1-10 scores as numbers in "overall", "legal",
+                "factual", "procedural" and "risk", and the written analysis in "analysis".
             """,
 
             'litigation_strategy': """
@@ -136,12 +255,87 @@ class CaseAnalysisAgent:
                    - Decision points timeline
 
                 Base predictions on data-driven analysis with appropriate disclaimers.
+            """,
+
+            'full_analysis': """
+                You are an expert legal strategist producing a complete case assessment in one pass.
+
+                Case Facts: {case_facts}
+                Legal Issues: {legal_issues}
+                Client Context: {client_context}
+                Opposing Party Profile: {opposing_party}
+                Jurisdiction: {jurisdiction}
+                Relevant Case Law: {case_law}
+                Applicable Statutes: {statutes}
+                Legal Precedents: {precedents}
+                Similar Cases: {similar_cases}
+                Jurisdiction Trends: {jurisdiction_data}
+
+                ### CASE_STRENGTH_JSON ###
+                Analyze case strength: score legal merit, factual strength, procedural
+                considerations, risk and overall strength (1-10), then give factor analysis,
+                risk mitigation and settlement considerations.
+
+                ### LITIGATION_STRATEGY_JSON ###
+                Develop the litigation strategy with numbered sections for CASE THEORY DEVELOPMENT
+                (begin with "Primary legal theory: ..."), DISCOVERY STRATEGY, MOTION PRACTICE STRATEGY,
+                SETTLEMENT STRATEGY and TRIAL PREPARATION, using bullet points within each section.
+
+                ### OUTCOME_PREDICTION_JSON ###
+                Predict the outcome: win probability as a percentage, damage and settlement ranges,
+                case duration estimate (e.g. "12-18 months") and strategic recommendations,
+                with appropriate disclaimers.
+
+                Respond with a single JSON object
+                {{"case_strength": {{"overall": X, "legal": X, "factual": X, "procedural": X, "risk": X, "analysis": "..."}},
+                  "litigation_strategy": "...", "outcome_prediction": "..."}}
+                where the scores are numbers and every other value is the prose for the matching section above.
             """
         }
 
+        # Structured output: scores come back as numbers instead of being parsed out of prose
+        # (None when the configured model has no JSON mode; _parse_strength then reads prose)
+        self.case_strength_config = json_config(CASE_STRENGTH_SCHEMA)
+        # The combined call answers three analyses at once, so it gets three outputs' budget
+        self.full_analysis_config = json_config({
+            'type': 'object',
+            'properties': {
+                'case_strength': CASE_STRENGTH_SCHEMA,
+                'litigation_strategy': {'type': 'string'},
+                'outcome_prediction': {'type': 'string'}
+            },
+            'required': ['case_strength', 'litigation_strategy', 'outcome_prediction']
+        }, 3 * MAX_OUTPUT_TOKENS)
+
     def get_db_connection(self):
-        """Get database connection"""
-        return sqlite3.connect('database/legal_data.db')
+        """Get this thread's persistent, tuned database connection (do not close)"""
+        return get_connection()
+
+    def get_read_connection(self):
+        """Get this thread's read-only connection for the lookup helpers (do not close)"""
+        return get_readonly_connection()
+
+    def _ensure_indexes(self):
+        """Create the B-tree and FTS5 indexes backing the authority lookups (idempotent)"""
+        try:
+            conn = self.get_db_connection()
+            conn.executescript("""
+                CREATE INDEX IF NOT EXISTS idx_case_law_date ON case_law(decision_date DESC);
+                CREATE INDEX IF NOT EXISTS idx_case_law_jur_date ON case_law(jurisdiction, decision_date DESC);
+                CREATE INDEX IF NOT EXISTS idx_statutes_eff ON statutes(effective_date DESC);
+                CREATE INDEX IF NOT EXISTS idx_precedents_weight ON legal_precedents(precedent_weight DESC);
+                CREATE INDEX IF NOT EXISTS idx_precedents_case ON legal_precedents(case_id);
+            """)
+            ensure_fts_tables(conn)
+
+            # Similar-case ranking stores one embedding per case_law row
+            columns = {row[1] for row in conn.execute("PRAGMA table_info(case_law)")}
+            if 'embedding' not in columns:
+                conn.execute("ALTER TABLE case_law ADD COLUMN embedding BLOB")
+                conn.commit()
+        except sqlite3.Error:
+            # Database not initialized yet; init_database.py creates these with the schema
+            pass
 
     def analyze_case_merits(self, case_facts: str, legal_issues: str, client_context: Dict = None) -> Dict:
         """Analyze case merits and provide strength assessment"""
@@ -150,35 +344,11 @@ class CaseAnalysisAgent:
             case_law = self._get_relevant_case_law(legal_issues)
             statutes = self._get_relevant_statutes(legal_issues)
 
-            # Prepare analysis context
-            analysis_context = {
-                'case_facts': case_facts,
-                'legal_issues': legal_issues,
-                'case_law': json.dumps(case_law, indent=2),
-                'statutes': json.dumps(statutes, indent=2),
-                'client_context': json.dumps(client_context or {}, indent=2)
-            }
-
             # Generate case strength analysis
-            prompt = self.analysis_prompts['case_strength'].format(**analysis_context)
-            response = self.model.generate_content(prompt)
-            strength_analysis = response.text
+            prompt = self._build_case_strength_prompt(case_facts, legal_issues, case_law, statutes, client_context)
+            strength = self._parse_strength(self._generate(prompt, self.case_strength_config))
 
-            # Extract numerical scores using regex
-            scores = self._extract_scores(strength_analysis)
-
-            return {
-                'case_facts': case_facts,
-                'legal_issues': legal_issues,
-                'strength_analysis': strength_analysis,
-                'strength_scores': scores,
-                'supporting_authority': {
-                    'case_law': case_law,
-                    'statutes': statutes
-                },
-                'analysis_timestamp': datetime.utcnow().isoformat(),
-                'overall_strength': scores.get('overall', 5.0)
-            }
+            return self._package_case_strength(case_facts, legal_issues, case_law, statutes, strength)
 
         except Exception as e:
             return {
@@ -194,25 +364,10 @@ class CaseAnalysisAgent:
             precedents = self._get_strategic_precedents(case_analysis.get('legal_issues', ''))
 
             # Generate litigation strategy
-            strategy_context = {
-                'case_analysis': json.dumps(case_analysis, indent=2),
-                'precedents': json.dumps(precedents, indent=2),
-                'opposing_party': opposing_party or 'Unknown'
-            }
+            prompt = self._build_strategy_prompt(case_analysis, precedents, opposing_party)
+            strategy_analysis = self._generate(prompt)
 
-            prompt = self.analysis_prompts['litigation_strategy'].format(**strategy_context)
-            response = self.model.generate_content(prompt)
-            strategy_analysis = response.text
-
-            return {
-                'case_id': case_analysis.get('case_id'),
-                'litigation_strategy': strategy_analysis,
-                'strategic_precedents': precedents,
-                'case_theory': self._extract_case_theory(strategy_analysis),
-                'discovery_priorities': self._extract_discovery_priorities(strategy_analysis),
-                'settlement_considerations': self._extract_settlement_factors(strategy_analysis),
-                'strategy_timestamp': datetime.utcnow().isoformat()
-            }
+            return self._package_strategy(case_analysis, precedents, strategy_analysis)
 
         except Exception as e:
             return {
@@ -230,114 +385,574 @@ class CaseAnalysisAgent:
             jurisdiction_trends = self._get_jurisdiction_trends(jurisdiction)
 
             # Generate outcome prediction
-            prediction_context = {
-                'case_profile': json.dumps(case_profile, indent=2),
-                'similar_cases': json.dumps(similar_cases, indent=2),
-                'jurisdiction_data': json.dumps(jurisdiction_trends, indent=2),
-                'judge_profile': 'General jurisdiction profile'  # Placeholder
+            prompt = self._build_prediction_prompt(case_profile, similar_cases, jurisdiction_trends)
+            prediction_analysis = self._generate(prompt)
+
+            return self._package_prediction(case_profile, jurisdiction, similar_cases, prediction_analysis)
+
+        except Exception as e:
+            return {
+                'error': f"Outcome prediction failed: {str(e)}",
+                'case_profile': case_profile
             }
 
-            prompt = self.analysis_prompts['outcome_prediction'].format(**prediction_context)
-            response = self.model.generate_content(prompt)
-            prediction_analysis = response.text
+    def full_analysis(self, case_facts: str, legal_issues: str, client_context: Dict = None,
+                      opposing_party: str = None, jurisdiction: str = "Federal") -> Dict:
+        """Run strength, strategy and outcome analysis with a single Gemini request"""
+        if self.full_analysis_config is None:
+            # Splitting one answer into sections needs JSON mode; make the three calls instead
+            return self._full_analysis_separately(case_facts, legal_issues, client_context,
+                                                  opposing_party, jurisdiction)
 
-            # Extract prediction metrics
-            success_probability = self._extract_probability(prediction_analysis)
-            timeline_estimate = self._extract_timeline(prediction_analysis)
+        try:
+            # Gather all authority up front so the shared context is sent once
+            case_profile = {'case_facts': case_facts, 'legal_issues': legal_issues}
+            case_law, statutes, precedents = self._get_analysis_authority(legal_issues)
+            similar_cases = self._find_similar_cases(case_profile, jurisdiction)
+            jurisdiction_trends = self._get_jurisdiction_trends(jurisdiction)
+
+            prompt = self.analysis_prompts['full_analysis'].format(
+                case_facts=case_facts,
+                legal_issues=legal_issues,
+                client_context=_prompt_json(client_context or {}),
+                opposing_party=opposing_party or 'Unknown',
+                jurisdiction=jurisdiction,
+                case_law=_prompt_json(_compact_rows(case_law, CASE_LAW_PROMPT_FIELDS)),
+                statutes=_prompt_json(_compact_rows(statutes, STATUTE_PROMPT_FIELDS)),
+                precedents=_prompt_json(_compact_rows(precedents, PRECEDENT_PROMPT_FIELDS)),
+                similar_cases=_prompt_json(_compact_rows(similar_cases, SIMILAR_CASE_PROMPT_FIELDS)),
+                jurisdiction_data=_prompt_json(jurisdiction_trends)
+            )
+            sections = json.loads(self._generate(prompt, self.full_analysis_config))
+
+            # Dispatch each section to the existing extractors
+            case_analysis = self._package_case_strength(
+                case_facts, legal_issues, case_law, statutes, sections.get('case_strength', {})
+            )
+
+            return {
+                'case_analysis': case_analysis,
+                'litigation_strategy': self._package_strategy(
+                    case_analysis, precedents, sections.get('litigation_strategy', '')
+                ),
+                'outcome_prediction': self._package_prediction(
+                    case_profile, jurisdiction, similar_cases, sections.get('outcome_prediction', '')
+                ),
+                'analysis_timestamp': _now_iso()
+            }
+
+        except Exception as e:
+            return {
+                'error': f"Full case analysis failed: {str(e)}",
+                'case_facts': case_facts,
+                'legal_issues': legal_issues
+            }
+
+    def _full_analysis_separately(self, case_facts: str, legal_issues: str, client_context: Dict = None,
+                                  opposing_party: str = None, jurisdiction: str = "Federal") -> Dict:
+        """full_analysis for models without JSON mode: one Gemini request per analysis"""
+        case_analysis = self.analyze_case_merits(case_facts, legal_issues, client_context)
+        if 'error' in case_analysis:
+            return {
+                'error': f"Full case analysis failed: {case_analysis['error']}",
+                'case_facts': case_facts,
+                'legal_issues': legal_issues
+            }
+
+        return {
+            'case_analysis': case_analysis,
+            'litigation_strategy': self.develop_litigation_strategy(case_analysis, opposing_party),
+            'outcome_prediction': self.predict_case_outcome(
+                {'case_facts': case_facts, 'legal_issues': legal_issues}, jurisdiction
+            ),
+            'analysis_timestamp': _now_iso()
+        }
+
+    def _embed_prompt(self, text: str) -> List[float]:
+        """Embed text with the Gemini embedding model"""
+        return genai.embed_content(model=EMBEDDING_MODEL, content=text)['embedding']
+
+    def _cache_key(self, prompt: str, generation_config: Dict = None) -> str:
+        """Cache key text; the same prompt answered as JSON and as prose must not collide"""
+        if not generation_config:
+            return prompt
+        return prompt + '\n' + json.dumps(generation_config, sort_keys=True)
+
+    def _cache_lookup(self, cache_key: str) -> Optional[str]:
+        """Look up a cached response; cache failures never block an analysis"""
+        try:
+            return self._cache.get(cache_key)
+        except Exception:
+            return None
+
+    def _cache_store(self, cache_key: str, response_text: str):
+        """Store a response in the cache, ignoring cache failures"""
+        try:
+            self._cache.put(cache_key, response_text)
+        except Exception:
+            pass
+
+    def _generate(self, prompt: str, generation_config: Dict = None) -> str:
+        """Generate analysis text, serving repeated prompts from cache"""
+        cache_key = self._cache_key(prompt, generation_config)
+        cached = self._cache_lookup(cache_key)
+        if cached is not None:
+            return cached
+
+        response = self._call_model(prompt, generation_config)
+        self._cache_store(cache_key, response.text)
+        return response.text
+
+    @_retry_transient
+    def _call_model(self, prompt: str, generation_config: Dict = None):
+        """Call Gemini, retrying transient rate-limit and availability errors with backoff"""
+        return self.model.generate_content(prompt, generation_config=generation_config)
+
+    @_retry_transient
+    async def _agen(self, prompt: str, generation_config: Dict = None):
+        """Generate content without blocking the event loop, within the shared rate limit"""
+        async with _GEMINI_LIMITER:
+            return await self.model.generate_content_async(prompt, generation_config=generation_config)
+
+    async def _agenerate(self, prompt: str, generation_config: Dict = None) -> str:
+        """Async counterpart of _generate"""
+        cache_key = self._cache_key(prompt, generation_config)
+        cached = await asyncio.to_thread(self._cache_lookup, cache_key)
+        if cached is not None:
+            return cached
+
+        response = await self._agen(prompt, generation_config)
+        await asyncio.to_thread(self._cache_store, cache_key, response.text)
+        return response.text
+
+    async def aanalyze_case_merits(self, case_facts: str, legal_issues: str, client_context: Dict = None) -> Dict:
+        """Async variant of analyze_case_merits; authority lookups run concurrently"""
+        try:
+            # Fetch case law and statutes concurrently off the event loop
+            case_law, statutes = await asyncio.gather(
+                asyncio.to_thread(self._get_relevant_case_law, legal_issues),
+                asyncio.to_thread(self._get_relevant_statutes, legal_issues)
+            )
+
+            prompt = self._build_case_strength_prompt(case_facts, legal_issues, case_law, statutes, client_context)
+            strength = self._parse_strength(await self._agenerate(prompt, self.case_strength_config))
 
+            return self._package_case_strength(case_facts, legal_issues, case_law, statutes, strength)
+
+        except Exception as e:
             return {
-                'case_profile': case_profile,
-                'outcome_prediction': prediction_analysis,
-                'success_probability': success_probability,
-                'timeline_estimate': timeline_estimate,
-                'similar_cases_count': len(similar_cases),
-                'jurisdiction': jurisdiction,
-                'prediction_timestamp': datetime.utcnow().isoformat(),
-                'confidence_level': self._calculate_confidence(similar_cases, case_profile)
+                'error': f"Case analysis failed: {str(e)}",
+                'case_facts': case_facts,
+                'legal_issues': legal_issues
             }
 
+    async def adevelop_litigation_strategy(self, case_analysis: Dict, opposing_party: str = None) -> Dict:
+        """Async variant of develop_litigation_strategy"""
+        try:
+            precedents = await asyncio.to_thread(self._get_strategic_precedents, case_analysis.get('legal_issues', ''))
+
+            prompt = self._build_strategy_prompt(case_analysis, precedents, opposing_party)
+            strategy_analysis = await self._agenerate(prompt)
+
+            return self._package_strategy(case_analysis, precedents, strategy_analysis)
+
+        except Exception as e:
+            return {
+                'error': f"Strategy development failed: {str(e)}",
+                'case_analysis': case_analysis
+            }
+
+    async def apredict_case_outcome(self, case_profile: Dict, jurisdiction: str = "Federal") -> Dict:
+        """Async variant of predict_case_outcome; historical lookups run concurrently"""
+        try:
+            similar_cases, jurisdiction_trends = await asyncio.gather(
+                asyncio.to_thread(self._find_similar_cases, case_profile, jurisdiction),
+                asyncio.to_thread(self._get_jurisdiction_trends, jurisdiction)
+            )
+
+            prompt = self._build_prediction_prompt(case_profile, similar_cases, jurisdiction_trends)
+            prediction_analysis = await self._agenerate(prompt)
+
+            return self._package_prediction(case_profile, jurisdiction, similar_cases, prediction_analysis)
+
         except Exception as e:
             return {
                 'error': f"Outcome prediction failed: {str(e)}",
                 'case_profile': case_profile
             }
 
+    async def aanalyze_batch(self, cases: List[Dict], max_concurrency: int = 4) -> List[Dict]:
+        """Analyze merits for many cases concurrently, throttled to respect Gemini rate limits"""
+        semaphore = asyncio.Semaphore(max_concurrency)
+
+        async def analyze_one(case: Dict) -> Dict:
+            async with semaphore:
+                return await self.aanalyze_case_merits(
+                    case.get('case_facts', ''),
+                    case.get('legal_issues', ''),
+                    case.get('client_context')
+                )
+
+        return await asyncio.gather(*(analyze_one(case) for case in cases))
+
+    def analyze_batch(self, cases: List[Dict], max_concurrency: int = 4) -> List[Dict]:
+        """Synchronous entry point for batch case analysis"""
+        return asyncio.run(self.aanalyze_batch(cases, max_concurrency))
+
+    def _build_case_strength_prompt(self, case_facts: str, legal_issues: str, case_law: List[Dict],
+                                    statutes: List[Dict], client_context: Dict = None) -> str:
+        """Format the case strength prompt"""
+        analysis_context = {
+            'case_facts': case_facts,
+            'legal_issues': legal_issues,
+            'case_law': _prompt_json(_compact_rows(case_law, CASE_LAW_PROMPT_FIELDS)),
+            'statutes': _prompt_json(_compact_rows(statutes, STATUTE_PROMPT_FIELDS)),
+            'client_context': _prompt_json(client_context or {})
+        }
+        return self.analysis_prompts['case_strength'].format(**analysis_context)
+
+    def _parse_strength(self, response_text: str) -> Dict:
+        """Case strength scores and analysis from a JSON response, or read out of prose without JSON mode"""
+        try:
+            strength = json.loads(_JSON_FENCE_RE.sub('', response_text.strip()))
+        except ValueError:
+            strength = None
+        if isinstance(strength, dict):
+            return strength
+
+        return {**self._extract_scores(response_text), 'analysis': response_text}
+
+    def _extract_scores(self, analysis_text: str) -> Dict:
+        """Extract numerical scores from analysis text"""
+        scores = {}
+
+        # Single scan over the text; the first score reported for each factor wins
+        for match in _SCORE_RE.finditer(analysis_text):
+            scores.setdefault(match.group(1).lower(), float(match.group(2)))
+
+        return scores
+
+    def _package_case_strength(self, case_facts: str, legal_issues: str, case_law: List[Dict],
+                               statutes: List[Dict], strength: Dict) -> Dict:
+        """Build the case strength result from the model's structured output"""
+        # Scores arrive as numbers; keep only the ones the model actually filled in
+        scores = {
+            field: float(strength[field])
+            for field in SCORE_FIELDS
+            if isinstance(strength.get(field), (int, float))
+        }
+
+        return {
+            'case_facts': case_facts,
+            'legal_issues': legal_issues,
+            'strength_analysis': strength.get('analysis', ''),
+            'strength_scores': scores,
+            'supporting_authority': {
+                'case_law': case_law,
+                'statutes': statutes
+            },
+            'analysis_timestamp': _now_iso(),
+            'overall_strength': scores.get('overall', 5.0)
+        }
+
+    def _build_strategy_prompt(self, case_analysis: Dict, precedents: List[Dict], opposing_party: str = None) -> str:
+        """Format the litigation strategy prompt"""
+        strategy_context = {
+            'case_analysis': _prompt_json(self._distill_case_analysis(case_analysis)),
+            'precedents': _prompt_json(_compact_rows(precedents, PRECEDENT_PROMPT_FIELDS)),
+            'opposing_party': opposing_party or 'Unknown'
+        }
+        return self.analysis_prompts['litigation_strategy'].format(**strategy_context)
+
+    def _distill_case_analysis(self, case_analysis: Dict) -> Dict:
+        """Reduce a case analysis to the scores and summary the strategy prompt needs"""
+        return {
+            'scores': case_analysis.get('strength_scores', {}),
+            'summary': (case_analysis.get('strength_analysis') or '')[:1500],
+            'legal_issues': case_analysis.get('legal_issues')
+        }
+
+    def _package_strategy(self, case_analysis: Dict, precedents: List[Dict], strategy_analysis: str) -> Dict:
+        """Build the litigation strategy result from the model output"""
+        return {
+            'case_id': case_analysis.get('case_id'),
+            'litigation_strategy': strategy_analysis,
+            'strategic_precedents': precedents,
+            'case_theory': self._extract_case_theory(strategy_analysis),
+            'discovery_priorities': self._extract_discovery_priorities(strategy_analysis),
+            'settlement_considerations': self._extract_settlement_factors(strategy_analysis),
+            'strategy_timestamp': _now_iso()
+        }
+
+    def _build_prediction_prompt(self, case_profile: Dict, similar_cases: List[Dict], jurisdiction_trends: Dict) -> str:
+        """Format the outcome prediction prompt"""
+        prediction_context = {
+            'case_profile': _prompt_json(case_profile),
+            'similar_cases': _prompt_json(_compact_rows(similar_cases, SIMILAR_CASE_PROMPT_FIELDS)),
+            'jurisdiction_data': _prompt_json(jurisdiction_trends),
+            'judge_profile': 'General jurisdiction profile'  # Placeholder
+        }
+        return self.analysis_prompts['outcome_prediction'].format(**prediction_context)
+
+    def _package_prediction(self, case_profile: Dict, jurisdiction: str, similar_cases: List[Dict],
+                            prediction_analysis: str) -> Dict:
+        """Build the outcome prediction result from the model output"""
+        # Extract prediction metrics
+        success_probability = self._extract_probability(prediction_analysis)
+        timeline_estimate = self._extract_timeline(prediction_analysis)
+
+        return {
+            'case_profile': case_profile,
+            'outcome_prediction': prediction_analysis,
+            'success_probability': success_probability,
+            'timeline_estimate': timeline_estimate,
+            'similar_cases_count': len(similar_cases),
+            'jurisdiction': jurisdiction,
+            'prediction_timestamp': _now_iso(),
+            'confidence_level': self._calculate_confidence(similar_cases, case_profile)
+        }
+
+    @cached_lookup(_AUTHORITY_CACHE)
     def _get_relevant_case_law(self, legal_issues: str, limit: int = 5) -> List[Dict]:
         """Get case law relevant to legal issues"""
-        conn = self.get_db_connection()
-        cursor = conn.cursor()
+        cursor = self.get_read_connection().cursor()
+        cursor.row_factory = dict_row
+
+        match = build_match_query(legal_issues, ('legal_issues', 'holding'))
+        if not match:
+            return []
 
         cursor.execute("""
             SELECT case_name, court, citation, holding, legal_issues
             FROM case_law
-            WHERE legal_issues LIKE ? OR holding LIKE ?
+            WHERE rowid IN (SELECT rowid FROM case_law_fts WHERE case_law_fts MATCH ?)
             ORDER BY decision_date DESC
             LIMIT ?
-        """, (f"%{legal_issues}%", f"%{legal_issues}%", limit))
+        """, (match, limit))
 
-        results = cursor.fetchall()
-        conn.close()
-        return [dict(zip([col[0] for col in cursor.description], row)) for row in results]
+        return cursor.fetchall()
 
+    @cached_lookup(_AUTHORITY_CACHE)
     def _get_relevant_statutes(self, legal_issues: str, limit: int = 3) -> List[Dict]:
         """Get statutes relevant to legal issues"""
-        conn = self.get_db_connection()
-        cursor = conn.cursor()
+        cursor = self.get_read_connection().cursor()
+        cursor.row_factory = dict_row
+
+        match = build_match_query(legal_issues, ('statute_text', 'legal_area'))
+        if not match:
+            return []
 
         cursor.execute("""
             SELECT statute_title, code_section, statute_text, legal_area
             FROM statutes
-            WHERE statute_text LIKE ? OR legal_area LIKE ?
+            WHERE rowid IN (SELECT rowid FROM statutes_fts WHERE statutes_fts MATCH ?)
             ORDER BY effective_date DESC
             LIMIT ?
-        """, (f"%{legal_issues}%", f"%{legal_issues}%", limit))
+        """, (match, limit))
 
-        results = cursor.fetchall()
-        conn.close()
-        return [dict(zip([col[0] for col in cursor.description], row)) for row in results]
+        return cursor.fetchall()
 
+    @cached_lookup(_AUTHORITY_CACHE)
     def _get_strategic_precedents(self, legal_issues: str, limit: int = 5) -> List[Dict]:
         """Get precedents for strategic development"""
-        conn = self.get_db_connection()
-        cursor = conn.cursor()
+        cursor = self.get_read_connection().cursor()
+        cursor.row_factory = dict_row
+
+        match = build_match_query(legal_issues, ('legal_principle',))
+        if not match:
+            return []
 
         cursor.execute("""
             SELECT p.legal_principle, p.binding_authority, p.precedent_weight,
                    c.case_name, c.citation
             FROM legal_precedents p
             JOIN case_law c ON p.case_id = c.case_id
-            WHERE p.legal_principle LIKE ?
+            WHERE p.rowid IN (SELECT rowid FROM legal_precedents_fts WHERE legal_precedents_fts MATCH ?)
             ORDER BY p.precedent_weight DESC
             LIMIT ?
-        """, (f"%{legal_issues}%", limit))
+        """, (match, limit))
+
+        return cursor.fetchall()
 
-        results = cursor.fetchall()
-        conn.close()
-        return [dict(zip([col[0] for col in cursor.description], row)) for row in results]
+    @cached_lookup(_AUTHORITY_CACHE)
+    def _get_analysis_authority(self, legal_issues: str, case_law_limit: int = 5, statute_limit: int = 3,
+                                precedent_limit: int = 5) -> tuple:
+        """Fetch case law, statutes and precedents for full_analysis in one UNION ALL round trip"""
+        match = build_match_query(legal_issues)
+        if not match:
+            return [], [], []
+
+        # Same filters and ordering as _get_relevant_case_law, _get_relevant_statutes and
+        # _get_strategic_precedents; each branch is tagged with its source
+        cursor = self.get_read_connection().cursor()
+        cursor.execute("""
+            SELECT * FROM (
+                SELECT 'case_law' AS src, case_name, court, citation, holding, legal_issues
+                FROM case_law
+                WHERE rowid IN (SELECT rowid FROM case_law_fts WHERE case_law_fts MATCH ?)
+                ORDER BY decision_date DESC
+                LIMIT ?
+            )
+            UNION ALL
+            SELECT * FROM (
+                SELECT 'statute', statute_title, code_section, statute_text, legal_area, NULL
+                FROM statutes
+                WHERE rowid IN (SELECT rowid FROM statutes_fts WHERE statutes_fts MATCH ?)
+                ORDER BY effective_date DESC
+                LIMIT ?
+            )
+            UNION ALL
+            SELECT * FROM (
+                SELECT 'precedent', p.legal_principle, p.binding_authority, p.precedent_weight,
+                       c.case_name, c.citation
+                FROM legal_precedents p
+                JOIN case_law c ON p.case_id = c.case_id
+                WHERE p.rowid IN (SELECT rowid FROM legal_precedents_fts WHERE legal_precedents_fts MATCH ?)
+                ORDER BY p.precedent_weight DESC
+                LIMIT ?
+            )
+        """, (
+            build_match_query(legal_issues, ('legal_issues', 'holding')), case_law_limit,
+            build_match_query(legal_issues, ('statute_text', 'legal_area')), statute_limit,
+            build_match_query(legal_issues, ('legal_principle',)), precedent_limit
+        ))
+
+        # Split the tagged rows back into the shapes the individual helpers return
+        columns = {
+            'case_law': ('case_name', 'court', 'citation', 'holding', 'legal_issues'),
+            'statute': ('statute_title', 'code_section', 'statute_text', 'legal_area'),
+            'precedent': ('legal_principle', 'binding_authority', 'precedent_weight', 'case_name', 'citation')
+        }
+        results = {src: [] for src in columns}
+        for src, *values in cursor.fetchall():
+            results[src].append(dict(zip(columns[src], values)))
+
+        return results['case_law'], results['statute'], results['precedent']
 
     def _find_similar_cases(self, case_profile: Dict, jurisdiction: str, limit: int = 5) -> List[Dict]:
         """Find similar cases for outcome prediction"""
+        legal_issues = case_profile.get('legal_issues', '')
+        if not legal_issues:
+            return []
+
+        with _CASE_EMBEDDINGS_LOCK:
+            recently_failed = jurisdiction in _EMBEDDING_FAILURES
+        if not recently_failed:
+            try:
+                return self._rank_similar_cases(legal_issues, jurisdiction, limit)
+            except Exception:
+                with _CASE_EMBEDDINGS_LOCK:
+                    _EMBEDDING_FAILURES[jurisdiction] = True
+
+        # Embeddings unavailable; fall back to keyword matching
+        return self._search_similar_cases(legal_issues, jurisdiction, limit)
+
+    def _rank_similar_cases(self, legal_issues: str, jurisdiction: str, limit: int) -> List[Dict]:
+        """Rank the jurisdiction's cases by cosine similarity of their embeddings to the legal issues"""
+        rows, matrix = self._case_embeddings(jurisdiction)
+        if not rows:
+            return []
+
+        query = np.asarray(self._embed_prompt(legal_issues), dtype=np.float32)
+        query /= np.linalg.norm(query) or 1.0
+        scores = matrix @ query
+
+        # Partial sort: only the top `limit` scores need ordering
+        k = min(limit, len(rows))
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = [i for i in top[np.argsort(-scores[top])] if scores[i] >= CASE_SIMILARITY_FLOOR]
+
+        return [dict(rows[i], similarity=round(float(scores[i]), 4)) for i in top]
+
+    def _case_embeddings(self, jurisdiction: str):
+        """Return (rows, normalized embedding matrix) for a jurisdiction, rebuilding only when case_law changed"""
         conn = self.get_db_connection()
+        self._backfill_case_embeddings(conn, jurisdiction)
+
+        signature = conn.execute("""
+            SELECT COUNT(*), MAX(rowid) FROM case_law
+            WHERE jurisdiction = ? AND embedding IS NOT NULL
+        """, (jurisdiction,)).fetchone()
+
+        cached = _CASE_EMBEDDINGS.get(jurisdiction)
+        if cached and cached[0] == signature:
+            return cached[1], cached[2]
+
         cursor = conn.cursor()
+        cursor.row_factory = dict_row
+        cursor.execute("""
+            SELECT case_name, legal_issues, holding, decision_date, embedding
+            FROM case_law
+            WHERE jurisdiction = ? AND embedding IS NOT NULL
+        """, (jurisdiction,))
 
-        # Simple similarity based on legal issues
-        legal_issues = case_profile.get('legal_issues', '')
+        rows, vectors = [], []
+        for row in cursor.fetchall():
+            vectors.append(np.frombuffer(row.pop('embedding'), dtype=np.float32))
+            rows.append(row)
+
+        # Rows embedded with a different model dimension cannot be compared; keep the majority
+        if vectors:
+            dimension = Counter(v.shape[0] for v in vectors).most_common(1)[0][0]
+            kept = [(r, v) for r, v in zip(rows, vectors) if v.shape[0] == dimension]
+            rows, vectors = [r for r, _ in kept], [v for _, v in kept]
+
+        matrix = np.stack(vectors) if vectors else np.empty((0, 0), dtype=np.float32)
+        with _CASE_EMBEDDINGS_LOCK:
+            _CASE_EMBEDDINGS[jurisdiction] = (signature, rows, matrix)
+
+        return rows, matrix
+
+    def _backfill_case_embeddings(self, conn: sqlite3.Connection, jurisdiction: str):
+        """Embed any case_law rows in the jurisdiction that do not have an embedding yet"""
+        missing = conn.execute("""
+            SELECT rowid, legal_issues, holding FROM case_law
+            WHERE jurisdiction = ? AND embedding IS NULL
+        """, (jurisdiction,)).fetchall()
+        if not missing:
+            return
+
+        # One embedding request per EMBEDDING_BATCH_SIZE rows; each chunk is committed as it
+        # lands, so a failure part way through keeps the rows already embedded
+        for start in range(0, len(missing), EMBEDDING_BATCH_SIZE):
+            chunk = missing[start:start + EMBEDDING_BATCH_SIZE]
+            texts = [f"{legal_issues}\n{holding}" for _, legal_issues, holding in chunk]
+            vectors = np.asarray(genai.embed_content(model=EMBEDDING_MODEL, content=texts)['embedding'],
+                                 dtype=np.float32)
+            norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+            vectors /= np.where(norms > 0, norms, 1.0)
+
+            conn.executemany(
+                "UPDATE case_law SET embedding = ? WHERE rowid = ?",
+                [(vector.tobytes(), rowid) for vector, (rowid, _, _) in zip(vectors, chunk)]
+            )
+            conn.commit()
+            bump_knowledge_version()
+
+    def _search_similar_cases(self, legal_issues: str, jurisdiction: str, limit: int) -> List[Dict]:
+        """Keyword fallback for similar cases using the case_law FTS index"""
+        cursor = self.get_read_connection().cursor()
+        cursor.row_factory = dict_row
+
+        match = build_match_query(legal_issues, ('legal_issues',))
+        if not match:
+            return []
 
         cursor.execute("""
             SELECT case_name, legal_issues, holding, decision_date
             FROM case_law
-            WHERE legal_issues LIKE ? AND jurisdiction = ?
+            WHERE rowid IN (SELECT rowid FROM case_law_fts WHERE case_law_fts MATCH ?)
+              AND jurisdiction = ?
             ORDER BY decision_date DESC
             LIMIT ?
-        """, (f"%{legal_issues}%", jurisdiction, limit))
+        """, (match, jurisdiction, limit))
 
-        results = cursor.fetchall()
-        conn.close()
-        return [dict(zip([col[0] for col in cursor.description], row)) for row in results]
+        return cursor.fetchall()
 
+    @cached_lookup(_TRENDS_CACHE)
     def _get_jurisdiction_trends(self, jurisdiction: str) -> Dict:
         """Get jurisdiction-specific trends and statistics"""
-        conn = self.get_db_connection()
+        conn = self.get_read_connection()
         cursor = conn.cursor()
 
         cursor.execute("""
@@ -347,7 +962,6 @@ class CaseAnalysisAgent:
         """, (jurisdiction,))
 
         result = cursor.fetchone()
-        conn.close()
 
         return {
             'total_cases': result[0] if result else 0,
@@ -355,81 +969,48 @@ class CaseAnalysisAgent:
             'jurisdiction': jurisdiction
         }
 
-    def _extract_scores(self, analysis_text: str) -> Dict:
-        """Extract numerical scores from analysis text"""
-        scores = {}
-
-        # Extract overall score
-        overall_match = re.search(r'overall.*?score.*?(\d+(?:\.\d+)?)', analysis_text, re.IGNORECASE)
-        if overall_match:
-            scores['overall'] = float(overall_match.group(1))
-
-        # Extract individual factor scores
-        for factor in ['legal', 'factual', 'procedural', 'risk']:
-            pattern = rf'{factor}.*?score.*?(\d+(?:\.\d+)?)'
-            match = re.search(pattern, analysis_text, re.IGNORECASE)
-            if match:
-                scores[factor] = float(match.group(1))
-
-        return scores
-
     def _extract_probability(self, prediction_text: str) -> float:
         """Extract success probability from prediction text"""
-        prob_match = re.search(r'(\d+(?:\.\d+)?)%', prediction_text)
+        prob_match = _PROBABILITY_RE.search(prediction_text)
         return float(prob_match.group(1)) / 100 if prob_match else 0.5
 
     def _extract_timeline(self, prediction_text: str) -> str:
         """Extract timeline estimate from prediction text"""
-        timeline_match = re.search(r'(\d+-\d+ months?|\d+ months?|\d+-\d+ years?)', prediction_text, re.IGNORECASE)
+        timeline_match = _TIMELINE_RE.search(prediction_text)
         return timeline_match.group(1) if timeline_match else "6-12 months"
 
     def _extract_case_theory(self, strategy_text: str) -> str:
         """Extract primary case theory from strategy text"""
-        theory_match = re.search(r'primary legal theory:?\s*([^\n]+)', strategy_text, re.IGNORECASE)
+        theory_match = _CASE_THEORY_RE.search(strategy_text)
         return theory_match.group(1).strip() if theory_match else "To be developed"
 
     def _extract_discovery_priorities(self, strategy_text: str) -> List[str]:
         """Extract discovery priorities from strategy text"""
-        # Simple extraction of bullet points or numbered items
-        priorities = []
-        lines = strategy_text.split('\n')
-        in_discovery_section = False
-
-        for line in lines:
-            if 'discovery' in line.lower() and 'strategy' in line.lower():
-                in_discovery_section = True
-                continue
-            elif in_discovery_section and line.strip():
-                if line.strip().startswith(('-', '*', '•')) or re.match(r'^\d+\.', line.strip()):
-                    priorities.append(line.strip().lstrip('- *•0123456789. '))
-                elif line.strip().isupper() or re.match(r'^\d+\.', line.strip()):
-                    break
-
-        return priorities[:5]  # Return top 5 priorities
+        return self._extract_section_bullets(_DISCOVERY_SECTION_RE, strategy_text)[:5]  # Return top 5 priorities
 
     def _extract_settlement_factors(self, strategy_text: str) -> List[str]:
         """Extract settlement considerations from strategy text"""
-        factors = []
-        lines = strategy_text.split('\n')
-        in_settlement_section = False
-
-        for line in lines:
-            if 'settlement' in line.lower() and ('strategy' in line.lower() or 'consideration' in line.lower()):
-                in_settlement_section = True
-                continue
-            elif in_settlement_section and line.strip():
-                if line.strip().startswith(('-', '*', '•')) or re.match(r'^\d+\.', line.strip()):
-                    factors.append(line.strip().lstrip('- *•0123456789. '))
-                elif line.strip().isupper():
-                    break
-
-        return factors[:5]
+        return self._extract_section_bullets(_SETTLEMENT_SECTION_RE, strategy_text)[:5]
+
+    def _extract_section_bullets(self, section_re, text: str) -> List[str]:
+        """Return the bullet or numbered items in the first section matched by section_re"""
+        section = section_re.search(text)
+        if not section:
+            return []
+
+        return [item.strip().lstrip('- *•0123456789. ') for item in _BULLET_LINE_RE.findall(section.group(1))]
 
     def _calculate_confidence(self, similar_cases: List[Dict], case_profile: Dict) -> float:
         """Calculate confidence level based on available similar cases"""
         if not similar_cases:
             return 0.3
 
-        # Simple confidence calculation based on number of similar cases
+        # Embedding-ranked cases: confidence tracks how close the top matches actually are
+        similarities = [case['similarity'] for case in similar_cases if 'similarity' in case]
+        if similarities:
+            mean_similarity = max(0.0, sum(similarities) / len(similarities))
+            return round(min(0.9, 0.3 + 0.6 * mean_similarity), 2)
+
+        # Keyword matches carry no score, so fall back to the number of similar cases
         confidence = min(0.9, 0.4 + (len(similar_cases) * 0.1))
         return round(confidence, 2)
\ No newline at end of file
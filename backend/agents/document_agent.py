@@ -1,215 +1,495 @@
-import google.generativeai as genai
+import asyncio
 import sqlite3
-import os
 from datetime import datetime
-from typing import Dict, List, Optional, Tuple
+from typing import AsyncIterator, Dict, Iterator, List, Optional, Tuple
 import json
+import orjson
 import re
+from functools import lru_cache
+from threading import Lock
+from cachetools import LRUCache, TTLCache
+
+from utils.llm_cache import SemanticResponseCache
+from utils.database import get_connection, dict_row, cached_lookup
+from utils.models import MAX_OUTPUT_TOKENS, json_config, shared_model, supports_json_mode
+from utils.full_text_search import build_match_query, ensure_fts_tables
+
+# Namespaces this agent's entries in the shared llm_cache table; bump when prompts change
+PROMPT_VERSION = "document-v2"
+
+# In-process memo in front of the persistent cache, keyed by prompt hash
+_RESPONSE_MEMO = LRUCache(maxsize=1024)
+_RESPONSE_MEMO_LOCK = Lock()
+
+# Contract templates and standard clauses change only on ingestion
+_CONTRACT_CACHE = TTLCache(maxsize=256, ttl=3600)
+
+
+def _prompt_json(obj) -> str:
+    """Compact JSON for prompt context; indentation only costs serialization time and tokens"""
+    return orjson.dumps(obj, default=str).decode()
+
+
+# Patterns used by the extraction helpers, compiled once at import
+_SCORE_TYPES = ('compliance', 'risk', 'enforceability', 'legal', 'overall')
+_SCORE_PATTERNS = {
+    score_type: re.compile(rf'{score_type}.*?score.*?(\d+(?:\.\d+)?)', re.IGNORECASE)
+    for score_type in _SCORE_TYPES
+}
+_COMPLIANCE_SCORE_RE = _SCORE_PATTERNS['compliance']
+# Every score type at once: the zero-width lookahead reports each start position, so the
+# first match per type is the same one its _SCORE_PATTERNS entry would find
+_ANY_SCORE_RE = re.compile(
+    rf'(?=({"|".join(_SCORE_TYPES)}).*?score.*?(\d+(?:\.\d+)?))', re.IGNORECASE
+)
+_NUMBERED_RE = re.compile(r'^\d+\.')
+# An all-caps section heading, optionally numbered ("4. RISK ASSESSMENT:")
+_SECTION_HEADER_RE = re.compile(r"^(?:\d+\.\s*)?[A-Z][A-Z0-9 \t&/,:;()'-]{2,}$")
+_QUOTE_RE = re.compile(r'"([^"]{20,200})"')
+# Substring probes over compliance analyses, matched case-insensitively in one scan each
+_GAP_RE = re.compile(r'gap|missing|required|must add', re.IGNORECASE)
+_COMPLIANCE_RISK_RE = re.compile(r'violation|penalty|update', re.IGNORECASE)
+# The scored sections (2-4) of a contract review are complete once section 5 begins
+_SCORED_SECTIONS_DONE_RE = re.compile(r'obligation analysis|recommendations', re.IGNORECASE)
+
+
+# Structured output schemas; the prose analysis rides along so the *_analysis fields stay populated
+_STRING_LIST = {'type': 'array', 'items': {'type': 'string'}}
+REVIEW_SCHEMA = {
+    'type': 'object',
+    'properties': {
+        'compliance_score': {'type': 'number', 'description': 'Legal compliance score, 1-10'},
+        'risk_score': {'type': 'number', 'description': 'Risk assessment score, 1-10'},
+        'enforceability_score': {'type': 'number', 'description': 'Enforceability score, 1-10'},
+        'recommendations': {**_STRING_LIST, 'description': 'Recommended modifications and negotiation priorities'},
+        'red_flags': {**_STRING_LIST, 'description': 'Provisions of particular concern'},
+        'analysis': {'type': 'string', 'description': 'The full written analysis covering every requested section'}
+    },
+    'required': ['compliance_score', 'risk_score', 'enforceability_score', 'recommendations', 'red_flags', 'analysis']
+}
+CLAUSE_SCHEMA = {
+    'type': 'object',
+    'properties': {
+        'risk_level': {'type': 'string', 'description': 'Client risk level: high, medium or low'},
+        'improvements': {**_STRING_LIST, 'description': 'Specific improvement suggestions'},
+        'alternative_language': {**_STRING_LIST, 'description': 'Exact alternative clause language'},
+        'analysis': {'type': 'string', 'description': 'The full written analysis covering every requested section'}
+    },
+    'required': ['risk_level', 'improvements', 'alternative_language', 'analysis']
+}
+COMPLIANCE_SCHEMA = {
+    'type': 'object',
+    'properties': {
+        'compliance_score': {'type': 'number', 'description': 'Compliance risk evaluation score, 1-10'},
+        'compliance_gaps': {**_STRING_LIST, 'description': 'Specific compliance gaps found'},
+        'required_modifications': {**_STRING_LIST, 'description': 'Mandatory compliance updates'},
+        'analysis': {'type': 'string', 'description': 'The full written analysis covering every requested section'}
+    },
+    'required': ['compliance_score', 'compliance_gaps', 'required_modifications', 'analysis']
+}
+
+
+def _parse_structured(response_text: str) -> Optional[Dict]:
+    """Decode a structured response, or None when the model answered in prose"""
+    try:
+        data = json.loads(response_text)
+    except ValueError:
+        return None
+    return data if isinstance(data, dict) else None
+
+
+def _score(data: Dict, field: str) -> Optional[float]:
+    """A numeric field of a structured response, or None when missing"""
+    value = data.get(field)
+    return float(value) if isinstance(value, (int, float)) else None
+
+
+def _find_scores(text: str, scores: Dict[str, float]):
+    """Record in scores the first score of each type found in text that is not already there"""
+    for match in _ANY_SCORE_RE.finditer(text):
+        scores.setdefault(match.group(1).lower(), float(match.group(2)))
+
+
+class _SectionCollector:
+    """Bullet items following each section's trigger keywords, collected one line at a time.
+
+    sections maps a name to (trigger keywords, item limit). A line containing a trigger
+    (re)opens that section; an all-caps heading, numbered or not, closes it for good.
+    """
+
+    def __init__(self, sections: Dict[str, Tuple[Tuple[str, ...], int]]):
+        self.sections = sections
+        self.items = {name: [] for name in sections}
+        self.active = dict.fromkeys(sections, False)
+        self.open_sections = set(sections)
+
+    def feed(self, line: str, line_lower: str):
+        """Advance every still-open section past one line"""
+        stripped = line.strip()
+        is_header = bool(_SECTION_HEADER_RE.match(stripped))
+        is_bullet = not is_header and (stripped.startswith(('-', '*', '•')) or bool(_NUMBERED_RE.match(stripped)))
+
+        for name in tuple(self.open_sections):
+            keywords, limit = self.sections[name]
+            if any(keyword in line_lower for keyword in keywords):
+                self.active[name] = True
+            elif self.active[name] and stripped:
+                if is_header:
+                    self.open_sections.discard(name)
+                elif is_bullet:
+                    self.items[name].append(stripped.lstrip('- *•0123456789. '))
+                    if len(self.items[name]) >= limit:
+                        self.open_sections.discard(name)
+
+
+_RECOMMENDATION_SECTIONS = {'recommendations': (('recommendation',), 10)}
+
+
+# Document keywords checked by the red-flag and risk helpers, found together in one scan
+_RED_FLAG_PATTERNS = (
+    'unlimited liability',
+    'sole discretion',
+    'perpetual',
+    'irrevocable',
+    'personal guarantee',
+    'liquidated damages'
+)
+_HIGH_RISK_TERMS = ('unlimited', 'sole discretion')
+_MEDIUM_RISK_TERMS = ('reasonable', 'material')
+
+_DOCUMENT_KEYWORDS = tuple(dict.fromkeys(_RED_FLAG_PATTERNS + _HIGH_RISK_TERMS + _MEDIUM_RISK_TERMS))
+
+# Clause wording that strengthens or weakens a clause, with its effect on the strength score
+_CLAUSE_STRENGTH_WEIGHTS = {
+    'reasonable': 0.2,
+    'material': 0.2,
+    'written notice': 0.3,
+    'cure period': 0.3,
+    'mutual': 0.2,
+    'sole discretion': -0.4,
+    'unlimited': -0.5,
+    'waive': -0.3,
+    'as is': -0.2
+}
+
+
+def _compile_keywords(keywords) -> Tuple[re.Pattern, Dict[str, set]]:
+    """Build a single-pass matcher for a keyword set.
+
+    Returns a zero-width lookahead alternation (longest alternatives first, so overlapping
+    keywords are each found) and, for every keyword, the shorter keywords a match of it
+    also implies (e.g. 'unlimited liability' -> 'unlimited').
+    """
+    pattern = re.compile(
+        '(?=(' + '|'.join(re.escape(k) for k in sorted(keywords, key=len, reverse=True)) + '))'
+    )
+    prefixes = {keyword: {other for other in keywords if keyword.startswith(other)} for keyword in keywords}
+    return pattern, prefixes
+
+
+def _find_keywords(text_lower: str, pattern: re.Pattern, prefixes: Dict[str, set]) -> set:
+    """Return the keywords of a _compile_keywords matcher present in lower-cased text"""
+    found = set()
+    for match in pattern.finditer(text_lower):
+        found |= prefixes[match.group(1)]
+    return found
+
+
+_DOCUMENT_KEYWORD_RE, _KEYWORD_PREFIXES = _compile_keywords(_DOCUMENT_KEYWORDS)
+_CLAUSE_STRENGTH_RE, _CLAUSE_STRENGTH_PREFIXES = _compile_keywords(tuple(_CLAUSE_STRENGTH_WEIGHTS))
+
+
+def _scan_keywords(doc_lower: str) -> set:
+    """Return the document keywords present in lower-cased text, in a single pass"""
+    return _find_keywords(doc_lower, _DOCUMENT_KEYWORD_RE, _KEYWORD_PREFIXES)
+
+
+@lru_cache(maxsize=None)
+def _clause_patterns(clause_type: str) -> Tuple[re.Pattern, ...]:
+    """Compiled patterns locating a clause by its heading, built once per clause type"""
+    clause = re.escape(clause_type)
+    flags = re.IGNORECASE | re.MULTILINE | re.DOTALL
+    return (
+        re.compile(rf'{clause}[:\s]+(.*?)(?:\n\n|\n[A-Z]|\Z)', flags),
+        re.compile(rf'(?:^|\n)\s*\d+\.?\s*{clause}[:\s]+(.*?)(?:\n\n|\n\d+\.|\Z)', flags),
+    )
+
+
+@lru_cache(maxsize=None)
+def _clause_alternation(clause_types: Tuple[str, ...]) -> Tuple[re.Pattern, Tuple[Tuple[int, int], ...]]:
+    """Every heading pattern of every clause type in one zero-width alternation, built once per type list.
+
+    Returns the pattern and, per capture group (numbered from 1), the (clause index,
+    pattern index) it belongs to. As no clause type of a document type starts with another,
+    at most one alternative succeeds at any position, so the first match of each group is
+    the one its own pattern would find.
+    """
+    alternatives = []
+    slots = []
+    for clause_index, clause_type in enumerate(clause_types):
+        for pattern_index, pattern in enumerate(_clause_patterns(clause_type)):
+            alternatives.append(f'(?:{pattern.pattern})')
+            slots.append((clause_index, pattern_index))
+
+    flags = re.IGNORECASE | re.MULTILINE | re.DOTALL
+    return re.compile('(?=' + '|'.join(alternatives) + ')', flags), tuple(slots)
+
 
 class DocumentReviewAgent:
     """AI agent for legal document review and contract analysis"""
 
-    def __init__(self):
-        # Configure Gemini AI
-        genai.configure(api_key=os.getenv('GEMINI_API_KEY'))
-        self.model = genai.GenerativeModel('gemini-pro')
-
-        # Document analysis templates
-        self.analysis_prompts = {
-            'contract_review': """
-                You are an expert contract review attorney analyzing a legal document.
-
-                Document Type: {document_type}
-                Document Text: {document_text}
-                Standard Contract Templates: {templates}
-                Review Purpose: {review_purpose}
-
-                Provide comprehensive contract analysis:
-
-                1. DOCUMENT OVERVIEW
-                   - Contract type and purpose
-                   - Parties identification
-                   - Key terms summary
-                   - Effective dates and duration
-
-                2. LEGAL COMPLIANCE ANALYSIS (Score 1-10)
-                   - Regulatory compliance assessment
-                   - Legal requirement adherence
-                   - Statutory compliance verification
-                   - Industry standard alignment
-
-                3. RISK ASSESSMENT (Score 1-10)
-                   - High-risk provisions identification
-                   - Liability exposure analysis
-                   - Indemnification risks
-                   - Termination and breach consequences
-
-                4. ENFORCEABILITY ANALYSIS (Score 1-10)
-                   - Legal enforceability probability
-                   - Potential enforceability challenges
-                   - Jurisdiction and governing law issues
-                   - Dispute resolution mechanisms
-
-                5. OBLIGATION ANALYSIS
-                   - Client obligations and responsibilities
-                   - Counterparty obligations
-                   - Performance standards and metrics
-                   - Compliance requirements
-
-                6. RECOMMENDATIONS
-                   - Suggested modifications
-                   - Risk mitigation strategies
-                   - Negotiation priorities
-                   - Alternative clause suggestions
-
-                Focus on practical, actionable insights with specific clause references.
-            """,
-
-            'clause_analysis': """
-                You are a contract clause specialist analyzing specific provisions.
-
-                Clause Text: {clause_text}
-                Clause Type: {clause_type}
-                Contract Context: {contract_context}
-                Standard Clauses: {standard_clauses}
-
-                Provide detailed clause analysis:
-
-                1. CLAUSE INTERPRETATION
-                   - Plain language meaning
-                   - Legal implications
-                   - Ambiguity identification
-                   - Intent determination
-
-                2. RISK EVALUATION
-                   - Client risk exposure
-                   - Counterparty advantages
-                   - Enforcement challenges
-                   - Unintended consequences
-
-                3. MARKET COMPARISON
-                   - Industry standard comparison
-                   - Negotiation positioning
-                   - Alternative formulations
-                   - Best practice recommendations
-
-                4. IMPROVEMENT SUGGESTIONS
-                   - Specific language modifications
-                   - Additional protective provisions
-                   - Clarification opportunities
-                   - Risk mitigation enhancements
-
-                Provide specific, actionable recommendations with exact language suggestions.
-            """,
-
-            'compliance_review': """
-                You are a regulatory compliance specialist reviewing legal documents.
-
-                Document: {document_text}
-                Industry/Sector: {industry}
-                Applicable Regulations: {regulations}
-                Compliance Requirements: {compliance_reqs}
-
-                Conduct comprehensive compliance review:
-
-                1. REGULATORY COMPLIANCE ASSESSMENT
-                   - Applicable law identification
-                   - Compliance requirement mapping
-                   - Regulatory gap analysis
-                   - Industry standard adherence
-
-                2. COMPLIANCE RISK EVALUATION (Score 1-10)
-                   - Regulatory violation risks
-                   - Enforcement action likelihood
-                   - Penalty exposure assessment
-                   - Reputational risk factors
-
-                3. REQUIRED MODIFICATIONS
-                   - Mandatory compliance updates
-                   - Recommended safety provisions
-                   - Regulatory filing requirements
-                   - Documentation improvements
-
-                4. ONGOING COMPLIANCE REQUIREMENTS
-                   - Monitoring obligations
-                   - Reporting requirements
-                   - Review and update schedules
-                   - Training and implementation needs
-
-                Focus on specific compliance gaps and actionable remediation steps.
-            """
+    # Regulations applicable by industry
+    REGULATION_MAP = {
+        'employment': ('FLSA', 'ADA', 'Title VII', 'FMLA'),
+        'healthcare': ('HIPAA', 'HITECH', 'FDA', 'ACA'),
+        'financial': ('SOX', 'GDPR', 'PCI DSS', 'CCPA'),
+        'technology': ('GDPR', 'CCPA', 'COPPA', 'CAN-SPAM'),
+        'general': ('UCC', 'FTC Act', 'Consumer Protection')
+    }
+
+    # Weights of the review scores in the overall document score
+    SCORE_WEIGHTS = {
+        'compliance': 0.3,
+        'risk': 0.3,
+        'enforceability': 0.2,
+        'legal': 0.2
+    }
+
+    # Document analysis templates
+    ANALYSIS_PROMPTS = {
+        'contract_review': """
+            You are an expert contract review attorney analyzing a legal document.
+
+            Document Type: {document_type}
+            Document Text: {document_text}
+            Standard Contract Templates: {templates}
+            Review Purpose: {review_purpose}
+
+            Provide comprehensive contract analysis:
+
+            1. DOCUMENT OVERVIEW
+               - Contract type and purpose
+               - Parties identification
+               - Key terms summary
+               - Effective dates and duration
+
+            2. LEGAL COMPLIANCE ANALYSIS (Score 1-10)
+               - Regulatory compliance assessment
+               - Legal requirement adherence
+               - Statutory compliance verification
+               - Industry standard alignment
+
+            3. RISK ASSESSMENT (Score 1-10)
+               - High-risk provisions identification
+               - Liability exposure analysis
+               - Indemnification risks
+               - Termination and breach consequences
+
+            4. ENFORCEABILITY ANALYSIS (Score 1-10)
+               - Legal enforceability probability
+               - Potential enforceability challenges
+               - Jurisdiction and governing law issues
+               - Dispute resolution mechanisms
+
+            5. OBLIGATION ANALYSIS
+               - Client obligations and responsibilities
+               - Counterparty obligations
+               - Performance standards and metrics
+               - Compliance requirements
+
+            6. RECOMMENDATIONS
+               - Suggested modifications
+               - Risk mitigation strategies
+               - Negotiation priorities
+               - Alternative clause suggestions
+
+            Focus on practical, actionable insights with specific clause references.
+        """,
+
+        'clause_analysis': """
+            You are a contract clause specialist analyzing specific provisions.
+
+            Clause Text: {clause_text}
+            Clause Type: {clause_type}
+            Contract Context: {contract_context}
+            Standard Clauses: {standard_clauses}
+
+            Provide detailed clause analysis:
+
+            1. CLAUSE INTERPRETATION
+               - Plain language meaning
+               - Legal implications
+               - Ambiguity identification
+               - Intent determination
+
+            2. RISK EVALUATION
+               - Client risk exposure
+               - Counterparty advantages
+               - Enforcement challenges
+               - Unintended consequences
+
+            3. MARKET COMPARISON
+               - Industry standard comparison
+               - Negotiation positioning
+               - Alternative formulations
+               - Best practice recommendations
+
+            4. IMPROVEMENT SUGGESTIONS
+               - Specific language modifications
+               - Additional protective provisions
+               - Clarification opportunities
+               - Risk mitigation enhancements
+
+            Provide specific, actionable recommendations with exact language suggestions.
+        """,
+
+        'batched_clause_analysis': """
+            You are a contract clause specialist analyzing several provisions of one contract.
+
+            Contract Context: {contract_context}
+            Standard Clauses: {standard_clauses}
+
+            Clauses:
+            {clauses}
+
+            For each clause, give its plain-language interpretation and legal implications,
+            its risk level for the client (high, medium or low), specific improvement
+            suggestions, and exact alternative language where it would help.
+
+            Respond with a JSON array containing one object per clause, in order, with fields
+            clause_number, interpretation, risk_level, improvements and alternative_language.
+        """,
+
+        'compliance_review': """
+            You are a regulatory compliance specialist reviewing legal documents.
+
+            Document: {document_text}
+            Industry/Sector: {industry}
+            Applicable Regulations: {regulations}
+            Compliance Requirements: {compliance_reqs}
+
+            Conduct comprehensive compliance review:
+
+            1. REGULATORY COMPLIANCE ASSESSMENT
+               - Applicable law identification
+               - Compliance requirement mapping
+               - Regulatory gap analysis
+               - Industry standard adherence
+
+            2. COMPLIANCE RISK EVALUATION (Score 1-10)
+               - Regulatory violation risks
+               - Enforcement action likelihood
+               - Penalty exposure assessment
+               - Reputational risk factors
+
+            3. REQUIRED MODIFICATIONS
+               - Mandatory compliance updates
+               - Recommended safety provisions
+               - Regulatory filing requirements
+               - Documentation improvements
+
+            4. ONGOING COMPLIANCE REQUIREMENTS
+               - Monitoring obligations
+               - Reporting requirements
+               - Review and update schedules
+               - Training and implementation needs
+
+            Focus on specific compliance gaps and actionable remediation steps.
+        """
+    }
+
+    # Document type configurations
+    DOCUMENT_TYPES = {
+        'employment': {
+            'key_clauses': ['compensation', 'termination', 'confidentiality', 'non-compete', 'benefits'],
+            'risk_areas': ['discrimination', 'wage compliance', 'termination procedures'],
+            'compliance_areas': ['FLSA', 'ADA', 'Title VII']
+        },
+        'service': {
+            'key_clauses': ['scope of work', 'payment terms', 'intellectual property', 'liability', 'termination'],
+            'risk_areas': ['service level compliance', 'IP ownership', 'liability caps'],
+            'compliance_areas': ['consumer protection', 'data privacy', 'professional licensing']
+        },
+        'nda': {
+            'key_clauses': ['confidential information definition', 'use restrictions', 'return of materials', 'duration'],
+            'risk_areas': ['overly broad definitions', 'enforcement challenges', 'reciprocity issues'],
+            'compliance_areas': ['trade secret law', 'employment restrictions']
+        },
+        'purchase': {
+            'key_clauses': ['purchase price', 'delivery terms', 'warranties', 'risk of loss', 'remedies'],
+            'risk_areas': ['title issues', 'warranty limitations', 'payment risks'],
+            'compliance_areas': ['UCC', 'consumer protection', 'international trade']
         }
-
-        # Document type configurations
-        self.document_types = {
-            'employment': {
-                'key_clauses': ['compensation', 'termination', 'confidentiality', 'non-compete', 'benefits'],
-                'risk_areas': ['discrimination', 'wage compliance', 'termination procedures'],
-                'compliance_areas': ['FLSA', 'ADA', 'Title VII']
-            },
-            'service': {
-                'key_clauses': ['scope of work', 'payment terms', 'intellectual property', 'liability', 'termination'],
-                'risk_areas': ['service level compliance', 'IP ownership', 'liability caps'],
-                'compliance_areas': ['consumer protection', 'data privacy', 'professional licensing']
-            },
-            'nda': {
-                'key_clauses': ['confidential information definition', 'use restrictions', 'return of materials', 'duration'],
-                'risk_areas': ['overly broad definitions', 'enforcement challenges', 'reciprocity issues'],
-                'compliance_areas': ['trade secret law', 'employment restrictions']
+    }
+
+    # Risk areas per document type, paired with the lower-cased form probed against documents
+    RISK_AREA_PROBES = {
+        document_type: tuple((area, area.lower()) for area in config['risk_areas'])
+        for document_type, config in DOCUMENT_TYPES.items()
+    }
+
+    # Structured output for batched clause analysis
+    BATCHED_CLAUSE_SCHEMA = {
+        'type': 'array',
+        'items': {
+            'type': 'object',
+            'properties': {
+                'clause_number': {'type': 'integer'},
+                'interpretation': {'type': 'string'},
+                'risk_level': {'type': 'string'},
+                'improvements': {'type': 'array', 'items': {'type': 'string'}},
+                'alternative_language': {'type': 'array', 'items': {'type': 'string'}}
             },
-            'purchase': {
-                'key_clauses': ['purchase price', 'delivery terms', 'warranties', 'risk of loss', 'remedies'],
-                'risk_areas': ['title issues', 'warranty limitations', 'payment risks'],
-                'compliance_areas': ['UCC', 'consumer protection', 'international trade']
-            }
+            'required': ['clause_number', 'interpretation', 'risk_level', 'improvements']
         }
+    }
+
+    def __init__(self):
+        # Gemini is configured on first use, so lookup-only callers never touch it
+        self._model = None
+
+        # Make sure the contract lookup indexes exist on databases created before they were added
+        self._ensure_indexes()
+
+        # Persistent exact-match cache of model responses, shared across processes
+        self._cache = SemanticResponseCache(prompt_version=PROMPT_VERSION)
+
+    @property
+    def model(self):
+        """Gemini model, configured and built on first access"""
+        if self._model is None:
+            self._model = shared_model()
+        return self._model
+
+    @model.setter
+    def model(self, model):
+        self._model = model
 
     def get_db_connection(self):
-        """Get database connection"""
-        return sqlite3.connect('database/legal_data.db')
+        """Get this thread's persistent, tuned database connection (do not close)"""
+        return get_connection()
+
+    def _ensure_indexes(self):
+        """Create the contract type index and FTS5 index backing template lookups (idempotent)"""
+        try:
+            conn = self.get_db_connection()
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_contracts_type ON contracts(contract_type)")
+            ensure_fts_tables(conn)
+        except sqlite3.Error:
+            # Database not initialized yet; init_database.py creates these with the schema
+            pass
 
     def review_document(self, document_text: str, document_type: str, attorney_id: str = None, review_purpose: str = "general") -> Dict:
         """Conduct comprehensive document review"""
         try:
             # Get relevant contract templates for comparison
-            templates = self._get_contract_templates(document_type)
-
-            # Prepare analysis context
-            analysis_context = {
-                'document_type': document_type,
-                'document_text': document_text,
-                'templates': json.dumps(templates, indent=2),
-                'review_purpose': review_purpose
-            }
+            templates = self._get_contract_templates_json(document_type)
 
             # Generate comprehensive review
-            prompt = self.analysis_prompts['contract_review'].format(**analysis_context)
-            response = self.model.generate_content(prompt)
-            review_analysis = response.text
+            prompt = self._build_review_prompt(document_text, document_type, templates, review_purpose)
+            review_analysis = self._generate(prompt, json_config(REVIEW_SCHEMA))
 
-            # Extract key clauses
-            key_clauses = self._extract_key_clauses(document_text, document_type)
-
-            # Assess risks
-            risk_assessment = self._assess_document_risks(document_text, document_type)
-
-            # Calculate scores
-            scores = self._extract_scores(review_analysis)
-
-            return {
-                'document_type': document_type,
-                'review_analysis': review_analysis,
-                'key_clauses': key_clauses,
-                'risk_assessment': risk_assessment,
-                'compliance_score': scores.get('compliance', 7.0),
-                'risk_score': scores.get('risk', 5.0),
-                'enforceability_score': scores.get('enforceability', 7.0),
-                'overall_score': self._calculate_overall_score(scores),
-                'recommendations': self._extract_recommendations(review_analysis),
-                'red_flags': self._identify_red_flags(document_text, review_analysis),
-                'attorney_id': attorney_id,
-                'review_timestamp': datetime.utcnow().isoformat()
-            }
+            return self._package_review(document_text, document_type, attorney_id, review_analysis)
 
         except Exception as e:
             return {
@@ -221,34 +501,13 @@ class DocumentReviewAgent:
         """Analyze specific contract clause in detail"""
         try:
             # Get standard clauses for comparison
-            standard_clauses = self._get_standard_clauses(clause_type)
-
-            # Prepare clause analysis context
-            clause_context = {
-                'clause_text': clause_text,
-                'clause_type': clause_type,
-                'contract_context': contract_context,
-                'standard_clauses': json.dumps(standard_clauses, indent=2)
-            }
+            standard_clauses = self._get_standard_clauses_json(clause_type)
 
             # Generate clause analysis
-            prompt = self.analysis_prompts['clause_analysis'].format(**clause_context)
-            response = self.model.generate_content(prompt)
-            clause_analysis = response.text
+            prompt = self._build_clause_prompt(clause_text, clause_type, contract_context, standard_clauses)
+            clause_analysis = self._generate(prompt, json_config(CLAUSE_SCHEMA))
 
-            # Evaluate clause strength
-            strength_score = self._evaluate_clause_strength(clause_text, clause_type)
-
-            return {
-                'clause_text': clause_text,
-                'clause_type': clause_type,
-                'clause_analysis': clause_analysis,
-                'strength_score': strength_score,
-                'risk_level': self._assess_clause_risk(clause_text, clause_analysis),
-                'improvements': self._extract_improvements(clause_analysis),
-                'alternative_language': self._suggest_alternatives(clause_analysis),
-                'analysis_timestamp': datetime.utcnow().isoformat()
-            }
+            return self._package_clause(clause_text, clause_type, clause_analysis)
 
         except Exception as e:
             return {
@@ -263,89 +522,517 @@ class DocumentReviewAgent:
             if not regulations:
                 regulations = self._get_applicable_regulations(industry)
 
-            # Build compliance requirements
-            compliance_reqs = self._build_compliance_requirements(industry, regulations)
+            # Generate compliance review
+            prompt = self._build_compliance_prompt(document_text, industry, regulations)
+            compliance_analysis = self._generate(prompt, json_config(COMPLIANCE_SCHEMA))
+
+            return self._package_compliance(industry, regulations, compliance_analysis)
 
-            # Prepare compliance analysis context
-            compliance_context = {
-                'document_text': document_text,
-                'industry': industry,
-                'regulations': json.dumps(regulations, indent=2),
-                'compliance_reqs': json.dumps(compliance_reqs, indent=2)
+        except Exception as e:
+            return {
+                'error': f"Compliance review failed: {str(e)}",
+                'industry': industry
             }
 
-            # Generate compliance review
-            prompt = self.analysis_prompts['compliance_review'].format(**compliance_context)
-            response = self.model.generate_content(prompt)
-            compliance_analysis = response.text
+    def analyze_clauses_batched(self, clauses: List[Tuple[str, str]], contract_context: str = "",
+                                batch_size: int = 5) -> List[Dict]:
+        """Analyze (clause_text, clause_type) pairs with one Gemini call per batch_size clauses"""
+        if not supports_json_mode():
+            # Batched answers are routed back by clause number, which needs JSON mode
+            return [self.analyze_specific_clause(clause_text, clause_type, contract_context)
+                    for clause_text, clause_type in clauses]
+
+        results = []
+        for start in range(0, len(clauses), batch_size):
+            batch = clauses[start:start + batch_size]
+            try:
+                prompt = self._build_batched_clause_prompt(batch, contract_context)
+                analysis = self._generate(prompt, self._batched_clause_config(len(batch)))
+                results.extend(self._package_clause_batch(batch, analysis))
+            except Exception as e:
+                results.extend(
+                    {'error': f"Clause analysis failed: {str(e)}", 'clause_type': clause_type}
+                    for _, clause_type in batch
+                )
+
+        return results
+
+    async def aanalyze_clauses_batched(self, clauses: List[Tuple[str, str]], contract_context: str = "",
+                                       batch_size: int = 5) -> List[Dict]:
+        """Async variant of analyze_clauses_batched; the batches run concurrently"""
+        if not supports_json_mode():
+            return list(await asyncio.gather(*(
+                self.aanalyze_specific_clause(clause_text, clause_type, contract_context)
+                for clause_text, clause_type in clauses
+            )))
+
+        async def analyze_batch(batch: List[Tuple[str, str]]) -> List[Dict]:
+            try:
+                prompt = await asyncio.to_thread(self._build_batched_clause_prompt, batch, contract_context)
+                analysis = await self._agen(prompt, self._batched_clause_config(len(batch)))
+                return self._package_clause_batch(batch, analysis)
+            except Exception as e:
+                return [
+                    {'error': f"Clause analysis failed: {str(e)}", 'clause_type': clause_type}
+                    for _, clause_type in batch
+                ]
 
-            # Extract compliance score
-            compliance_score = self._extract_compliance_score(compliance_analysis)
+        batches = await asyncio.gather(*(
+            analyze_batch(clauses[start:start + batch_size]) for start in range(0, len(clauses), batch_size)
+        ))
+        return [result for batch in batches for result in batch]
 
-            # Identify compliance gaps
-            compliance_gaps = self._identify_compliance_gaps(compliance_analysis)
+    def _cached_response(self, prompt_hash: str) -> Optional[str]:
+        """Look up a response in the in-process memo, then the persistent cache"""
+        with _RESPONSE_MEMO_LOCK:
+            cached = _RESPONSE_MEMO.get(prompt_hash)
+        if cached is not None:
+            return cached
+
+        try:
+            cached = self._cache.get_by_hash(prompt_hash)
+        except Exception:
+            # Cache failures never block a review
+            return None
+
+        if cached is not None:
+            with _RESPONSE_MEMO_LOCK:
+                _RESPONSE_MEMO[prompt_hash] = cached
+        return cached
+
+    def _remember_response(self, prompt_hash: str, prompt: str, response_text: str):
+        """Store a response in both cache layers"""
+        with _RESPONSE_MEMO_LOCK:
+            _RESPONSE_MEMO[prompt_hash] = response_text
+        try:
+            self._cache.put(prompt, response_text)
+        except Exception:
+            pass
+
+    def _cache_key(self, prompt: str, generation_config: Dict = None) -> str:
+        """Cache key text; the same prompt answered as JSON and as prose must not collide"""
+        if not generation_config:
+            return prompt
+        return prompt + '\n' + json.dumps(generation_config, sort_keys=True)
+
+    def _generate(self, prompt: str, generation_config: Dict = None) -> str:
+        """Generate review text, serving repeated prompts from cache"""
+        cache_key = self._cache_key(prompt, generation_config)
+        prompt_hash = SemanticResponseCache.hash_prompt(cache_key)
+        cached = self._cached_response(prompt_hash)
+        if cached is not None:
+            return cached
+
+        response = self.model.generate_content(prompt, generation_config=generation_config)
+        self._remember_response(prompt_hash, cache_key, response.text)
+        return response.text
+
+    async def _agen(self, prompt: str, generation_config: Dict = None) -> str:
+        """Generate content without blocking the event loop, serving repeated prompts from cache"""
+        cache_key = self._cache_key(prompt, generation_config)
+        prompt_hash = SemanticResponseCache.hash_prompt(cache_key)
+        cached = await asyncio.to_thread(self._cached_response, prompt_hash)
+        if cached is not None:
+            return cached
+
+        response = await self.model.generate_content_async(prompt, generation_config=generation_config)
+        await asyncio.to_thread(self._remember_response, prompt_hash, cache_key, response.text)
+        return response.text
+
+    def stream_review_document(self, document_text: str, document_type: str, attorney_id: str = None,
+                               review_purpose: str = "general") -> Iterator[Dict]:
+        """Review a document while Gemini streams, yielding the scores before the full result"""
+        try:
+            templates = self._get_contract_templates_json(document_type)
+            prompt = self._build_review_prompt(document_text, document_type, templates, review_purpose)
+            prompt_hash = SemanticResponseCache.hash_prompt(prompt)
+
+            review_analysis = self._cached_response(prompt_hash)
+            if review_analysis is None:
+                review_analysis = ''
+                scores_sent = False
+                for chunk in self.model.generate_content(prompt, stream=True):
+                    review_analysis += chunk.text
+                    if not scores_sent and _SCORED_SECTIONS_DONE_RE.search(review_analysis):
+                        scores_sent = True
+                        yield self._score_event(review_analysis)
+
+                self._remember_response(prompt_hash, prompt, review_analysis)
 
+            yield {'event': 'complete',
+                   'result': self._package_review(document_text, document_type, attorney_id, review_analysis)}
+
+        except Exception as e:
+            yield {'event': 'error', 'error': f"Document review failed: {str(e)}", 'document_type': document_type}
+
+    async def astream_review_document(self, document_text: str, document_type: str, attorney_id: str = None,
+                                      review_purpose: str = "general") -> AsyncIterator[Dict]:
+        """Async variant of stream_review_document"""
+        try:
+            templates = await asyncio.to_thread(self._get_contract_templates_json, document_type)
+            prompt = self._build_review_prompt(document_text, document_type, templates, review_purpose)
+            prompt_hash = SemanticResponseCache.hash_prompt(prompt)
+
+            review_analysis = await asyncio.to_thread(self._cached_response, prompt_hash)
+            if review_analysis is None:
+                review_analysis = ''
+                scores_sent = False
+                async for chunk in await self.model.generate_content_async(prompt, stream=True):
+                    review_analysis += chunk.text
+                    if not scores_sent and _SCORED_SECTIONS_DONE_RE.search(review_analysis):
+                        scores_sent = True
+                        yield self._score_event(review_analysis)
+
+                await asyncio.to_thread(self._remember_response, prompt_hash, prompt, review_analysis)
+
+            yield {'event': 'complete',
+                   'result': self._package_review(document_text, document_type, attorney_id, review_analysis)}
+
+        except Exception as e:
+            yield {'event': 'error', 'error': f"Document review failed: {str(e)}", 'document_type': document_type}
+
+    def _score_event(self, partial_analysis: str) -> Dict:
+        """Scores extracted from a partial review whose scored sections are complete"""
+        scores = self._extract_scores(partial_analysis)
+        return {
+            'event': 'scores',
+            'compliance_score': scores.get('compliance', 7.0),
+            'risk_score': scores.get('risk', 5.0),
+            'enforceability_score': scores.get('enforceability', 7.0),
+            'overall_score': self._calculate_overall_score(scores)
+        }
+
+    async def areview_document(self, document_text: str, document_type: str, attorney_id: str = None,
+                               review_purpose: str = "general") -> Dict:
+        """Async variant of review_document"""
+        try:
+            templates = await asyncio.to_thread(self._get_contract_templates_json, document_type)
+
+            prompt = self._build_review_prompt(document_text, document_type, templates, review_purpose)
+            review_analysis = await self._agen(prompt, json_config(REVIEW_SCHEMA))
+
+            return self._package_review(document_text, document_type, attorney_id, review_analysis)
+
+        except Exception as e:
             return {
-                'industry': industry,
-                'applicable_regulations': regulations,
-                'compliance_analysis': compliance_analysis,
-                'compliance_score': compliance_score,
-                'compliance_gaps': compliance_gaps,
-                'required_modifications': self._extract_required_modifications(compliance_analysis),
-                'compliance_risks': self._assess_compliance_risks(compliance_analysis),
-                'remediation_timeline': self._suggest_remediation_timeline(compliance_gaps),
-                'review_timestamp': datetime.utcnow().isoformat()
+                'error': f"Document review failed: {str(e)}",
+                'document_type': document_type
             }
 
+    async def aanalyze_specific_clause(self, clause_text: str, clause_type: str, contract_context: str = "") -> Dict:
+        """Async variant of analyze_specific_clause"""
+        try:
+            standard_clauses = await asyncio.to_thread(self._get_standard_clauses_json, clause_type)
+
+            prompt = self._build_clause_prompt(clause_text, clause_type, contract_context, standard_clauses)
+            clause_analysis = await self._agen(prompt, json_config(CLAUSE_SCHEMA))
+
+            return self._package_clause(clause_text, clause_type, clause_analysis)
+
+        except Exception as e:
+            return {
+                'error': f"Clause analysis failed: {str(e)}",
+                'clause_type': clause_type
+            }
+
+    async def acompliance_review(self, document_text: str, industry: str, regulations: List[str] = None) -> Dict:
+        """Async variant of compliance_review"""
+        try:
+            if not regulations:
+                regulations = self._get_applicable_regulations(industry)
+
+            prompt = self._build_compliance_prompt(document_text, industry, regulations)
+            compliance_analysis = await self._agen(prompt, json_config(COMPLIANCE_SCHEMA))
+
+            return self._package_compliance(industry, regulations, compliance_analysis)
+
         except Exception as e:
             return {
                 'error': f"Compliance review failed: {str(e)}",
                 'industry': industry
             }
 
+    async def areview_document_deep(self, document_text: str, document_type: str, industry: str = "general",
+                                    attorney_id: str = None, review_purpose: str = "general") -> Dict:
+        """Run the contract review, per-clause analyses and compliance review concurrently"""
+        # Key clauses come from the document text alone, so every Gemini call can start at once.
+        # Both heading patterns may match the same clause; analyze each clause type once.
+        key_clauses = {}
+        for clause in self._extract_key_clauses(document_text, document_type):
+            key_clauses.setdefault(clause['clause_type'], clause)
+
+        document_review, compliance, clause_analyses = await asyncio.gather(
+            self.areview_document(document_text, document_type, attorney_id, review_purpose),
+            self.acompliance_review(document_text, industry),
+            self.aanalyze_clauses_batched(
+                [(clause['clause_text'], clause['clause_type']) for clause in key_clauses.values()],
+                document_type
+            )
+        )
+
+        return {
+            'document_review': document_review,
+            'clause_analyses': clause_analyses,
+            'compliance_review': compliance
+        }
+
+    def review_document_deep(self, document_text: str, document_type: str, industry: str = "general",
+                             attorney_id: str = None, review_purpose: str = "general") -> Dict:
+        """Synchronous entry point for the concurrent deep document review"""
+        return asyncio.run(
+            self.areview_document_deep(document_text, document_type, industry, attorney_id, review_purpose)
+        )
+
+    async def areview_documents_batch(self, docs: List[Dict], max_concurrency: int = 4) -> List[Dict]:
+        """Review many documents concurrently, throttled to respect Gemini rate limits"""
+        semaphore = asyncio.Semaphore(max_concurrency)
+
+        async def review_one(doc: Dict) -> Dict:
+            async with semaphore:
+                return await self.areview_document(
+                    doc.get('document_text', ''),
+                    doc.get('document_type', ''),
+                    doc.get('attorney_id'),
+                    doc.get('review_purpose', 'general')
+                )
+
+        return await asyncio.gather(*(review_one(doc) for doc in docs))
+
+    def review_documents_batch(self, docs: List[Dict], max_concurrency: int = 4) -> List[Dict]:
+        """Synchronous entry point for batch document review"""
+        return asyncio.run(self.areview_documents_batch(docs, max_concurrency))
+
+    def _build_review_prompt(self, document_text: str, document_type: str, templates: str,
+                             review_purpose: str) -> str:
+        """Format the contract review prompt around the serialized templates"""
+        analysis_context = {
+            'document_type': document_type,
+            'document_text': document_text,
+            'templates': templates,
+            'review_purpose': review_purpose
+        }
+        return self.ANALYSIS_PROMPTS['contract_review'].format(**analysis_context)
+
+    def _package_review(self, document_text: str, document_type: str, attorney_id: str, review_analysis: str) -> Dict:
+        """Build the document review result from the model output (structured JSON or prose)"""
+        # Extract key clauses
+        key_clauses = self._extract_key_clauses(document_text, document_type)
+
+        # Assess risks; the lower-cased text and one keyword scan are shared by the risk and red-flag helpers
+        doc_lower = document_text.lower()
+        keywords = _scan_keywords(doc_lower)
+        risk_assessment = self._assess_document_risks(document_text, document_type, keywords, doc_lower)
+
+        data = _parse_structured(review_analysis)
+        if data is not None:
+            review_analysis = data.get('analysis', '')
+            scores = {}
+            for score_type in ('compliance', 'risk', 'enforceability'):
+                score = _score(data, f'{score_type}_score')
+                if score is not None:
+                    scores[score_type] = score
+            recommendations = data.get('recommendations', [])[:10]
+            red_flags = self._identify_red_flags(document_text, '', keywords) + data.get('red_flags', [])[:5]
+        else:
+            # Prose response (streaming, or the model ignored the schema): fall back to the regex extractors
+            scores, recommendations, concerns = self._parse_review_analysis(review_analysis)
+            red_flags = self._identify_red_flags(document_text, '', keywords) + concerns
+
+        return {
+            'document_type': document_type,
+            'review_analysis': review_analysis,
+            'key_clauses': key_clauses,
+            'risk_assessment': risk_assessment,
+            'compliance_score': scores.get('compliance', 7.0),
+            'risk_score': scores.get('risk', 5.0),
+            'enforceability_score': scores.get('enforceability', 7.0),
+            'overall_score': self._calculate_overall_score(scores),
+            'recommendations': recommendations,
+            'red_flags': red_flags,
+            'attorney_id': attorney_id,
+            'review_timestamp': datetime.utcnow().isoformat()
+        }
+
+    def _build_clause_prompt(self, clause_text: str, clause_type: str, contract_context: str,
+                             standard_clauses: str) -> str:
+        """Format the clause analysis prompt around the serialized standard clauses"""
+        clause_context = {
+            'clause_text': clause_text,
+            'clause_type': clause_type,
+            'contract_context': contract_context,
+            'standard_clauses': standard_clauses
+        }
+        return self.ANALYSIS_PROMPTS['clause_analysis'].format(**clause_context)
+
+    def _package_clause(self, clause_text: str, clause_type: str, clause_analysis: str) -> Dict:
+        """Build the clause analysis result from the model output (structured JSON or prose)"""
+        # Evaluate clause strength
+        strength_score = self._evaluate_clause_strength(clause_text, clause_type)
+
+        data = _parse_structured(clause_analysis)
+        if data is not None:
+            clause_analysis = data.get('analysis', '')
+            risk_level = str(data.get('risk_level', '')).lower()
+            if risk_level not in ('high', 'medium', 'low'):
+                risk_level = self._assess_clause_risk(clause_text, clause_analysis)
+            improvements = data.get('improvements', [])[:5]
+            alternatives = data.get('alternative_language', [])[:3]
+        else:
+            risk_level = self._assess_clause_risk(clause_text, clause_analysis)
+            improvements = self._extract_improvements(clause_analysis)
+            alternatives = self._suggest_alternatives(clause_analysis)
+
+        return {
+            'clause_text': clause_text,
+            'clause_type': clause_type,
+            'clause_analysis': clause_analysis,
+            'strength_score': strength_score,
+            'risk_level': risk_level,
+            'improvements': improvements,
+            'alternative_language': alternatives,
+            'analysis_timestamp': datetime.utcnow().isoformat()
+        }
+
+    def _build_batched_clause_prompt(self, clauses: List[Tuple[str, str]], contract_context: str) -> str:
+        """Format one prompt covering several clauses, numbered from 1"""
+        standard_clauses = {
+            clause_type: self._get_standard_clauses(clause_type)
+            for clause_type in dict.fromkeys(clause_type for _, clause_type in clauses)
+        }
+        numbered = '\n'.join(
+            f"[{number}] ({clause_type}) {clause_text}"
+            for number, (clause_text, clause_type) in enumerate(clauses, 1)
+        )
+
+        return self.ANALYSIS_PROMPTS['batched_clause_analysis'].format(
+            contract_context=contract_context,
+            standard_clauses=_prompt_json(standard_clauses),
+            clauses=numbered
+        )
+
+    def _batched_clause_config(self, clause_count: int) -> Dict:
+        """JSON config for a batched clause call, with an output budget per clause"""
+        return json_config(self.BATCHED_CLAUSE_SCHEMA, MAX_OUTPUT_TOKENS * clause_count)
+
+    def _package_clause_batch(self, clauses: List[Tuple[str, str]], analysis_text: str) -> List[Dict]:
+        """Route each entry of a batched JSON response back into the analyze_specific_clause result shape"""
+        entries = json.loads(analysis_text)
+        by_number = {entry.get('clause_number'): entry for entry in entries if isinstance(entry, dict)}
+
+        results = []
+        for number, (clause_text, clause_type) in enumerate(clauses, 1):
+            entry = by_number.get(number)
+            if entry is None:
+                results.append({'error': "Clause analysis missing from batched response", 'clause_type': clause_type})
+                continue
+
+            interpretation = entry.get('interpretation', '')
+            risk_level = str(entry.get('risk_level', '')).lower()
+            results.append({
+                'clause_text': clause_text,
+                'clause_type': clause_type,
+                'clause_analysis': interpretation,
+                'strength_score': self._evaluate_clause_strength(clause_text, clause_type),
+                'risk_level': risk_level if risk_level in ('high', 'medium', 'low')
+                              else self._assess_clause_risk(clause_text, interpretation),
+                'improvements': entry.get('improvements', [])[:5],
+                'alternative_language': entry.get('alternative_language', [])[:3],
+                'analysis_timestamp': datetime.utcnow().isoformat()
+            })
+
+        return results
+
+    def _build_compliance_prompt(self, document_text: str, industry: str, regulations: List[str]) -> str:
+        """Format the compliance review prompt"""
+        # Build compliance requirements
+        compliance_reqs = self._build_compliance_requirements(industry, regulations)
+
+        compliance_context = {
+            'document_text': document_text,
+            'industry': industry,
+            'regulations': _prompt_json(regulations),
+            'compliance_reqs': _prompt_json(compliance_reqs)
+        }
+        return self.ANALYSIS_PROMPTS['compliance_review'].format(**compliance_context)
+
+    def _package_compliance(self, industry: str, regulations: List[str], compliance_analysis: str) -> Dict:
+        """Build the compliance review result from the model output (structured JSON or prose)"""
+        data = _parse_structured(compliance_analysis)
+        if data is not None:
+            compliance_analysis = data.get('analysis', '')
+            compliance_score = _score(data, 'compliance_score')
+            if compliance_score is None:
+                compliance_score = 7.0
+            compliance_gaps = data.get('compliance_gaps', [])[:5]
+            required_modifications = data.get('required_modifications', [])[:5]
+        else:
+            compliance_score = self._extract_compliance_score(compliance_analysis)
+            compliance_gaps = self._identify_compliance_gaps(compliance_analysis)
+            required_modifications = self._extract_required_modifications(compliance_analysis)
+
+        return {
+            'industry': industry,
+            'applicable_regulations': regulations,
+            'compliance_analysis': compliance_analysis,
+            'compliance_score': compliance_score,
+            'compliance_gaps': compliance_gaps,
+            'required_modifications': required_modifications,
+            'compliance_risks': self._assess_compliance_risks(compliance_analysis),
+            'remediation_timeline': self._suggest_remediation_timeline(compliance_gaps),
+            'review_timestamp': datetime.utcnow().isoformat()
+        }
+
+    @cached_lookup(_CONTRACT_CACHE)
     def _get_contract_templates(self, document_type: str, limit: int = 3) -> List[Dict]:
         """Get contract templates for comparison"""
-        conn = self.get_db_connection()
-        cursor = conn.cursor()
+        cursor = self.get_db_connection().cursor()
+        cursor.row_factory = dict_row
+
+        match = build_match_query(document_type, ('contract_type',))
+        if not match:
+            return []
 
         cursor.execute("""
             SELECT contract_type, contract_name, standard_clauses, risk_factors
             FROM contracts
-            WHERE contract_type LIKE ?
+            WHERE rowid IN (SELECT rowid FROM contracts_fts WHERE contracts_fts MATCH ?)
             LIMIT ?
-        """, (f"%{document_type}%", limit))
+        """, (match, limit))
+
+        return cursor.fetchall()
 
-        results = cursor.fetchall()
-        conn.close()
-        return [dict(zip([col[0] for col in cursor.description], row)) for row in results]
+    @cached_lookup(_CONTRACT_CACHE)
+    def _get_contract_templates_json(self, document_type: str) -> str:
+        """Contract templates serialized for the review prompt, cached alongside the rows"""
+        return _prompt_json(self._get_contract_templates(document_type))
 
     def _extract_key_clauses(self, document_text: str, document_type: str) -> List[Dict]:
         """Extract and identify key clauses from document"""
         key_clauses = []
 
-        if document_type.lower() in self.document_types:
-            expected_clauses = self.document_types[document_type.lower()]['key_clauses']
+        if document_type.lower() in self.DOCUMENT_TYPES:
+            expected_clauses = tuple(self.DOCUMENT_TYPES[document_type.lower()]['key_clauses'])
 
-            for clause_type in expected_clauses:
-                # Simple pattern matching for clause identification
-                patterns = [
-                    rf'{clause_type}[:\s]+(.*?)(?:\n\n|\n[A-Z]|\Z)',
-                    rf'(?:^|\n)\s*\d+\.?\s*{clause_type}[:\s]+(.*?)(?:\n\n|\n\d+\.|\Z)',
-                ]
+            # Simple pattern matching for clause identification, all heading patterns in one scan
+            pattern, slots = _clause_alternation(expected_clauses)
+            first_matches = {}
+            for match in pattern.finditer(document_text):
+                first_matches.setdefault(slots[match.lastindex - 1], match)  # Take first match per pattern
+                if len(first_matches) == len(slots):
+                    break
 
-                for pattern in patterns:
-                    matches = re.finditer(pattern, document_text, re.IGNORECASE | re.MULTILINE | re.DOTALL)
-                    for match in matches:
-                        key_clauses.append({
-                            'clause_type': clause_type,
-                            'clause_text': match.group(1).strip()[:500],  # Limit length
-                            'position': match.start()
-                        })
-                        break  # Take first match for each clause type
+            for slot in sorted(first_matches):
+                match = first_matches[slot]
+                key_clauses.append({
+                    'clause_type': expected_clauses[slot[0]],
+                    'clause_text': match.group(match.lastindex).strip()[:500],  # Limit length
+                    'position': match.start()
+                })
 
         return key_clauses
 
-    def _assess_document_risks(self, document_text: str, document_type: str) -> Dict:
+    def _assess_document_risks(self, document_text: str, document_type: str, keywords: set = None,
+                               doc_lower: str = None) -> Dict:
         """Assess risks in the document"""
         risk_factors = {
             'high_risk': [],
@@ -353,18 +1040,23 @@ class DocumentReviewAgent:
             'low_risk': []
         }
 
-        if document_type.lower() in self.document_types:
-            risk_areas = self.document_types[document_type.lower()]['risk_areas']
+        risk_areas = self.RISK_AREA_PROBES.get(document_type.lower())
+        if risk_areas:
+            if doc_lower is None:
+                doc_lower = document_text.lower()
+            if keywords is None:
+                keywords = _scan_keywords(doc_lower)
+
+            # Simple risk classification - in practice, this would be more sophisticated.
+            # The level depends only on the document's keywords, so it is decided once.
+            if not keywords.isdisjoint(_HIGH_RISK_TERMS):
+                level = 'high_risk'
+            elif not keywords.isdisjoint(_MEDIUM_RISK_TERMS):
+                level = 'medium_risk'
+            else:
+                level = 'low_risk'
 
-            for risk_area in risk_areas:
-                if risk_area.lower() in document_text.lower():
-                    # Simple risk classification - in practice, this would be more sophisticated
-                    if 'unlimited' in document_text.lower() or 'sole discretion' in document_text.lower():
-                        risk_factors['high_risk'].append(risk_area)
-                    elif 'reasonable' in document_text.lower() or 'material' in document_text.lower():
-                        risk_factors['medium_risk'].append(risk_area)
-                    else:
-                        risk_factors['low_risk'].append(risk_area)
+            risk_factors[level] = [risk_area for risk_area, area_lower in risk_areas if area_lower in doc_lower]
 
         return risk_factors
 
@@ -372,14 +1064,8 @@ class DocumentReviewAgent:
         """Extract numerical scores from analysis"""
         scores = {}
 
-        # Extract different types of scores
-        score_types = ['compliance', 'risk', 'enforceability', 'legal', 'overall']
-
-        for score_type in score_types:
-            pattern = rf'{score_type}.*?score.*?(\d+(?:\.\d+)?)'
-            match = re.search(pattern, analysis_text, re.IGNORECASE)
-            if match:
-                scores[score_type] = float(match.group(1))
+        # Extract the different types of scores in one scan
+        _find_scores(analysis_text, scores)
 
         return scores
 
@@ -389,17 +1075,10 @@ class DocumentReviewAgent:
             return 6.0
 
         # Weighted average of available scores
-        weights = {
-            'compliance': 0.3,
-            'risk': 0.3,
-            'enforceability': 0.2,
-            'legal': 0.2
-        }
-
         total_score = 0
         total_weight = 0
 
-        for score_type, weight in weights.items():
+        for score_type, weight in self.SCORE_WEIGHTS.items():
             if score_type in scores:
                 total_score += scores[score_type] * weight
                 total_weight += weight
@@ -408,147 +1087,128 @@ class DocumentReviewAgent:
 
     def _extract_recommendations(self, analysis_text: str) -> List[str]:
         """Extract recommendations from analysis"""
-        recommendations = []
-        lines = analysis_text.split('\n')
-        in_recommendations = False
+        return self._parse_bulleted_sections(analysis_text, _RECOMMENDATION_SECTIONS)['recommendations']
 
-        for line in lines:
-            if 'recommendation' in line.lower():
-                in_recommendations = True
-                continue
-            elif in_recommendations and line.strip():
-                if line.strip().startswith(('-', '*', '•')) or re.match(r'^\d+\.', line.strip()):
-                    recommendations.append(line.strip().lstrip('- *•0123456789. '))
-                elif line.strip().isupper():
-                    break
+    def _parse_bulleted_sections(self, analysis_text: str, sections: Dict[str, Tuple[Tuple[str, ...], int]]) -> Dict[str, List[str]]:
+        """Collect the bullet items following each section's trigger keywords in one pass over the lines"""
+        collector = _SectionCollector(sections)
 
-        return recommendations[:10]  # Limit to top 10
+        for line in analysis_text.splitlines():
+            collector.feed(line, line.lower())
+            if not collector.open_sections:
+                break
 
-    def _identify_red_flags(self, document_text: str, analysis_text: str) -> List[str]:
+        return collector.items
+
+    def _parse_review_analysis(self, analysis_text: str) -> Tuple[Dict, List[str], List[str]]:
+        """Scores, recommendations and concern sentences of a prose review, from one walk over its lines"""
+        scores = {}
+        recommendations = _SectionCollector(_RECOMMENDATION_SECTIONS)
+        mentions_concerns = False
+
+        for line in analysis_text.splitlines():
+            line_lower = line.lower()
+            if len(scores) < len(_SCORE_TYPES):
+                _find_scores(line, scores)
+            if recommendations.open_sections:
+                recommendations.feed(line, line_lower)
+            if not mentions_concerns:
+                mentions_concerns = 'red flag' in line_lower or 'concern' in line_lower
+
+        # Concern sentences span lines, so they are split out only when the walk saw one
+        concerns = self._extract_concerns(analysis_text) if mentions_concerns else []
+        return scores, recommendations.items['recommendations'], concerns
+
+    def _identify_red_flags(self, document_text: str, analysis_text: str, keywords: set = None) -> List[str]:
         """Identify potential red flags in the document"""
         red_flags = []
 
         # Common red flag patterns
-        red_flag_patterns = [
-            'unlimited liability',
-            'sole discretion',
-            'perpetual',
-            'irrevocable',
-            'personal guarantee',
-            'liquidated damages'
-        ]
+        if keywords is None:
+            keywords = _scan_keywords(document_text.lower())
 
-        for pattern in red_flag_patterns:
-            if pattern in document_text.lower():
+        for pattern in _RED_FLAG_PATTERNS:
+            if pattern in keywords:
                 red_flags.append(f"Contains {pattern} clause")
 
         # Extract red flags mentioned in analysis
-        if 'red flag' in analysis_text.lower() or 'concern' in analysis_text.lower():
-            # Simple extraction - could be enhanced
-            concern_sentences = [
-                sentence.strip() for sentence in analysis_text.split('.')
-                if 'concern' in sentence.lower() or 'red flag' in sentence.lower()
-            ]
-            red_flags.extend(concern_sentences[:5])
+        red_flags.extend(self._extract_concerns(analysis_text))
 
         return red_flags
 
+    def _extract_concerns(self, analysis_text: str) -> List[str]:
+        """Sentences of the analysis raising a concern or red flag"""
+        analysis_lower = analysis_text.lower()
+        if 'red flag' not in analysis_lower and 'concern' not in analysis_lower:
+            return []
+
+        # Simple extraction - could be enhanced; lowering preserves the '.' boundaries
+        concern_sentences = [
+            sentence.strip()
+            for sentence, sentence_lower in zip(analysis_text.split('.'), analysis_lower.split('.'))
+            if 'concern' in sentence_lower or 'red flag' in sentence_lower
+        ]
+        return concern_sentences[:5]
+
+    @cached_lookup(_CONTRACT_CACHE)
     def _get_standard_clauses(self, clause_type: str, limit: int = 3) -> List[Dict]:
         """Get standard clauses for comparison"""
-        conn = self.get_db_connection()
-        cursor = conn.cursor()
+        cursor = self.get_db_connection().cursor()
+        cursor.row_factory = dict_row
+
+        match = build_match_query(clause_type, ('standard_clauses',))
+        if not match:
+            return []
 
         cursor.execute("""
             SELECT contract_type, standard_clauses
             FROM contracts
-            WHERE standard_clauses LIKE ?
+            WHERE rowid IN (SELECT rowid FROM contracts_fts WHERE contracts_fts MATCH ?)
             LIMIT ?
-        """, (f"%{clause_type}%", limit))
+        """, (match, limit))
 
-        results = cursor.fetchall()
-        conn.close()
-        return [dict(zip([col[0] for col in cursor.description], row)) for row in results]
+        return cursor.fetchall()
+
+    @cached_lookup(_CONTRACT_CACHE)
+    def _get_standard_clauses_json(self, clause_type: str) -> str:
+        """Standard clauses serialized for the clause prompt, cached alongside the rows"""
+        return _prompt_json(self._get_standard_clauses(clause_type))
 
     def _evaluate_clause_strength(self, clause_text: str, clause_type: str) -> float:
         """Evaluate strength of specific clause"""
-        # Simple scoring based on presence of key terms
-        strength_indicators = {
-            'reasonable': 0.2,
-            'material': 0.2,
-            'written notice': 0.3,
-            'cure period': 0.3,
-            'mutual': 0.2
-        }
-
-        weakness_indicators = {
-            'sole discretion': -0.4,
-            'unlimited': -0.5,
-            'waive': -0.3,
-            'as is': -0.2
-        }
-
-        base_score = 6.0
-        clause_lower = clause_text.lower()
-
-        for indicator, value in strength_indicators.items():
-            if indicator in clause_lower:
-                base_score += value
-
-        for indicator, value in weakness_indicators.items():
-            if indicator in clause_lower:
-                base_score += value
+        # Simple scoring based on presence of key terms, each counted once, found in one scan
+        found = _find_keywords(clause_text.lower(), _CLAUSE_STRENGTH_RE, _CLAUSE_STRENGTH_PREFIXES)
+        base_score = 6.0 + sum(_CLAUSE_STRENGTH_WEIGHTS[indicator] for indicator in found)
 
         return max(1.0, min(10.0, base_score))
 
     def _assess_clause_risk(self, clause_text: str, analysis_text: str) -> str:
         """Assess risk level of clause"""
-        if 'high risk' in analysis_text.lower() or 'significant concern' in analysis_text.lower():
+        analysis_lower = analysis_text.lower()
+        if 'high risk' in analysis_lower or 'significant concern' in analysis_lower:
             return 'high'
-        elif 'medium risk' in analysis_text.lower() or 'moderate concern' in analysis_text.lower():
+        elif 'medium risk' in analysis_lower or 'moderate concern' in analysis_lower:
             return 'medium'
         else:
             return 'low'
 
     def _extract_improvements(self, analysis_text: str) -> List[str]:
         """Extract improvement suggestions"""
-        improvements = []
-        lines = analysis_text.split('\n')
-        in_improvements = False
-
-        for line in lines:
-            if 'improvement' in line.lower() or 'suggestion' in line.lower():
-                in_improvements = True
-                continue
-            elif in_improvements and line.strip():
-                if line.strip().startswith(('-', '*', '•')) or re.match(r'^\d+\.', line.strip()):
-                    improvements.append(line.strip().lstrip('- *•0123456789. '))
-                elif line.strip().isupper():
-                    break
-
-        return improvements[:5]
+        return self._parse_bulleted_sections(analysis_text, {'improvements': (('improvement', 'suggestion'), 5)})['improvements']
 
     def _suggest_alternatives(self, analysis_text: str) -> List[str]:
         """Extract alternative language suggestions"""
         alternatives = []
 
         # Look for quoted text that might be alternative language
-        quote_pattern = r'"([^"]{20,200})"'
-        matches = re.findall(quote_pattern, analysis_text)
+        matches = _QUOTE_RE.findall(analysis_text)
         alternatives.extend(matches[:3])
 
         return alternatives
 
     def _get_applicable_regulations(self, industry: str) -> List[str]:
         """Get applicable regulations for industry"""
-        regulation_map = {
-            'employment': ['FLSA', 'ADA', 'Title VII', 'FMLA'],
-            'healthcare': ['HIPAA', 'HITECH', 'FDA', 'ACA'],
-            'financial': ['SOX', 'GDPR', 'PCI DSS', 'CCPA'],
-            'technology': ['GDPR', 'CCPA', 'COPPA', 'CAN-SPAM'],
-            'general': ['UCC', 'FTC Act', 'Consumer Protection']
-        }
-
-        return regulation_map.get(industry.lower(), regulation_map['general'])
+        return list(self.REGULATION_MAP.get(industry.lower(), self.REGULATION_MAP['general']))
 
     def _build_compliance_requirements(self, industry: str, regulations: List[str]) -> Dict:
         """Build compliance requirements for industry and regulations"""
@@ -562,48 +1222,36 @@ class DocumentReviewAgent:
 
     def _extract_compliance_score(self, analysis_text: str) -> float:
         """Extract compliance score from analysis"""
-        score_match = re.search(r'compliance.*?score.*?(\d+(?:\.\d+)?)', analysis_text, re.IGNORECASE)
+        score_match = _COMPLIANCE_SCORE_RE.search(analysis_text)
         return float(score_match.group(1)) if score_match else 7.0
 
     def _identify_compliance_gaps(self, analysis_text: str) -> List[str]:
         """Identify compliance gaps from analysis"""
         gaps = []
-        lines = analysis_text.split('\n')
 
-        for line in lines:
-            if any(word in line.lower() for word in ['gap', 'missing', 'required', 'must add']):
+        for line in analysis_text.splitlines():
+            if _GAP_RE.search(line):
                 gaps.append(line.strip())
+                if len(gaps) == 5:
+                    break
 
-        return gaps[:5]
+        return gaps
 
     def _extract_required_modifications(self, analysis_text: str) -> List[str]:
         """Extract required modifications"""
-        modifications = []
-        lines = analysis_text.split('\n')
-        in_modifications = False
-
-        for line in lines:
-            if 'modification' in line.lower() or 'required' in line.lower():
-                in_modifications = True
-                continue
-            elif in_modifications and line.strip():
-                if line.strip().startswith(('-', '*', '•')) or re.match(r'^\d+\.', line.strip()):
-                    modifications.append(line.strip().lstrip('- *•0123456789. '))
-                elif line.strip().isupper():
-                    break
-
-        return modifications[:5]
+        return self._parse_bulleted_sections(analysis_text, {'modifications': (('modification', 'required'), 5)})['modifications']
 
     def _assess_compliance_risks(self, analysis_text: str) -> Dict:
         """Assess compliance risks"""
         risks = {'high': [], 'medium': [], 'low': []}
 
-        # Simple risk assessment based on keywords
-        if 'violation' in analysis_text.lower():
+        # Simple risk assessment based on keywords, all found in one scan
+        found = {match.lower() for match in _COMPLIANCE_RISK_RE.findall(analysis_text)}
+        if 'violation' in found:
             risks['high'].append('Regulatory violation risk')
-        if 'penalty' in analysis_text.lower():
+        if 'penalty' in found:
             risks['medium'].append('Penalty exposure')
-        if 'update' in analysis_text.lower():
+        if 'update' in found:
             risks['low'].append('Documentation updates needed')
 
         return risks
@@ -1,143 +1,468 @@
-import google.generativeai as genai
+import asyncio
 import sqlite3
-import os
 from datetime import datetime
-from typing import Dict, List, Optional, Tuple
+from typing import AsyncIterator, Dict, List, Optional, Tuple
 import json
+import orjson
 import re
-from collections import defaultdict
+import textwrap
+from functools import lru_cache
+
+from utils.llm_cache import SemanticResponseCache
+from utils.database import get_connection, dict_row
+from utils.models import MAX_OUTPUT_TOKENS, json_config, shared_model, supports_json_mode
+from utils.full_text_search import build_match_query, ensure_fts_tables
+
+# Namespaces this agent's entries in the shared llm_cache table; bump when prompts change
+PROMPT_VERSION = "precedent-v2"
+
+# Precedent analyses stay valid for a month of repeat questions
+CACHE_TTL_SECONDS = 30 * 24 * 3600
+
+# Outcome words marking a precedent as potentially adverse, as FTS5 expressions matching any of them
+OPPOSING_TERMS = ('against', 'denied', 'dismissed', 'rejected', 'failed')
+_OPPOSING_HOLDING_MATCH = build_match_query(' '.join(OPPOSING_TERMS), ('holding',), any_term=True)
+_OPPOSING_PRINCIPLE_MATCH = build_match_query(' '.join(OPPOSING_TERMS), ('legal_principle',), any_term=True)
+
+# Structured output schemas; the prose analysis rides along so the *_analysis fields stay populated
+_STRING_LIST = {'type': 'array', 'items': {'type': 'string'}}
+DISCOVERY_SCHEMA = {
+    'type': 'object',
+    'properties': {
+        'strategic_recommendations': {**_STRING_LIST, 'description': 'Strategic precedent recommendations'},
+        'analysis': {'type': 'string', 'description': 'The full written analysis covering every requested section'}
+    },
+    'required': ['strategic_recommendations', 'analysis']
+}
+COMPARISON_SCHEMA = {
+    'type': 'object',
+    'properties': {
+        'rankings': {
+            'type': 'array',
+            'description': 'Relevance score of every precedent, 1-10',
+            'items': {
+                'type': 'object',
+                'properties': {'case_name': {'type': 'string'}, 'score': {'type': 'number'}},
+                'required': ['case_name', 'score']
+            }
+        },
+        'strategic_recommendations': {**_STRING_LIST, 'description': 'Strategic citation recommendations'},
+        'distinguishing_strategies': {**_STRING_LIST, 'description': 'Strategies for distinguishing adverse precedents'},
+        'analysis': {'type': 'string', 'description': 'The full written analysis covering every requested section'}
+    },
+    'required': ['rankings', 'strategic_recommendations', 'distinguishing_strategies', 'analysis']
+}
+VALIDATION_SCHEMA = {
+    'type': 'object',
+    'properties': {
+        'overall_validity': {'type': 'string', 'description': 'Overall validity: valid, overruled or uncertain'},
+        'citation_safety': {'type': 'string', 'description': 'Citation safety: safe, caution or review_needed'},
+        'analysis': {'type': 'string', 'description': 'The full written analysis covering every requested section'}
+    },
+    'required': ['overall_validity', 'citation_safety', 'analysis']
+}
+ANALOGY_SCHEMA = {
+    'type': 'object',
+    'properties': {
+        'distinguishing_factors': {**_STRING_LIST, 'description': 'Key distinguishing factors'},
+        'analysis': {'type': 'string', 'description': 'The full written analysis covering every requested section'}
+    },
+    'required': ['distinguishing_factors', 'analysis']
+}
+VALIDITY_STATUSES = ('valid', 'overruled', 'uncertain')
+CITATION_SAFETY_LEVELS = ('safe', 'caution', 'review_needed')
+
+# The ranking section (1) of a comparison is complete once the factual pattern section begins
+_RANKINGS_DONE_RE = re.compile(r'factual pattern analysis', re.IGNORECASE)
+# Overlap kept when rescanning a growing stream, so a heading split across chunks is still found
+_HEADING_OVERLAP = 32
+
+# Stays well under SQLite's default cap of 500 terms in one compound SELECT
+_MAX_UNION_BRANCHES = 200
+
+# Patterns and word lists used by the extraction helpers, built once at import
+_KEY_TERM_RE = re.compile(r'\b[a-z]{4,}\b')  # Terms shorter than four letters are never key terms
+_NUMBERED_RE = re.compile(r'^\d+\.')
+_RECOMMENDATION_KEYWORDS = ('recommend', 'strategic', 'suggest')
+_COMMON_WORDS = frozenset({
+    'the', 'and', 'or', 'but', 'in', 'on', 'at', 'to', 'for', 'of', 'with', 'by', 'a', 'an', 'is', 'was',
+    'are', 'were', 'been', 'have', 'has', 'had', 'will', 'would', 'could', 'should'
+})
+
+
+@lru_cache(maxsize=4096)
+def _key_terms(text: str) -> Tuple[str, ...]:
+    """First ten non-common terms of a text, in order, memoized per distinct text"""
+    # Simple term extraction - remove common words
+    words = _KEY_TERM_RE.findall(text.lower())
+    return tuple([word for word in words if word not in _COMMON_WORDS][:10])
+
+
+def _prompt_json(obj) -> str:
+    """Compact JSON for prompt context; pretty-printing only adds whitespace tokens to every call"""
+    return orjson.dumps(obj, default=str).decode()
+
+
+@lru_cache(maxsize=4096)
+def _key_term_set(text: str) -> frozenset:
+    """Distinct key terms of a text, memoized since the same holdings are scored across searches"""
+    return frozenset(_key_terms(text))
+
+
+# Whole-analysis terms behind the validity and citation-safety verdicts; none spans a line break
+_VERDICT_TERMS = ('valid', 'invalid', 'overruled', 'safe to cite', 'caution', 'risk')
+
+
+@lru_cache(maxsize=32)
+def _parse_analysis(analysis: str) -> Dict:
+    """Split and lowercase an analysis once, collecting what every line-based extractor needs.
+
+    Memoized because one analysis feeds several extractors; the tuples must not be mutated.
+    """
+    recommendations, strategies, factors = [], [], []
+    in_recommendations = recommendations_done = False
+    verdict_terms = set()
+
+    for line, line_lower in zip(analysis.split('\n'), analysis.lower().split('\n')):
+        stripped = line.strip()
+
+        if not recommendations_done:
+            if any(keyword in line_lower for keyword in _RECOMMENDATION_KEYWORDS):
+                in_recommendations = True
+            elif in_recommendations and stripped:
+                if stripped.startswith(('-', '*', '•')) or _NUMBERED_RE.match(stripped):
+                    recommendations.append(stripped.lstrip('- *•0123456789. '))
+                elif stripped.isupper():
+                    recommendations_done = True
+
+        distinguishing = 'distinguish' in line_lower or 'different' in line_lower
+        if distinguishing:
+            strategies.append(stripped)
+        if distinguishing or 'unlike' in line_lower:
+            factors.append(stripped)
+
+        verdict_terms.update(term for term in _VERDICT_TERMS if term in line_lower)
+
+    return {
+        'recommendations': tuple(recommendations),
+        'distinguishing_strategies': tuple(strategies),
+        'distinguishing_factors': tuple(factors),
+        'verdict_terms': frozenset(verdict_terms)
+    }
+
+
+def _jaccard_score(target_terms: frozenset, case_terms: frozenset) -> float:
+    """Jaccard similarity of two term sets scaled to 1-10; the union size follows from the intersection"""
+    intersection = len(target_terms & case_terms)
+    union = len(target_terms) + len(case_terms) - intersection
+    similarity = intersection / union if union > 0 else 0
+    return round(similarity * 10, 1)  # Scale to 1-10
+
+
+@lru_cache(maxsize=1024)
+def _ranking_pattern(case_name: str) -> re.Pattern:
+    """Compiled pattern finding the first score after a case name in a comparison analysis"""
+    return re.compile(rf'{re.escape(case_name)}.*?(\d+(?:\.\d+)?)', re.IGNORECASE)
+
+
+@lru_cache(maxsize=256)
+def _case_name_locator(case_names: tuple) -> re.Pattern:
+    """One pattern finding every position where any of the case names starts, longest name first"""
+    alternation = '|'.join(re.escape(name) for name in case_names)
+    return re.compile(f'(?=({alternation}))', re.IGNORECASE)
+
+
+def _ranking_scores(analysis: str, case_names: List[str]) -> Dict[str, float]:
+    """First score after each case name, keyed by lowercased name, from a single scan of the analysis.
+
+    At any position only the longest matching name is reported, so names it starts
+    with are tried there as well; each name's own pattern then reads its score.
+    """
+    pending = {name.lower(): name for name in case_names}
+    scores = {}
+
+    # An empty name scores the first number anywhere and cannot take part in the alternation
+    if '' in pending:
+        match = _ranking_pattern('').search(analysis)
+        if match:
+            scores[''] = float(match.group(1))
+        del pending['']
+
+    if not pending:
+        return scores
+
+    wanted = len(scores) + len(pending)
+    names = tuple(sorted(pending.values(), key=len, reverse=True))
+    prefixes = {
+        lowered: [other for other in pending if lowered.startswith(other)]
+        for lowered in pending
+    }
+
+    for located in _case_name_locator(names).finditer(analysis):
+        for lowered in prefixes.get(located.group(1).lower(), ()):
+            if lowered in scores:
+                continue
+            match = _ranking_pattern(pending[lowered]).match(analysis, located.start())
+            if match:
+                scores[lowered] = float(match.group(1))
+
+        if len(scores) == wanted:
+            break
+
+    return scores
+
+
+def _parse_structured(response_text: str) -> Optional[Dict]:
+    """Decode a structured response, or None when the model answered in prose"""
+    try:
+        data = json.loads(response_text)
+    except ValueError:
+        return None
+    return data if isinstance(data, dict) else None
+
+
+def _dedent_prompts(templates: Dict[str, str]) -> Dict[str, str]:
+    """Strip the source indentation and surrounding blank lines from prompt templates"""
+    return {name: textwrap.dedent(template).strip() for name, template in templates.items()}
+
 
 class PrecedentMiningAgent:
     """AI agent for discovering and analyzing legal precedents"""
 
+    # Precedent analysis templates, dedented once at import so no indentation whitespace reaches the model
+    PRECEDENT_PROMPTS = _dedent_prompts({
+        'precedent_discovery': """
+            You are a legal precedent research specialist analyzing case precedents.
+
+            Legal Issue: {legal_issue}
+            Jurisdiction: {jurisdiction}
+            Case Facts: {case_facts}
+
+            Available Precedents: {precedent_data}
+            Related Case Law: {case_law_data}
+
+            Provide comprehensive precedent analysis:
+
+            1. BINDING AUTHORITY ANALYSIS
+               - Identify controlling precedents in jurisdiction
+               - Analyze precedential hierarchy and weight
+               - Evaluate binding vs. persuasive authority
+               - Assess jurisdictional applicability
+
+            2. PRECEDENT STRENGTH EVALUATION (Score 1-10 for each)
+               - Legal authority strength
+               - Factual similarity to current case
+               - Recency and currency of precedent
+               - Judicial treatment and citations
+
+            3. ANALOGICAL REASONING ANALYSIS
+               - Key factual similarities and differences
+               - Legal principle application
+               - Distinguishing factors identification
+               - Analogical strength assessment
+
+            4. ADVERSE PRECEDENT IDENTIFICATION
+               - Potentially harmful precedents
+               - Distinguishing strategies
+               - Limitation arguments
+               - Overruling possibilities
+
+            5. STRATEGIC PRECEDENT RECOMMENDATIONS
+               - Most favorable precedents to cite
+               - Precedent citation order and emphasis
+               - Factual analogy development
+               - Legal argument construction
+
+            Focus on practical strategic value with specific citation recommendations.
+        """,
+
+        'batched_precedent_discovery': """
+            You are a legal precedent research specialist analyzing case precedents for several
+            independent legal issues.
+
+            Issues:
+            {batched_issues}
+
+            For each issue, analyze binding authority, precedent strength, analogical reasoning,
+            adverse precedents and strategic precedent recommendations, using only the precedents
+            and case law listed with that issue. Give the strategic recommendations as a bulleted
+            list under a STRATEGIC PRECEDENT RECOMMENDATIONS heading.
+
+            Respond with a JSON array containing one object per issue, in order, with fields
+            issue_number and analysis.
+        """,
+
+        'precedent_comparison': """
+            You are analyzing multiple precedents for comparative legal analysis.
+
+            Target Case Profile: {target_case}
+            Precedent Cases: {precedent_cases}
+            Legal Framework: {legal_framework}
+
+            Conduct comparative precedent analysis:
+
+            1. PRECEDENT RANKING BY RELEVANCE
+               - Rank precedents by applicability (1-10 scale)
+               - Justify ranking based on legal and factual similarity
+               - Identify primary vs. secondary precedents
+               - Assess strategic citation value
+
+            2. FACTUAL PATTERN ANALYSIS
+               - Compare fact patterns across precedents
+               - Identify recurring legal themes
+               - Analyze outcome predictors
+               - Map factual distinctions
+
+            3. LEGAL DOCTRINE EVOLUTION
+               - Trace development of legal principles
+               - Identify doctrinal trends and shifts
+               - Analyze judicial reasoning patterns
+               - Predict future doctrinal development
+
+            4. STRATEGIC CITATION RECOMMENDATIONS
+               - Optimal precedent selection strategy
+               - Citation sequencing and emphasis
+               - Distinguishing adverse precedents
+               - Building persuasive precedent chain
+
+            Provide actionable strategic guidance for precedent utilization.
+        """,
+
+        'precedent_validation': """
+            You are validating the current status and treatment of legal precedents.
+
+            Primary Precedents: {primary_precedents}
+            Citation History: {citation_history}
+            Subsequent Treatment: {subsequent_treatment}
+
+            Validate precedent authority:
+
+            1. PRECEDENT VITALITY ASSESSMENT
+               - Current validity status
+               - Overruling or modification analysis
+               - Statutory supersession review
+               - Judicial criticism evaluation
+
+            2. CITATION TREATMENT ANALYSIS
+               - Positive citations and follow-on cases
+               - Negative treatment and distinctions
+               - Limiting or narrowing decisions
+               - Expansion or broadening applications
+
+            3. JURISDICTIONAL AUTHORITY VERIFICATION
+               - Binding authority confirmation
+               - Cross-jurisdictional treatment
+               - Federal vs. state precedent analysis
+               - Circuit split identification
+
+            4. STRATEGIC RELIABILITY ASSESSMENT
+               - Safe-to-cite evaluation
+               - Risk of adverse treatment
+               - Alternative precedent options
+               - Backup authority recommendations
+
+            Focus on precedent reliability and strategic citation safety.
+        """,
+
+        'analogy_analysis': """
+            Analyze factual analogies for legal precedent application.
+
+            Target Case Facts: {case_facts}
+            Legal Principles: {legal_principles}
+            Analogous Cases: {analogous_cases}
+
+            Provide analogy analysis:
+            1. Strongest factual analogies and their legal significance
+            2. Key distinguishing factors and their importance
+            3. Analogical reasoning strengths and weaknesses
+            4. Strategic use recommendations for each analogous case
+        """
+    })
+
     def __init__(self):
-        # Configure Gemini AI
-        genai.configure(api_key=os.getenv('GEMINI_API_KEY'))
-        self.model = genai.GenerativeModel('gemini-pro')
+        # Process-wide Gemini model shared with the other agents
+        self.model = shared_model()
 
         # Precedent analysis prompts
-        self.precedent_prompts = {
-            'precedent_discovery': """
-                You are a legal precedent research specialist analyzing case precedents.
-
-                Legal Issue: {legal_issue}
-                Jurisdiction: {jurisdiction}
-                Case Facts: {case_facts}
-
-                Available Precedents: {precedent_data}
-                Related Case Law: {case_law_data}
-
-                Provide comprehensive precedent analysis:
-
-                1. BINDING AUTHORITY ANALYSIS
-                   - Identify controlling precedents in jurisdiction
-                   - Analyze precedential hierarchy and weight
-                   - Evaluate binding vs. persuasive authority
-                   - Assess jurisdictional applicability
-
-                2. PRECEDENT STRENGTH EVALUATION (Score 1-10 for each)
-                   - Legal authority strength
-                   - Factual similarity to current case
-                   - Recency and currency of precedent
-                   - Judicial treatment and citations
-
-                3. ANALOGICAL REASONING ANALYSIS
-                   - Key factual similarities and differences
-                   - Legal principle application
-                   - Distinguishing factors identification
-                   - Analogical strength assessment
-
-                4. ADVERSE PRECEDENT IDENTIFICATION
-                   - Potentially harmful precedents
-                   - Distinguishing strategies
-                   - Limitation arguments
-                   - Overruling possibilities
-
-                5. STRATEGIC PRECEDENT RECOMMENDATIONS
-                   - Most favorable precedents to cite
-                   - Precedent citation order and emphasis
-                   - Factual analogy development
-                   - Legal argument construction
-
-                Focus on practical strategic value with specific citation recommendations.
-            """,
-
-            'precedent_comparison': """
-                You are analyzing multiple precedents for comparative legal analysis.
-
-                Target Case Profile: {target_case}
-                Precedent Cases: {precedent_cases}
-                Legal Framework: {legal_framework}
-
-                Conduct comparative precedent analysis:
-
-                1. PRECEDENT RANKING BY RELEVANCE
-                   - Rank precedents by applicability (1-10 scale)
-                   - Justify ranking based on legal and factual similarity
-                   - Identify primary vs. secondary precedents
-                   - Assess strategic citation value
-
-                2. FACTUAL PATTERN ANALYSIS
-                   - Compare fact patterns across precedents
-                   - Identify recurring legal themes
-                   - Analyze outcome predictors
-                   - Map factual distinctions
-
-                3. LEGAL DOCTRINE EVOLUTION
-                   - Trace development of legal principles
-                   - Identify doctrinal trends and shifts
-                   - Analyze judicial reasoning patterns
-                   - Predict future doctrinal development
-
-                4. STRATEGIC CITATION RECOMMENDATIONS
-                   - Optimal precedent selection strategy
-                   - Citation sequencing and emphasis
-                   - Distinguishing adverse precedents
-                   - Building persuasive precedent chain
-
-                Provide actionable strategic guidance for precedent utilization.
-            """,
-
-            'precedent_validation': """
-                You are validating the current status and treatment of legal precedents.
-
-                Primary Precedents: {primary_precedents}
-                Citation History: {citation_history}
-                Subsequent Treatment: {subsequent_treatment}
-
-                Validate precedent authority:
-
-                1. PRECEDENT VITALITY ASSESSMENT
-                   - Current validity status
-                   - Overruling or modification analysis
-                   - Statutory supersession review
-                   - Judicial criticism evaluation
-
-                2. CITATION TREATMENT ANALYSIS
-                   - Positive citations and follow-on cases
-                   - Negative treatment and distinctions
-                   - Limiting or narrowing decisions
-                   - Expansion or broadening applications
-
-                3. JURISDICTIONAL AUTHORITY VERIFICATION
-                   - Binding authority confirmation
-                   - Cross-jurisdictional treatment
-                   - Federal vs. state precedent analysis
-                   - Circuit split identification
-
-                4. STRATEGIC RELIABILITY ASSESSMENT
-                   - Safe-to-cite evaluation
-                   - Risk of adverse treatment
-                   - Alternative precedent options
-                   - Backup authority recommendations
-
-                Focus on precedent reliability and strategic citation safety.
-            """
+        self.precedent_prompts = self.PRECEDENT_PROMPTS
+
+        # Structured output for batched precedent discovery
+        self.batched_discovery_schema = {
+            'type': 'array',
+            'items': {
+                'type': 'object',
+                'properties': {
+                    'issue_number': {'type': 'integer'},
+                    'analysis': {'type': 'string'}
+                },
+                'required': ['issue_number', 'analysis']
+            }
         }
 
+        # Make sure the precedent lookup indexes exist on databases created before they were added
+        self._ensure_indexes()
+
+        # Persistent cache of model responses keyed by prompt, shared across processes
+        self._cache = SemanticResponseCache(prompt_version=PROMPT_VERSION, ttl_seconds=CACHE_TTL_SECONDS)
+
     def get_db_connection(self):
-        """Get database connection"""
-        return sqlite3.connect('database/legal_data.db')
+        """Get this thread's persistent, tuned database connection (do not close)"""
+        return get_connection()
+
+    def _ensure_indexes(self):
+        """Create the B-tree and FTS5 indexes backing the precedent searches (idempotent)"""
+        try:
+            conn = self.get_db_connection()
+            conn.executescript("""
+                CREATE INDEX IF NOT EXISTS idx_precedents_jur_weight ON legal_precedents(jurisdiction, precedent_weight DESC);
+                CREATE INDEX IF NOT EXISTS idx_case_law_jur_date ON case_law(jurisdiction, decision_date DESC);
+            """)
+            ensure_fts_tables(conn)
+        except sqlite3.Error:
+            # Database not initialized yet; init_database.py creates these with the schema
+            pass
+
+    def _cache_key(self, prompt: str, generation_config: Dict = None) -> str:
+        """Cache key text; the same prompt answered as JSON and as prose must not collide"""
+        if not generation_config:
+            return prompt
+        return prompt + '\n' + json.dumps(generation_config, sort_keys=True)
+
+    def _cache_lookup(self, cache_key: str) -> Optional[str]:
+        """Look up a cached response; cache failures never block an analysis"""
+        try:
+            return self._cache.get(cache_key)
+        except Exception:
+            return None
+
+    def _cache_store(self, cache_key: str, response_text: str):
+        """Store a response in the cache, ignoring cache failures"""
+        try:
+            self._cache.put(cache_key, response_text)
+        except Exception:
+            pass
+
+    def _generate(self, prompt: str, generation_config: Dict = None) -> str:
+        """Generate analysis text, serving repeated prompts from cache"""
+        cache_key = self._cache_key(prompt, generation_config)
+        cached = self._cache_lookup(cache_key)
+        if cached is not None:
+            return cached
+
+        response = self.model.generate_content(prompt, generation_config=generation_config)
+        self._cache_store(cache_key, response.text)
+        return response.text
+
+    async def _agenerate(self, prompt: str, generation_config: Dict = None) -> str:
+        """Async counterpart of _generate"""
+        cache_key = self._cache_key(prompt, generation_config)
+        cached = await asyncio.to_thread(self._cache_lookup, cache_key)
+        if cached is not None:
+            return cached
+
+        response = await self.model.generate_content_async(prompt, generation_config=generation_config)
+        await asyncio.to_thread(self._cache_store, cache_key, response.text)
+        return response.text
 
     def discover_relevant_precedents(self, legal_issue: str, jurisdiction: str, case_facts: str = "") -> Dict:
         """Discover and analyze relevant legal precedents"""
@@ -148,39 +473,15 @@ class PrecedentMiningAgent:
             # Get related case law
             case_law_results = self._search_related_case_law(legal_issue, jurisdiction)
 
-            # Prepare data for AI analysis
-            analysis_context = {
-                'legal_issue': legal_issue,
-                'jurisdiction': jurisdiction,
-                'case_facts': case_facts,
-                'precedent_data': json.dumps(precedent_results, indent=2),
-                'case_law_data': json.dumps(case_law_results, indent=2)
-            }
-
             # Generate precedent analysis
-            prompt = self.precedent_prompts['precedent_discovery'].format(**analysis_context)
-            response = self.model.generate_content(prompt)
-            precedent_analysis = response.text
-
-            # Process and rank precedents
-            ranked_precedents = self._rank_precedents(precedent_results, precedent_analysis)
+            prompt = self._build_discovery_prompt(legal_issue, jurisdiction, case_facts, precedent_results, case_law_results)
+            precedent_analysis = self._generate(prompt, json_config(DISCOVERY_SCHEMA))
 
             # Identify adverse precedents
             adverse_precedents = self._identify_adverse_precedents(legal_issue, jurisdiction, precedent_analysis)
 
-            return {
-                'legal_issue': legal_issue,
-                'jurisdiction': jurisdiction,
-                'case_facts': case_facts,
-                'precedent_analysis': precedent_analysis,
-                'favorable_precedents': ranked_precedents['favorable'],
-                'adverse_precedents': adverse_precedents,
-                'binding_authority': ranked_precedents['binding'],
-                'persuasive_authority': ranked_precedents['persuasive'],
-                'strategic_recommendations': self._extract_strategic_recommendations(precedent_analysis),
-                'citation_suggestions': self._generate_citation_suggestions(ranked_precedents),
-                'research_timestamp': datetime.utcnow().isoformat()
-            }
+            return self._package_discovery(legal_issue, jurisdiction, case_facts, precedent_results,
+                                           adverse_precedents, precedent_analysis)
 
         except Exception as e:
             return {
@@ -192,38 +493,11 @@ class PrecedentMiningAgent:
     def compare_precedents(self, target_case: Dict, precedent_list: List[Dict], legal_framework: str = "") -> Dict:
         """Compare multiple precedents for strategic analysis"""
         try:
-            # Prepare comparison context
-            comparison_context = {
-                'target_case': json.dumps(target_case, indent=2),
-                'precedent_cases': json.dumps(precedent_list, indent=2),
-                'legal_framework': legal_framework
-            }
-
             # Generate comparative analysis
-            prompt = self.precedent_prompts['precedent_comparison'].format(**comparison_context)
-            response = self.model.generate_content(prompt)
-            comparison_analysis = response.text
-
-            # Extract rankings and scores
-            precedent_rankings = self._extract_precedent_rankings(comparison_analysis, precedent_list)
-
-            # Analyze factual patterns
-            factual_analysis = self._analyze_factual_patterns(target_case, precedent_list)
-
-            # Generate strategic recommendations
-            strategic_recommendations = self._extract_strategic_recommendations(comparison_analysis)
+            prompt = self._build_comparison_prompt(target_case, precedent_list, legal_framework)
+            comparison_analysis = self._generate(prompt, json_config(COMPARISON_SCHEMA))
 
-            return {
-                'target_case': target_case,
-                'precedent_count': len(precedent_list),
-                'comparison_analysis': comparison_analysis,
-                'precedent_rankings': precedent_rankings,
-                'factual_pattern_analysis': factual_analysis,
-                'strategic_recommendations': strategic_recommendations,
-                'optimal_citation_order': self._determine_optimal_citation_order(precedent_rankings),
-                'distinguishing_strategies': self._extract_distinguishing_strategies(comparison_analysis),
-                'comparison_timestamp': datetime.utcnow().isoformat()
-            }
+            return self._package_comparison(target_case, precedent_list, comparison_analysis)
 
         except Exception as e:
             return {
@@ -237,37 +511,11 @@ class PrecedentMiningAgent:
             # Get precedent details
             precedent_details = self._get_precedent_details(precedent_citations)
 
-            # Check citation history and treatment
-            citation_history = self._check_citation_history(precedent_citations)
-
-            # Analyze subsequent treatment
-            subsequent_treatment = self._analyze_subsequent_treatment(precedent_citations)
-
-            # Prepare validation context
-            validation_context = {
-                'primary_precedents': json.dumps(precedent_details, indent=2),
-                'citation_history': json.dumps(citation_history, indent=2),
-                'subsequent_treatment': json.dumps(subsequent_treatment, indent=2)
-            }
-
             # Generate validation analysis
-            prompt = self.precedent_prompts['precedent_validation'].format(**validation_context)
-            response = self.model.generate_content(prompt)
-            validation_analysis = response.text
-
-            # Extract validation results
-            validity_status = self._extract_validity_status(validation_analysis)
-            citation_safety = self._assess_citation_safety(validation_analysis)
+            prompt = self._build_validation_prompt(precedent_citations, precedent_details)
+            validation_analysis = self._generate(prompt, json_config(VALIDATION_SCHEMA))
 
-            return {
-                'precedent_citations': precedent_citations,
-                'validation_analysis': validation_analysis,
-                'validity_status': validity_status,
-                'citation_safety': citation_safety,
-                'recommended_precedents': self._filter_safe_precedents(precedent_details, validity_status),
-                'alternative_authorities': self._suggest_alternative_authorities(precedent_details, validity_status),
-                'validation_timestamp': datetime.utcnow().isoformat()
-            }
+            return self._package_validation(precedent_citations, precedent_details, validation_analysis)
 
         except Exception as e:
             return {
@@ -284,89 +532,480 @@ class PrecedentMiningAgent:
             # Filter by legal principles
             filtered_cases = self._filter_by_legal_principles(analogous_cases, legal_principles)
 
-            # Calculate similarity scores
-            similarity_scores = self._calculate_similarity_scores(case_facts, filtered_cases)
-
             # Generate analogy analysis
-            analogy_prompt = f"""
-                Analyze factual analogies for legal precedent application.
+            prompt = self._build_analogy_prompt(case_facts, legal_principles, filtered_cases)
+            analogy_analysis = self._generate(prompt, json_config(ANALOGY_SCHEMA))
+
+            return self._package_analogies(case_facts, legal_principles, jurisdiction, filtered_cases, analogy_analysis)
+
+        except Exception as e:
+            return {
+                'error': f"Analogous case search failed: {str(e)}",
+                'case_facts': case_facts
+            }
+
+    def discover_relevant_precedents_batch(self, issues: List[Dict], batch_size: int = 5) -> List[Dict]:
+        """Discover precedents for several issues with one Gemini call per batch_size issues.
+
+        Each issue is a dict with legal_issue, jurisdiction and optionally case_facts; results
+        are in the discover_relevant_precedents shape, in order.
+        """
+        if not supports_json_mode():
+            # Batched answers are routed back by issue number, which needs JSON mode
+            return [self.discover_relevant_precedents(issue['legal_issue'], issue['jurisdiction'],
+                                                      issue.get('case_facts', ''))
+                    for issue in issues]
+
+        results = []
+        for start in range(0, len(issues), batch_size):
+            batch = issues[start:start + batch_size]
+            try:
+                searches = [self._search_issue(issue) for issue in batch]
+                prompt = self._build_batched_discovery_prompt(batch, searches)
+                analysis = self._generate(prompt, self._batched_discovery_config(len(batch)))
+                results.extend(self._package_discovery_batch(batch, searches, analysis))
+            except Exception as e:
+                results.extend(self._batch_error(issue, e) for issue in batch)
+
+        return results
+
+    async def adiscover_relevant_precedents_batch(self, issues: List[Dict], batch_size: int = 5) -> List[Dict]:
+        """Async variant of discover_relevant_precedents_batch; the batches run concurrently"""
+        if not supports_json_mode():
+            return list(await asyncio.gather(*(
+                self.adiscover_relevant_precedents(issue['legal_issue'], issue['jurisdiction'],
+                                                   issue.get('case_facts', ''))
+                for issue in issues
+            )))
+
+        async def discover_batch(batch: List[Dict]) -> List[Dict]:
+            try:
+                searches = await asyncio.gather(*(asyncio.to_thread(self._search_issue, issue) for issue in batch))
+                prompt = self._build_batched_discovery_prompt(batch, searches)
+                analysis = await self._agenerate(prompt, self._batched_discovery_config(len(batch)))
+                return self._package_discovery_batch(batch, searches, analysis)
+            except Exception as e:
+                return [self._batch_error(issue, e) for issue in batch]
+
+        batches = await asyncio.gather(*(
+            discover_batch(issues[start:start + batch_size]) for start in range(0, len(issues), batch_size)
+        ))
+        return [result for batch in batches for result in batch]
+
+    async def adiscover_relevant_precedents(self, legal_issue: str, jurisdiction: str, case_facts: str = "") -> Dict:
+        """Async variant of discover_relevant_precedents; the database searches run concurrently"""
+        try:
+            # The adverse search depends only on the issue, so it overlaps the other lookups
+            # instead of waiting for the Gemini analysis
+            precedent_results, case_law_results, adverse_precedents = await asyncio.gather(
+                asyncio.to_thread(self._search_precedents, legal_issue, jurisdiction),
+                asyncio.to_thread(self._search_related_case_law, legal_issue, jurisdiction),
+                asyncio.to_thread(self._identify_adverse_precedents, legal_issue, jurisdiction, '')
+            )
+
+            prompt = self._build_discovery_prompt(legal_issue, jurisdiction, case_facts, precedent_results, case_law_results)
+            precedent_analysis = await self._agenerate(prompt, json_config(DISCOVERY_SCHEMA))
+
+            return self._package_discovery(legal_issue, jurisdiction, case_facts, precedent_results,
+                                           adverse_precedents, precedent_analysis)
+
+        except Exception as e:
+            return {
+                'error': f"Precedent discovery failed: {str(e)}",
+                'legal_issue': legal_issue,
+                'jurisdiction': jurisdiction
+            }
+
+    async def acompare_precedents(self, target_case: Dict, precedent_list: List[Dict], legal_framework: str = "") -> Dict:
+        """Async variant of compare_precedents"""
+        try:
+            prompt = self._build_comparison_prompt(target_case, precedent_list, legal_framework)
+            comparison_analysis = await self._agenerate(prompt, json_config(COMPARISON_SCHEMA))
+
+            return self._package_comparison(target_case, precedent_list, comparison_analysis)
+
+        except Exception as e:
+            return {
+                'error': f"Precedent comparison failed: {str(e)}",
+                'target_case': target_case
+            }
+
+    async def astream_compare_precedents(self, target_case: Dict, precedent_list: List[Dict],
+                                         legal_framework: str = "") -> AsyncIterator[Dict]:
+        """Compare precedents while Gemini streams, yielding the rankings before the full result"""
+        try:
+            prompt = self._build_comparison_prompt(target_case, precedent_list, legal_framework)
+
+            comparison_analysis = await asyncio.to_thread(self._cache_lookup, self._cache_key(prompt))
+            if comparison_analysis is None:
+                comparison_analysis = ''
+                rankings_sent = False
+                async for chunk in await self.model.generate_content_async(prompt, stream=True):
+                    scan_from = max(0, len(comparison_analysis) - _HEADING_OVERLAP)
+                    comparison_analysis += chunk.text
+                    if not rankings_sent and _RANKINGS_DONE_RE.search(comparison_analysis, scan_from):
+                        rankings_sent = True
+                        yield {'event': 'rankings', **self._partial_rankings(comparison_analysis, precedent_list)}
+
+                await asyncio.to_thread(self._cache_store, self._cache_key(prompt), comparison_analysis)
+
+            yield {'event': 'complete',
+                   'result': self._package_comparison(target_case, precedent_list, comparison_analysis)}
+
+        except Exception as e:
+            yield {'event': 'error', 'error': f"Precedent comparison failed: {str(e)}", 'target_case': target_case}
+
+    async def arank_precedents(self, target_case: Dict, precedent_list: List[Dict], legal_framework: str = "") -> Dict:
+        """Rank precedents only, abandoning the comparison stream once its ranking section is complete"""
+        try:
+            prompt = self._build_comparison_prompt(target_case, precedent_list, legal_framework)
+
+            comparison_analysis = await asyncio.to_thread(self._cache_lookup, self._cache_key(prompt))
+            if comparison_analysis is None:
+                # The partial text is never cached, since it would be served as a full comparison
+                comparison_analysis = ''
+                async for chunk in await self.model.generate_content_async(prompt, stream=True):
+                    scan_from = max(0, len(comparison_analysis) - _HEADING_OVERLAP)
+                    comparison_analysis += chunk.text
+                    if _RANKINGS_DONE_RE.search(comparison_analysis, scan_from):
+                        break
+
+            return {
+                'target_case': target_case,
+                **self._partial_rankings(comparison_analysis, precedent_list),
+                'ranking_timestamp': datetime.utcnow().isoformat()
+            }
+
+        except Exception as e:
+            return {
+                'error': f"Precedent ranking failed: {str(e)}",
+                'target_case': target_case
+            }
+
+    def _partial_rankings(self, partial_analysis: str, precedent_list: List[Dict]) -> Dict:
+        """Rankings read from a comparison whose ranking section is complete"""
+        precedent_rankings = self._extract_precedent_rankings(partial_analysis, precedent_list)
+        return {
+            'precedent_rankings': precedent_rankings,
+            'optimal_citation_order': self._determine_optimal_citation_order(precedent_rankings)
+        }
 
-                Target Case Facts: {case_facts}
-                Legal Principles: {', '.join(legal_principles)}
-                Analogous Cases: {json.dumps(filtered_cases, indent=2)}
+    async def avalidate_precedent_authority(self, precedent_citations: List[str]) -> Dict:
+        """Async variant of validate_precedent_authority"""
+        try:
+            precedent_details = await asyncio.to_thread(self._get_precedent_details, precedent_citations)
 
-                Provide analogy analysis:
-                1. Strongest factual analogies and their legal significance
-                2. Key distinguishing factors and their importance
-                3. Analogical reasoning strengths and weaknesses
-                4. Strategic use recommendations for each analogous case
-            """
+            prompt = self._build_validation_prompt(precedent_citations, precedent_details)
+            validation_analysis = await self._agenerate(prompt, json_config(VALIDATION_SCHEMA))
 
-            response = self.model.generate_content(analogy_prompt)
-            analogy_analysis = response.text
+            return self._package_validation(precedent_citations, precedent_details, validation_analysis)
 
+        except Exception as e:
             return {
-                'target_facts': case_facts,
-                'legal_principles': legal_principles,
-                'jurisdiction': jurisdiction,
-                'analogous_cases': filtered_cases,
-                'similarity_scores': similarity_scores,
-                'analogy_analysis': analogy_analysis,
-                'strongest_analogies': self._identify_strongest_analogies(similarity_scores, analogy_analysis),
-                'distinguishing_factors': self._extract_distinguishing_factors(analogy_analysis),
-                'analogy_timestamp': datetime.utcnow().isoformat()
+                'error': f"Precedent validation failed: {str(e)}",
+                'precedent_citations': precedent_citations
             }
 
+    async def afind_analogous_cases(self, case_facts: str, legal_principles: List[str], jurisdiction: str = "Federal") -> Dict:
+        """Async variant of find_analogous_cases"""
+        try:
+            analogous_cases = await asyncio.to_thread(self._search_analogous_cases, case_facts, jurisdiction)
+            filtered_cases = self._filter_by_legal_principles(analogous_cases, legal_principles)
+
+            prompt = self._build_analogy_prompt(case_facts, legal_principles, filtered_cases)
+            analogy_analysis = await self._agenerate(prompt, json_config(ANALOGY_SCHEMA))
+
+            return self._package_analogies(case_facts, legal_principles, jurisdiction, filtered_cases, analogy_analysis)
+
         except Exception as e:
             return {
                 'error': f"Analogous case search failed: {str(e)}",
                 'case_facts': case_facts
             }
 
+    async def arun_precedent_research(self, legal_issue: str, jurisdiction: str, case_facts: str = "",
+                                      precedent_citations: List[str] = None) -> Dict:
+        """Run precedent discovery and, when citations are given, their validation concurrently"""
+        tasks = [self.adiscover_relevant_precedents(legal_issue, jurisdiction, case_facts)]
+        if precedent_citations:
+            tasks.append(self.avalidate_precedent_authority(precedent_citations))
+
+        results = await asyncio.gather(*tasks)
+
+        return {
+            'discovery': results[0],
+            'validation': results[1] if precedent_citations else None
+        }
+
+    def _build_discovery_prompt(self, legal_issue: str, jurisdiction: str, case_facts: str,
+                                precedent_results: List[Dict], case_law_results: List[Dict]) -> str:
+        """Format the precedent discovery prompt"""
+        analysis_context = {
+            'legal_issue': legal_issue,
+            'jurisdiction': jurisdiction,
+            'case_facts': case_facts,
+            'precedent_data': _prompt_json(precedent_results),
+            'case_law_data': _prompt_json(case_law_results)
+        }
+        return self.precedent_prompts['precedent_discovery'].format(**analysis_context)
+
+    def _package_discovery(self, legal_issue: str, jurisdiction: str, case_facts: str, precedent_results: List[Dict],
+                           adverse_precedents: List[Dict], precedent_analysis: str) -> Dict:
+        """Build the precedent discovery result from the model output (structured JSON or prose)"""
+        data = _parse_structured(precedent_analysis)
+        if data is not None:
+            precedent_analysis = data.get('analysis', '')
+            strategic_recommendations = data.get('strategic_recommendations', [])[:8]
+        else:
+            # Prose response (batched discovery, or the model ignored the schema): fall back to the line parser
+            strategic_recommendations = self._extract_strategic_recommendations(precedent_analysis)
+
+        # Process and rank precedents
+        ranked_precedents = self._rank_precedents(precedent_results, precedent_analysis)
+
+        return {
+            'legal_issue': legal_issue,
+            'jurisdiction': jurisdiction,
+            'case_facts': case_facts,
+            'precedent_analysis': precedent_analysis,
+            'favorable_precedents': ranked_precedents['favorable'],
+            'adverse_precedents': adverse_precedents,
+            'binding_authority': ranked_precedents['binding'],
+            'persuasive_authority': ranked_precedents['persuasive'],
+            'strategic_recommendations': strategic_recommendations,
+            'citation_suggestions': self._generate_citation_suggestions(ranked_precedents),
+            'research_timestamp': datetime.utcnow().isoformat()
+        }
+
+    def _search_issue(self, issue: Dict) -> Tuple[List[Dict], List[Dict], List[Dict]]:
+        """Precedents, related case law and adverse precedents for one issue of a batch"""
+        legal_issue, jurisdiction = issue['legal_issue'], issue['jurisdiction']
+        return (
+            self._search_precedents(legal_issue, jurisdiction),
+            self._search_related_case_law(legal_issue, jurisdiction),
+            self._identify_adverse_precedents(legal_issue, jurisdiction, '')
+        )
+
+    def _build_batched_discovery_prompt(self, issues: List[Dict], searches: List[Tuple]) -> str:
+        """Format one discovery prompt covering several issues, numbered from 1"""
+        numbered = '\n\n'.join(
+            f"[{number}] Legal Issue: {issue['legal_issue']}\n"
+            f"Jurisdiction: {issue['jurisdiction']}\n"
+            f"Case Facts: {issue.get('case_facts', '')}\n"
+            f"Available Precedents: {_prompt_json(precedent_results)}\n"
+            f"Related Case Law: {_prompt_json(case_law_results)}"
+            for number, (issue, (precedent_results, case_law_results, _)) in enumerate(zip(issues, searches), 1)
+        )
+        return self.precedent_prompts['batched_precedent_discovery'].format(batched_issues=numbered)
+
+    def _package_discovery_batch(self, issues: List[Dict], searches: List[Tuple], analysis_text: str) -> List[Dict]:
+        """Route each entry of a batched JSON response back into the discover_relevant_precedents result shape"""
+        entries = json.loads(analysis_text)
+        by_number = {entry.get('issue_number'): entry for entry in entries if isinstance(entry, dict)}
+
+        results = []
+        for number, (issue, (precedent_results, _, adverse_precedents)) in enumerate(zip(issues, searches), 1):
+            entry = by_number.get(number)
+            if entry is None:
+                results.append(self._batch_error(issue, "analysis missing from batched response"))
+                continue
+
+            results.append(self._package_discovery(issue['legal_issue'], issue['jurisdiction'], issue.get('case_facts', ''),
+                                                   precedent_results, adverse_precedents, entry.get('analysis', '')))
+
+        return results
+
+    def _batched_discovery_config(self, issue_count: int) -> Dict:
+        """JSON config for a batched discovery call, with an output budget per issue"""
+        return json_config(self.batched_discovery_schema, MAX_OUTPUT_TOKENS * issue_count)
+
+    def _batch_error(self, issue: Dict, error) -> Dict:
+        """Error entry for one issue of a failed batch"""
+        return {
+            'error': f"Precedent discovery failed: {str(error)}",
+            'legal_issue': issue.get('legal_issue'),
+            'jurisdiction': issue.get('jurisdiction')
+        }
+
+    def _build_comparison_prompt(self, target_case: Dict, precedent_list: List[Dict], legal_framework: str) -> str:
+        """Format the precedent comparison prompt"""
+        comparison_context = {
+            'target_case': _prompt_json(target_case),
+            'precedent_cases': _prompt_json(precedent_list),
+            'legal_framework': legal_framework
+        }
+        return self.precedent_prompts['precedent_comparison'].format(**comparison_context)
+
+    def _package_comparison(self, target_case: Dict, precedent_list: List[Dict], comparison_analysis: str) -> Dict:
+        """Build the precedent comparison result from the model output (structured JSON or prose)"""
+        data = _parse_structured(comparison_analysis)
+        if data is not None:
+            comparison_analysis = data.get('analysis', '')
+            scored = {
+                str(ranking.get('case_name', '')).lower(): float(ranking['score'])
+                for ranking in data.get('rankings', [])
+                if isinstance(ranking, dict) and isinstance(ranking.get('score'), (int, float))
+            }
+            strategic_recommendations = data.get('strategic_recommendations', [])[:8]
+            distinguishing_strategies = data.get('distinguishing_strategies', [])[:5]
+        else:
+            # Prose response (streaming, or the model ignored the schema): fall back to the line parser
+            scored = None
+            strategic_recommendations = self._extract_strategic_recommendations(comparison_analysis)
+            distinguishing_strategies = self._extract_distinguishing_strategies(comparison_analysis)
+
+        # Extract rankings and scores
+        precedent_rankings = self._extract_precedent_rankings(comparison_analysis, precedent_list, scored)
+
+        # Analyze factual patterns
+        factual_analysis = self._analyze_factual_patterns(target_case, precedent_list)
+
+        return {
+            'target_case': target_case,
+            'precedent_count': len(precedent_list),
+            'comparison_analysis': comparison_analysis,
+            'precedent_rankings': precedent_rankings,
+            'factual_pattern_analysis': factual_analysis,
+            'strategic_recommendations': strategic_recommendations,
+            'optimal_citation_order': self._determine_optimal_citation_order(precedent_rankings),
+            'distinguishing_strategies': distinguishing_strategies,
+            'comparison_timestamp': datetime.utcnow().isoformat()
+        }
+
+    def _build_validation_prompt(self, precedent_citations: List[str], precedent_details: List[Dict]) -> str:
+        """Format the precedent validation prompt"""
+        # Check citation history and treatment
+        citation_history = self._check_citation_history(precedent_citations)
+
+        # Analyze subsequent treatment
+        subsequent_treatment = self._analyze_subsequent_treatment(precedent_citations)
+
+        validation_context = {
+            'primary_precedents': _prompt_json(precedent_details),
+            'citation_history': _prompt_json(citation_history),
+            'subsequent_treatment': _prompt_json(subsequent_treatment)
+        }
+        return self.precedent_prompts['precedent_validation'].format(**validation_context)
+
+    def _package_validation(self, precedent_citations: List[str], precedent_details: List[Dict],
+                            validation_analysis: str) -> Dict:
+        """Build the precedent validation result from the model output (structured JSON or prose)"""
+        data = _parse_structured(validation_analysis)
+        if data is not None:
+            validation_analysis = data.get('analysis', '')
+        else:
+            data = {}
+
+        # Extract validation results; verdicts missing or outside the expected values are read from the prose
+        overall_validity = str(data.get('overall_validity', '')).lower()
+        if overall_validity in VALIDITY_STATUSES:
+            validity_status = {'overall_validity': overall_validity}
+        else:
+            validity_status = self._extract_validity_status(validation_analysis)
+
+        citation_safety = str(data.get('citation_safety', '')).lower()
+        if citation_safety not in CITATION_SAFETY_LEVELS:
+            citation_safety = self._assess_citation_safety(validation_analysis)
+
+        return {
+            'precedent_citations': precedent_citations,
+            'validation_analysis': validation_analysis,
+            'validity_status': validity_status,
+            'citation_safety': citation_safety,
+            'recommended_precedents': self._filter_safe_precedents(precedent_details, validity_status),
+            'alternative_authorities': self._suggest_alternative_authorities(precedent_details, validity_status),
+            'validation_timestamp': datetime.utcnow().isoformat()
+        }
+
+    def _build_analogy_prompt(self, case_facts: str, legal_principles: List[str], filtered_cases: List[Dict]) -> str:
+        """Format the analogy analysis prompt"""
+        analogy_context = {
+            'case_facts': case_facts,
+            'legal_principles': ', '.join(legal_principles),
+            'analogous_cases': _prompt_json(filtered_cases)
+        }
+        return self.precedent_prompts['analogy_analysis'].format(**analogy_context)
+
+    def _package_analogies(self, case_facts: str, legal_principles: List[str], jurisdiction: str,
+                           filtered_cases: List[Dict], analogy_analysis: str) -> Dict:
+        """Build the analogous case result from the model output (structured JSON or prose)"""
+        data = _parse_structured(analogy_analysis)
+        if data is not None:
+            analogy_analysis = data.get('analysis', '')
+            distinguishing_factors = data.get('distinguishing_factors', [])[:5]
+        else:
+            distinguishing_factors = self._extract_distinguishing_factors(analogy_analysis)
+
+        # Calculate similarity scores
+        similarity_scores = self._calculate_similarity_scores(case_facts, filtered_cases)
+
+        return {
+            'target_facts': case_facts,
+            'legal_principles': legal_principles,
+            'jurisdiction': jurisdiction,
+            'analogous_cases': filtered_cases,
+            'similarity_scores': similarity_scores,
+            'analogy_analysis': analogy_analysis,
+            'strongest_analogies': self._identify_strongest_analogies(similarity_scores, analogy_analysis),
+            'distinguishing_factors': distinguishing_factors,
+            'analogy_timestamp': datetime.utcnow().isoformat()
+        }
+
     def _search_precedents(self, legal_issue: str, jurisdiction: str, limit: int = 10) -> List[Dict]:
         """Search precedent database"""
-        conn = self.get_db_connection()
-        cursor = conn.cursor()
+        cursor = self.get_db_connection().cursor()
+        cursor.row_factory = dict_row
 
-        cursor.execute("""
+        precedent_match = build_match_query(legal_issue, ('legal_principle', 'related_statutes'))
+        if not precedent_match:
+            return []
+
+        sql = """
             SELECT p.precedent_id, p.legal_principle, p.binding_authority,
                    p.jurisdiction, p.precedent_weight, p.related_statutes,
                    c.case_name, c.citation, c.holding, c.decision_date
             FROM legal_precedents p
             JOIN case_law c ON p.case_id = c.case_id
-            WHERE p.legal_principle LIKE ?
-               OR p.related_statutes LIKE ?
-               OR c.legal_issues LIKE ?
-        """, (f"%{legal_issue}%", f"%{legal_issue}%", f"%{legal_issue}%"))
+            WHERE (p.rowid IN (SELECT rowid FROM legal_precedents_fts WHERE legal_precedents_fts MATCH ?)
+                   OR c.rowid IN (SELECT rowid FROM case_law_fts WHERE case_law_fts MATCH ?))
+        """
+        params = [precedent_match, build_match_query(legal_issue, ('legal_issues',))]
 
         if jurisdiction and jurisdiction != "Federal":
-            cursor.execute(cursor.lastrowid, cursor.lastrowid + " AND p.jurisdiction = ?", (jurisdiction,))
+            sql += " AND p.jurisdiction = ?"
+            params.append(jurisdiction)
 
-        cursor.execute(cursor.lastrowid, cursor.lastrowid + " ORDER BY p.precedent_weight DESC LIMIT ?", (limit,))
+        sql += " ORDER BY p.precedent_weight DESC LIMIT ?"
+        params.append(limit)
 
-        results = cursor.fetchall()
-        conn.close()
-        return [dict(zip([col[0] for col in cursor.description], row)) for row in results]
+        cursor.execute(sql, params)
+        return cursor.fetchall()
 
     def _search_related_case_law(self, legal_issue: str, jurisdiction: str, limit: int = 5) -> List[Dict]:
         """Search for related case law"""
-        conn = self.get_db_connection()
-        cursor = conn.cursor()
+        cursor = self.get_db_connection().cursor()
+        cursor.row_factory = dict_row
 
-        cursor.execute("""
+        match = build_match_query(legal_issue, ('legal_issues', 'holding'))
+        if not match:
+            return []
+
+        sql = """
             SELECT case_name, citation, holding, legal_issues, decision_date, court
             FROM case_law
-            WHERE legal_issues LIKE ? OR holding LIKE ?
-        """, (f"%{legal_issue}%", f"%{legal_issue}%"))
+            WHERE rowid IN (SELECT rowid FROM case_law_fts WHERE case_law_fts MATCH ?)
+        """
+        params = [match]
 
         if jurisdiction and jurisdiction != "Federal":
-            cursor.execute(cursor.lastrowid, cursor.lastrowid + " AND jurisdiction = ?", (jurisdiction,))
+            sql += " AND jurisdiction = ?"
+            params.append(jurisdiction)
 
-        cursor.execute(cursor.lastrowid, cursor.lastrowid + " ORDER BY decision_date DESC LIMIT ?", (limit,))
+        sql += " ORDER BY decision_date DESC LIMIT ?"
+        params.append(limit)
 
-        results = cursor.fetchall()
-        conn.close()
-        return [dict(zip([col[0] for col in cursor.description], row)) for row in results]
+        cursor.execute(sql, params)
+        return cursor.fetchall()
 
     def _rank_precedents(self, precedents: List[Dict], analysis: str) -> Dict:
         """Rank precedents by favorability and authority"""
@@ -403,47 +1042,31 @@ class PrecedentMiningAgent:
     def _identify_adverse_precedents(self, legal_issue: str, jurisdiction: str, analysis: str) -> List[Dict]:
         """Identify potentially adverse precedents"""
         # Search for precedents that might be adverse
-        conn = self.get_db_connection()
-        cursor = conn.cursor()
-
-        # Look for precedents with opposing outcomes or principles
-        opposing_terms = ['against', 'denied', 'dismissed', 'rejected', 'failed']
-        adverse_precedents = []
-
-        for term in opposing_terms:
-            cursor.execute("""
-                SELECT p.precedent_id, p.legal_principle, c.case_name, c.citation, c.holding
-                FROM legal_precedents p
-                JOIN case_law c ON p.case_id = c.case_id
-                WHERE (c.holding LIKE ? OR p.legal_principle LIKE ?)
-                  AND (p.legal_principle LIKE ? OR c.legal_issues LIKE ?)
-                LIMIT 3
-            """, (f"%{term}%", f"%{term}%", f"%{legal_issue}%", f"%{legal_issue}%"))
-
-            results = cursor.fetchall()
-            for row in results:
-                adverse_precedents.append(dict(zip([col[0] for col in cursor.description], row)))
-
-        conn.close()
-        return adverse_precedents[:5]  # Limit to top 5
+        cursor = self.get_db_connection().cursor()
+        cursor.row_factory = dict_row
 
-    def _extract_strategic_recommendations(self, analysis: str) -> List[str]:
-        """Extract strategic recommendations from analysis"""
-        recommendations = []
-        lines = analysis.split('\n')
-        in_recommendations = False
+        issue_principle_match = build_match_query(legal_issue, ('legal_principle',))
+        if not issue_principle_match:
+            return []
 
-        for line in lines:
-            if any(keyword in line.lower() for keyword in ['recommend', 'strategic', 'suggest']):
-                in_recommendations = True
-                continue
-            elif in_recommendations and line.strip():
-                if line.strip().startswith(('-', '*', '•')) or re.match(r'^\d+\.', line.strip()):
-                    recommendations.append(line.strip().lstrip('- *•0123456789. '))
-                elif line.strip().isupper():
-                    break
+        # Look for precedents with opposing outcomes or principles, all terms in one pass
+        cursor.execute("""
+            SELECT p.precedent_id, p.legal_principle, c.case_name, c.citation, c.holding
+            FROM legal_precedents p
+            JOIN case_law c ON p.case_id = c.case_id
+            WHERE (c.rowid IN (SELECT rowid FROM case_law_fts WHERE case_law_fts MATCH ?)
+                   OR p.rowid IN (SELECT rowid FROM legal_precedents_fts WHERE legal_precedents_fts MATCH ?))
+              AND (p.rowid IN (SELECT rowid FROM legal_precedents_fts WHERE legal_precedents_fts MATCH ?)
+                   OR c.rowid IN (SELECT rowid FROM case_law_fts WHERE case_law_fts MATCH ?))
+            LIMIT 5
+        """, (_OPPOSING_HOLDING_MATCH, _OPPOSING_PRINCIPLE_MATCH,
+              issue_principle_match, build_match_query(legal_issue, ('legal_issues',))))
+
+        return cursor.fetchall()  # Limit to top 5
 
-        return recommendations[:8]
+    def _extract_strategic_recommendations(self, analysis: str) -> List[str]:
+        """Extract strategic recommendations from analysis"""
+        return list(_parse_analysis(analysis)['recommendations'][:8])
 
     def _generate_citation_suggestions(self, ranked_precedents: Dict) -> Dict:
         """Generate strategic citation suggestions"""
@@ -470,21 +1093,21 @@ class PrecedentMiningAgent:
 
         return suggestions
 
-    def _extract_precedent_rankings(self, analysis: str, precedent_list: List[Dict]) -> List[Dict]:
-        """Extract precedent rankings from comparison analysis"""
+    def _extract_precedent_rankings(self, analysis: str, precedent_list: List[Dict],
+                                    structured_scores: Dict[str, float] = None) -> List[Dict]:
+        """Extract precedent rankings from comparison analysis, preferring scores keyed by lowercased case name"""
         rankings = []
 
-        for i, precedent in enumerate(precedent_list):
-            case_name = precedent.get('case_name', '')
-
-            # Look for ranking information in analysis
-            rank_pattern = rf'{re.escape(case_name)}.*?(\d+(?:\.\d+)?)'
-            match = re.search(rank_pattern, analysis, re.IGNORECASE)
+        # Look for ranking information in analysis
+        names = [precedent.get('case_name', '') for precedent in precedent_list]
+        if structured_scores:
+            scores = _ranking_scores(analysis, [name for name in names if name.lower() not in structured_scores])
+            scores.update(structured_scores)
+        else:
+            scores = _ranking_scores(analysis, names)
 
-            if match:
-                score = float(match.group(1))
-            else:
-                score = 5.0  # Default score
+        for i, precedent in enumerate(precedent_list):
+            score = scores.get(precedent.get('case_name', '').lower(), 5.0)  # Default score
 
             rankings.append({
                 **precedent,
@@ -501,16 +1124,17 @@ class PrecedentMiningAgent:
         patterns = {
             'common_facts': [],
             'distinguishing_facts': [],
-            'fact_categories': defaultdict(list)
+            'fact_categories': {}  # Not categorized yet; a plain dict serializes the same without the factory
         }
 
-        target_facts = target_case.get('case_facts', '').lower()
+        # The target's words are split once; each holding is intersected without building its own set
+        target_words = frozenset(target_case.get('case_facts', '').lower().split())
 
         for precedent in precedents:
             precedent_facts = precedent.get('holding', '').lower()
 
             # Simple fact pattern analysis
-            common_words = set(target_facts.split()) & set(precedent_facts.split())
+            common_words = target_words.intersection(precedent_facts.split())
             if len(common_words) > 3:
                 patterns['common_facts'].append({
                     'case': precedent.get('case_name'),
@@ -525,35 +1149,31 @@ class PrecedentMiningAgent:
 
     def _extract_distinguishing_strategies(self, analysis: str) -> List[str]:
         """Extract strategies for distinguishing adverse precedents"""
-        strategies = []
-        lines = analysis.split('\n')
-
-        for line in lines:
-            if 'distinguish' in line.lower() or 'different' in line.lower():
-                strategies.append(line.strip())
-
-        return strategies[:5]
+        return list(_parse_analysis(analysis)['distinguishing_strategies'][:5])
 
     def _get_precedent_details(self, citations: List[str]) -> List[Dict]:
         """Get detailed information for precedent citations"""
-        conn = self.get_db_connection()
-        cursor = conn.cursor()
+        cursor = self.get_db_connection().cursor()
+        cursor.row_factory = dict_row
+        matches = [match for match in (build_match_query(citation, ('citation',)) for citation in citations) if match]
         details = []
 
-        for citation in citations:
-            cursor.execute("""
+        # One UNION ALL round trip per chunk, each citation keeping only its first matching row
+        branch = """
+            SELECT * FROM (
                 SELECT c.case_name, c.citation, c.holding, c.decision_date,
                        p.legal_principle, p.binding_authority, p.precedent_weight
                 FROM case_law c
                 LEFT JOIN legal_precedents p ON c.case_id = p.case_id
-                WHERE c.citation LIKE ?
-            """, (f"%{citation}%",))
-
-            result = cursor.fetchone()
-            if result:
-                details.append(dict(zip([col[0] for col in cursor.description], result)))
+                WHERE c.rowid IN (SELECT rowid FROM case_law_fts WHERE case_law_fts MATCH ?)
+                LIMIT 1
+            )
+        """
+        for start in range(0, len(matches), _MAX_UNION_BRANCHES):
+            chunk = matches[start:start + _MAX_UNION_BRANCHES]
+            cursor.execute(' UNION ALL '.join([branch] * len(chunk)), chunk)
+            details.extend(cursor.fetchall())
 
-        conn.close()
         return details
 
     def _check_citation_history(self, citations: List[str]) -> Dict:
@@ -578,10 +1198,11 @@ class PrecedentMiningAgent:
     def _extract_validity_status(self, analysis: str) -> Dict:
         """Extract validity status from analysis"""
         status = {}
+        terms = _parse_analysis(analysis)['verdict_terms']
 
-        if 'valid' in analysis.lower() and 'invalid' not in analysis.lower():
+        if 'valid' in terms and 'invalid' not in terms:
             status['overall_validity'] = 'valid'
-        elif 'overruled' in analysis.lower():
+        elif 'overruled' in terms:
             status['overall_validity'] = 'overruled'
         else:
             status['overall_validity'] = 'uncertain'
@@ -590,9 +1211,11 @@ class PrecedentMiningAgent:
 
     def _assess_citation_safety(self, analysis: str) -> str:
         """Assess safety of citing precedents"""
-        if 'safe to cite' in analysis.lower() or ('valid' in analysis.lower() and 'risk' not in analysis.lower()):
+        terms = _parse_analysis(analysis)['verdict_terms']
+
+        if 'safe to cite' in terms or ('valid' in terms and 'risk' not in terms):
             return 'safe'
-        elif 'caution' in analysis.lower() or 'risk' in analysis.lower():
+        elif 'caution' in terms or 'risk' in terms:
             return 'caution'
         else:
             return 'review_needed'
@@ -613,27 +1236,30 @@ class PrecedentMiningAgent:
 
     def _search_analogous_cases(self, case_facts: str, jurisdiction: str, limit: int = 8) -> List[Dict]:
         """Search for cases with analogous facts"""
-        conn = self.get_db_connection()
-        cursor = conn.cursor()
+        cursor = self.get_db_connection().cursor()
+        cursor.row_factory = dict_row
 
         # Extract key terms from case facts for search
-        key_terms = self._extract_key_terms(case_facts)
+        terms = self._extract_key_terms(case_facts)[:3]  # Use top 3 terms
+        if not terms:
+            return []
 
-        analogous_cases = []
-        for term in key_terms[:3]:  # Use top 3 terms
-            cursor.execute("""
+        # One UNION ALL round trip, each term keeping its own share of the limit
+        branch = """
+            SELECT * FROM (
                 SELECT case_name, citation, holding, legal_issues, decision_date
                 FROM case_law
-                WHERE holding LIKE ? OR legal_issues LIKE ?
+                WHERE rowid IN (SELECT rowid FROM case_law_fts WHERE case_law_fts MATCH ?)
                 ORDER BY decision_date DESC
                 LIMIT ?
-            """, (f"%{term}%", f"%{term}%", limit // len(key_terms[:3])))
+            )
+        """
+        params = []
+        for term in terms:
+            params.extend((build_match_query(term, ('holding', 'legal_issues')), limit // len(terms)))
 
-            results = cursor.fetchall()
-            analogous_cases.extend([dict(zip([col[0] for col in cursor.description], row)) for row in results])
-
-        conn.close()
-        return analogous_cases[:limit]
+        cursor.execute(' UNION ALL '.join([branch] * len(terms)), params)
+        return cursor.fetchall()[:limit]
 
     def _filter_by_legal_principles(self, cases: List[Dict], legal_principles: List[str]) -> List[Dict]:
         """Filter cases by relevant legal principles"""
@@ -648,32 +1274,19 @@ class PrecedentMiningAgent:
 
     def _calculate_similarity_scores(self, target_facts: str, cases: List[Dict]) -> Dict:
         """Calculate factual similarity scores between target case and precedents"""
-        scores = {}
-        target_terms = set(self._extract_key_terms(target_facts))
-
-        for case in cases:
-            case_name = case.get('case_name', '')
-            case_facts = case.get('holding', '') + ' ' + case.get('legal_issues', '')
-            case_terms = set(self._extract_key_terms(case_facts))
+        target_terms = _key_term_set(target_facts)
 
-            # Simple Jaccard similarity
-            intersection = len(target_terms & case_terms)
-            union = len(target_terms | case_terms)
-            similarity = intersection / union if union > 0 else 0
-
-            scores[case_name] = round(similarity * 10, 1)  # Scale to 1-10
-
-        return scores
+        # Scores are built in one pass straight into the result dict
+        return {
+            case.get('case_name', ''): _jaccard_score(
+                target_terms, _key_term_set(case.get('holding', '') + ' ' + case.get('legal_issues', ''))
+            )
+            for case in cases
+        }
 
     def _extract_key_terms(self, text: str) -> List[str]:
         """Extract key terms from text for similarity analysis"""
-        # Simple term extraction - remove common words
-        common_words = {'the', 'and', 'or', 'but', 'in', 'on', 'at', 'to', 'for', 'of', 'with', 'by', 'a', 'an', 'is', 'was', 'are', 'were', 'been', 'have', 'has', 'had', 'will', 'would', 'could', 'should'}
-
-        words = re.findall(r'\b[a-zA-Z]+\b', text.lower())
-        key_terms = [word for word in words if word not in common_words and len(word) > 3]
-
-        return key_terms[:10]  # Return top 10 terms
+        return list(_key_terms(text))  # Return top 10 terms
 
     def _identify_strongest_analogies(self, similarity_scores: Dict, analysis: str) -> List[Dict]:
         """Identify strongest factual analogies"""
@@ -693,11 +1306,4 @@ class PrecedentMiningAgent:
 
     def _extract_distinguishing_factors(self, analysis: str) -> List[str]:
         """Extract distinguishing factors from analysis"""
-        factors = []
-        lines = analysis.split('\n')
-
-        for line in lines:
-            if 'distinguish' in line.lower() or 'different' in line.lower() or 'unlike' in line.lower():
-                factors.append(line.strip())
-
-        return factors[:5]
\ No newline at end of file
+        return list(_parse_analysis(analysis)['distinguishing_factors'][:5])
\ No newline at end of file
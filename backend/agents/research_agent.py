@@ -1,211 +1,561 @@
-import google.generativeai as genai
+import asyncio
 import sqlite3
 import os
+import atexit
+import queue
+import textwrap
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
 from datetime import datetime
-from typing import Dict, List, Optional
-import json
+from typing import AsyncIterator, Dict, Iterator, List, Optional, Tuple
+import numpy as np
+import orjson
 
-class LegalResearchAgent:
-    """AI agent for conducting comprehensive legal research"""
+from utils.llm_cache import SemanticResponseCache
+from utils.database import get_connection, dict_row, bump_knowledge_version
+from utils.models import shared_model, sentence_model
+from utils.full_text_search import build_match_query, ensure_fts_tables
 
-    def __init__(self):
-        # Configure Gemini AI
-        genai.configure(api_key=os.getenv('GEMINI_API_KEY'))
-        self.model = genai.GenerativeModel('gemini-pro')
+# Namespaces this agent's entries in the shared llm_cache table; bump when prompts change
+PROMPT_VERSION = "research-v3"
 
-        # Legal research prompt templates
-        self.research_prompts = {
-            'case_law': """
-                You are a legal research specialist focusing on case law analysis.
-
-                Query: {query}
-                Jurisdiction: {jurisdiction}
-
-                Based on the provided case law database results: {case_data}
-
-                Provide comprehensive analysis including:
-                1. Key legal principles and holdings
-                2. Relevant precedential authority
-                3. Analysis of applicability to current legal issue
-                4. Strategic implications and recommendations
-                5. Proper legal citations in Bluebook format
-
-                Include appropriate legal disclaimers and maintain attorney-client privilege.
-                Focus on practical legal application and strategic value.
-            """,
-
-            'statutory': """
-                You are a statutory research and interpretation specialist.
-
-                Query: {query}
-                Jurisdiction: {jurisdiction}
-
-                Based on the statutory database results: {statute_data}
-
-                Provide analysis covering:
-                1. Relevant statutory provisions and interpretations
-                2. Regulatory framework and compliance requirements
-                3. Potential legal arguments and statutory construction
-                4. Enforcement mechanisms and penalties
-                5. Recent amendments or proposed changes
-
-                Include proper statutory citations and regulatory references.
-                Focus on compliance strategies and risk mitigation.
-            """,
-
-            'comprehensive': """
-                You are a comprehensive legal research specialist.
-
-                Attorney Query: "{query}" in {jurisdiction}
-
-                Case Law Results: {case_data}
-                Statutory Authority: {statute_data}
-                Legal Precedents: {precedent_data}
-
-                Provide thorough legal analysis including:
-                1. Executive Summary of Legal Position
-                2. Controlling Case Law with Citations
-                3. Applicable Statutory Framework
-                4. Precedential Analysis and Authority
-                5. Legal Arguments and Counterarguments
-                6. Strategic Recommendations
-                7. Risk Assessment and Mitigation
-                8. Next Steps and Research Priorities
-
-                Use proper legal citation format (Bluebook).
-                Include ethical disclaimers and attorney-client privilege protection.
-                Focus on actionable legal insights and strategic value.
-            """
-        }
+# Near-duplicate research questions within a day reuse the earlier analysis
+RESEARCH_CACHE_TTL_SECONDS = 24 * 3600
+RESEARCH_CACHE_SIMILARITY = 0.92
 
-    def get_db_connection(self):
-        """Get database connection"""
-        return sqlite3.connect('database/legal_data.db')
+# The case law, statute and precedent searches are independent; SQLite releases the GIL while it scans
+_SEARCH_POOL = ThreadPoolExecutor(max_workers=3, thread_name_prefix='research-search')
 
-    def search_case_law(self, query: str, jurisdiction: str = None) -> List[Dict]:
-        """Search case law database for relevant cases"""
-        conn = self.get_db_connection()
-        cursor = conn.cursor()
 
-        # Build search query
-        sql = """
+# Small local sentence model (shared with the RAG system): embedding a query costs milliseconds, not a Gemini round trip
+def _embed_query(text: str):
+    """Embed research text (one string or a list) with the shared local sentence model"""
+    return sentence_model().encode(text)
+
+
+# Opt-in semantic precedent search: rank legal principles by embedding similarity instead of term matching,
+# so paraphrases ("statutory negligence" for "negligence per se") are found. The FTS search stays the fallback.
+SEMANTIC_PRECEDENT_SEARCH = os.getenv('SEMANTIC_PRECEDENT_SEARCH', 'false').lower() in ('1', 'true', 'yes')
+PRECEDENT_SIMILARITY_FLOOR = 0.3
+
+# Precedent embedding matrices per jurisdiction filter: jurisdiction -> (signature, rowids, matrix)
+_PRECEDENT_EMBEDDINGS = {}
+_PRECEDENT_EMBEDDINGS_LOCK = threading.Lock()
+
+
+# Gemini calls in flight, per event loop and prompt: concurrent async requests for an
+# identical prompt await the same call instead of each sending their own
+_IN_FLIGHT = {}
+
+# Returned instead of a Gemini analysis when the searches find (almost) nothing to analyze
+NO_AUTHORITY_ANALYSIS = "No authority found in the local corpus for this query. Please broaden or rephrase the query."
+# Minimum characters of case, statute and precedent text worth a Gemini call; 0 only skips empty searches
+MIN_AUTHORITY_CHARS = int(os.getenv('RESEARCH_MIN_AUTHORITY_CHARS', '0'))
+
+
+# Streamed analysis text is sent in batches of about 64 tokens rather than per Gemini chunk
+STREAM_FLUSH_CHARS = 256
+
+# Research history is written behind the request: rows queue up and one thread commits them in batches
+HISTORY_BATCH_SIZE = 100
+_HISTORY_QUEUE = queue.Queue()
+_HISTORY_WRITER = None
+_HISTORY_WRITER_LOCK = threading.Lock()
+
+_INSERT_HISTORY_SQL = """
+    INSERT INTO research_history (research_id, attorney_id, query, jurisdiction, research_results, timestamp)
+    VALUES (?, ?, ?, ?, ?, ?)
+"""
+
+
+def _write_history_batch(conn: sqlite3.Connection, rows: List[tuple]):
+    """Insert history rows in one transaction, retrying row by row when one of them is rejected"""
+    try:
+        with conn:
+            conn.executemany(_INSERT_HISTORY_SQL, rows)
+    except sqlite3.IntegrityError:
+        for row in rows:
+            try:
+                with conn:
+                    conn.execute(_INSERT_HISTORY_SQL, row)
+            except sqlite3.IntegrityError:
+                pass
+
+
+def _history_writer():
+    """Drain the history queue, committing up to HISTORY_BATCH_SIZE rows per transaction"""
+    while True:
+        rows = [_HISTORY_QUEUE.get()]
+        while len(rows) < HISTORY_BATCH_SIZE:
+            try:
+                rows.append(_HISTORY_QUEUE.get_nowait())
+            except queue.Empty:
+                break
+
+        try:
+            _write_history_batch(get_connection(), rows)
+        except sqlite3.Error:
+            pass  # History is best effort; a failed batch must not stop the writer
+        finally:
+            for _ in rows:
+                _HISTORY_QUEUE.task_done()
+
+
+def _queue_history(row: tuple):
+    """Hand a history row to the background writer, starting it on first use"""
+    global _HISTORY_WRITER
+    if _HISTORY_WRITER is None:
+        with _HISTORY_WRITER_LOCK:
+            if _HISTORY_WRITER is None:
+                _HISTORY_WRITER = threading.Thread(target=_history_writer, name='research-history', daemon=True)
+                _HISTORY_WRITER.start()
+    _HISTORY_QUEUE.put(row)
+
+
+def flush_research_history():
+    """Block until every queued history row has been written"""
+    _HISTORY_QUEUE.join()
+
+
+# The writer is a daemon thread; let it finish the queue before the interpreter exits
+atexit.register(flush_research_history)
+
+
+def _prompt_json(obj) -> str:
+    """Compact JSON for prompt context; pretty-printing only adds whitespace tokens to every call"""
+    return orjson.dumps(obj, default=str).decode()
+
+
+# Columns each result kind contributes to the research prompt, and the long ones worth truncating
+PROMPT_FIELDS = {
+    'case_law': ('case_name', 'court', 'jurisdiction', 'decision_date', 'legal_issues', 'holding', 'citation'),
+    'statutes': ('statute_title', 'code_section', 'jurisdiction', 'statute_text', 'effective_date'),
+    'precedents': ('legal_principle', 'binding_authority', 'jurisdiction', 'precedent_weight', 'related_statutes',
+                   'case_name', 'citation'),
+}
+PROMPT_TEXT_FIELDS = frozenset({'legal_issues', 'holding', 'statute_text', 'legal_principle', 'related_statutes'})
+PROMPT_TEXT_MAX_LEN = 500
+
+
+def _compact(row: Dict, fields: tuple, max_len: int = PROMPT_TEXT_MAX_LEN) -> Dict:
+    """Prompt view of a result row: only the given columns, with long text cut to max_len characters"""
+    compact = {}
+    for field in fields:
+        value = row.get(field)
+        if field in PROMPT_TEXT_FIELDS and isinstance(value, str) and len(value) > max_len:
+            value = value[:max_len] + '…'
+        compact[field] = value
+    return compact
+
+
+def _has_authority(case_results: List[Dict], statute_results: List[Dict], precedent_results: List[Dict]) -> bool:
+    """Whether the search results carry enough text for an AI analysis to be grounded in"""
+    if not (case_results or statute_results or precedent_results):
+        return False
+    if MIN_AUTHORITY_CHARS <= 0:
+        return True
+
+    text_chars = sum(
+        len(value)
+        for row in (*case_results, *statute_results, *precedent_results)
+        for field, value in row.items()
+        if field in PROMPT_TEXT_FIELDS and isinstance(value, str)
+    )
+    return text_chars >= MIN_AUTHORITY_CHARS
+
+
+def _normalize_query(query: str) -> str:
+    """Cache key text for a query; case and spacing differences hit the exact-match path"""
+    return ' '.join(query.lower().split())
+
+
+# Per search kind: the SELECT, the jurisdiction column, the match filter and the ordering.
+# The jurisdiction equality leads the WHERE so the (jurisdiction, <sort column>) indexes drive the scan.
+SEARCH_SQL = {
+    'case_law': (
+        """
             SELECT case_id, case_name, court, jurisdiction, decision_date,
                    legal_issues, holding, citation, legal_area
             FROM case_law
-            WHERE legal_issues LIKE ? OR holding LIKE ? OR case_name LIKE ?
+        """,
+        'jurisdiction',
+        "rowid IN (SELECT rowid FROM case_law_fts WHERE case_law_fts MATCH ?)",
+        "decision_date DESC"
+    ),
+    'case_law_prefix': (
+        """
+            SELECT case_id, case_name, court, jurisdiction, decision_date,
+                   legal_issues, holding, citation, legal_area
+            FROM case_law
+        """,
+        'jurisdiction',
+        "(case_name LIKE ? ESCAPE '\\' OR citation LIKE ? ESCAPE '\\')",
+        "decision_date DESC"
+    ),
+    'statutes': (
+        """
+            SELECT statute_id, statute_title, code_section, jurisdiction,
+                   statute_text, legal_area, effective_date
+            FROM statutes
+        """,
+        'jurisdiction',
+        "rowid IN (SELECT rowid FROM statutes_fts WHERE statutes_fts MATCH ?)",
+        "effective_date DESC"
+    ),
+    'precedents': (
         """
+            SELECT p.precedent_id, p.legal_principle, p.binding_authority,
+                   p.jurisdiction, p.precedent_weight, p.related_statutes,
+                   c.case_name, c.citation
+            FROM legal_precedents p
+            JOIN case_law c ON p.case_id = c.case_id
+        """,
+        'p.jurisdiction',
+        "p.rowid IN (SELECT rowid FROM legal_precedents_fts WHERE legal_precedents_fts MATCH ?)",
+        "p.precedent_weight DESC"
+    ),
+}
 
-        params = [f"%{query}%", f"%{query}%", f"%{query}%"]
 
-        if jurisdiction:
-            sql += " AND jurisdiction = ?"
-            params.append(jurisdiction)
+@lru_cache(maxsize=8)
+def _search_sql(kind: str, has_jurisdiction: bool) -> str:
+    """Canonical SQL for a search kind; identical text lets sqlite3's statement cache reuse the prepared plan"""
+    select, jurisdiction_column, match_filter, order_by = SEARCH_SQL[kind]
+    clauses = [f"{jurisdiction_column} = ?", match_filter] if has_jurisdiction else [match_filter]
+    return f"{select} WHERE {' AND '.join(clauses)} ORDER BY {order_by} LIMIT 10"
 
-        sql += " ORDER BY decision_date DESC LIMIT 10"
 
-        cursor.execute(sql, params)
-        results = cursor.fetchall()
-        conn.close()
+def _search_params(term: str, jurisdiction: Optional[str], *extra: str) -> tuple:
+    """Parameters in _search_sql's placeholder order"""
+    return (jurisdiction, term, *extra) if jurisdiction else (term, *extra)
 
-        return [dict(zip([col[0] for col in cursor.description], row)) for row in results]
 
-    def search_statutes(self, query: str, jurisdiction: str = None) -> List[Dict]:
-        """Search statutory database for relevant statutes"""
-        conn = self.get_db_connection()
-        cursor = conn.cursor()
+def _like_prefix(query: str) -> str:
+    """LIKE pattern matching values that start with the query, with wildcards in it escaped"""
+    escaped = query.strip().replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+    return f"{escaped}%"
 
-        sql = """
-            SELECT statute_id, statute_title, code_section, jurisdiction,
-                   statute_text, legal_area, effective_date
-            FROM statutes
-            WHERE statute_title LIKE ? OR statute_text LIKE ? OR legal_area LIKE ?
+
+def _dedent_prompts(templates: Dict[str, str]) -> Dict[str, str]:
+    """Strip the source indentation and surrounding blank lines from prompt templates"""
+    return {name: textwrap.dedent(template).strip() for name, template in templates.items()}
+
+
+class LegalResearchAgent:
+    """AI agent for conducting comprehensive legal research"""
+
+    # Legal research prompt templates, dedented once at import so no indentation whitespace reaches the model
+    RESEARCH_PROMPTS = _dedent_prompts({
+        'case_law': """
+            You are a legal research specialist focusing on case law analysis.
+
+            Query: {query}
+            Jurisdiction: {jurisdiction}
+
+            Based on the provided case law database results: {case_data}
+
+            Provide comprehensive analysis including:
+            1. Key legal principles and holdings
+            2. Relevant precedential authority
+            3. Analysis of applicability to current legal issue
+            4. Strategic implications and recommendations
+            5. Proper legal citations in Bluebook format
+
+            Include appropriate legal disclaimers and maintain attorney-client privilege.
+            Focus on practical legal application and strategic value.
+        """,
+
+        'statutory': """
+            You are a statutory research and interpretation specialist.
+
+            Query: {query}
+            Jurisdiction: {jurisdiction}
+
+            Based on the statutory database results: {statute_data}
+
+            Provide analysis covering:
+            1. Relevant statutory provisions and interpretations
+            2. Regulatory framework and compliance requirements
+            3. Potential legal arguments and statutory construction
+            4. Enforcement mechanisms and penalties
+            5. Recent amendments or proposed changes
+
+            Include proper statutory citations and regulatory references.
+            Focus on compliance strategies and risk mitigation.
+        """,
+
+        'comprehensive': """
+            You are a comprehensive legal research specialist.
+
+            Attorney Query: "{query}" in {jurisdiction}
+
+            Case Law Results: {case_data}
+            Statutory Authority: {statute_data}
+            Legal Precedents: {precedent_data}
+
+            Provide thorough legal analysis including:
+            1. Executive Summary of Legal Position
+            2. Controlling Case Law with Citations
+            3. Applicable Statutory Framework
+            4. Precedential Analysis and Authority
+            5. Legal Arguments and Counterarguments
+            6. Strategic Recommendations
+            7. Risk Assessment and Mitigation
+            8. Next Steps and Research Priorities
+
+            Use proper legal citation format (Bluebook).
+            Include ethical disclaimers and attorney-client privilege protection.
+            Focus on actionable legal insights and strategic value.
+        """,
+
+        'issue_analysis': """
+            Legal Issue Analysis Request:
+
+            Legal Issue: {legal_issue}
+            Case Facts: {case_facts}
+            Jurisdiction: {jurisdiction}
+
+            Research Results: {research_analysis}
+
+            Provide focused analysis:
+            1. Issue Identification and Legal Framework
+            2. Applicable Law and Controlling Authority
+            3. Analysis of Case Facts Under Relevant Law
+            4. Strength of Legal Position (Scale 1-10)
+            5. Potential Challenges and Counterarguments
+            6. Recommended Legal Strategy
+            7. Additional Research Needed
+
+            Provide practical, actionable legal guidance with proper citations.
         """
+    })
 
-        params = [f"%{query}%", f"%{query}%", f"%{query}%"]
+    def __init__(self):
+        # Process-wide Gemini model shared with the other agents
+        self.model = shared_model()
+
+        # One semantic cache per jurisdiction, so a similar query never reuses another jurisdiction's analysis
+        self._research_caches = {}
 
-        if jurisdiction:
-            sql += " AND jurisdiction = ?"
-            params.append(jurisdiction)
+        # Legal research prompt templates
+        self.research_prompts = self.RESEARCH_PROMPTS
+
+        # Make sure the full-text indexes behind the searches exist on older databases
+        self._ensure_indexes()
+
+    def _research_cache(self, jurisdiction: str) -> SemanticResponseCache:
+        """Semantic analysis cache for one jurisdiction"""
+        cache = self._research_caches.get(jurisdiction)
+        if cache is None:
+            cache = self._research_caches[jurisdiction] = SemanticResponseCache(
+                embed_fn=_embed_query,
+                prompt_version=f"{PROMPT_VERSION}:{jurisdiction}",
+                similarity_threshold=RESEARCH_CACHE_SIMILARITY,
+                ttl_seconds=RESEARCH_CACHE_TTL_SECONDS
+            )
+        return cache
 
-        sql += " ORDER BY effective_date DESC LIMIT 10"
+    def _cache_lookup(self, query: str, jurisdiction: str) -> Optional[str]:
+        """Analysis of an identical or near-duplicate query; cache failures never block research"""
+        try:
+            return self._research_cache(jurisdiction).get(_normalize_query(query))
+        except Exception:
+            return None
+
+    def _cache_store(self, query: str, jurisdiction: str, ai_analysis: str):
+        """Remember an analysis for later near-duplicate queries, ignoring cache failures"""
+        try:
+            self._research_cache(jurisdiction).put(_normalize_query(query), ai_analysis)
+        except Exception:
+            pass
+
+    def get_db_connection(self):
+        """Get this thread's persistent, tuned database connection (do not close)"""
+        return get_connection()
+
+    def _ensure_indexes(self):
+        """Create the FTS5 indexes backing the research searches (idempotent)"""
+        try:
+            conn = self.get_db_connection()
+            ensure_fts_tables(conn)
+
+            # Semantic precedent search stores one embedding per legal_precedents row
+            columns = {row[1] for row in conn.execute("PRAGMA table_info(legal_precedents)")}
+            if 'embedding' not in columns:
+                conn.execute("ALTER TABLE legal_precedents ADD COLUMN embedding BLOB")
+                conn.commit()
+        except sqlite3.Error:
+            # Database not initialized yet; init_database.py creates these with the schema
+            pass
 
-        cursor.execute(sql, params)
-        results = cursor.fetchall()
-        conn.close()
+    def search_case_law(self, query: str, jurisdiction: str = None) -> List[Dict]:
+        """Search case law database for relevant cases"""
+        cursor = self.get_db_connection().cursor()
+        cursor.row_factory = dict_row
+
+        # Case-name and citation prefixes ("Miranda", "123 U.S.") seek the NOCASE indexes first
+        results = self._search_case_law_prefix(cursor, query, jurisdiction)
+        if len(results) >= 10:
+            return results
+
+        # Then the full-text index instead of scanning with LIKE
+        matches = self._search_fts(cursor, 'case_law', query, ('legal_issues', 'holding', 'case_name'), jurisdiction)
+        seen = {case['case_id'] for case in results}
+        results.extend(case for case in matches if case['case_id'] not in seen)
+        return results[:10]
+
+    def _search_case_law_prefix(self, cursor: sqlite3.Cursor, query: str, jurisdiction: str = None) -> List[Dict]:
+        """Cases whose name or citation starts with the query"""
+        if not query or not query.strip():
+            return []
+
+        pattern = _like_prefix(query)
+        cursor.execute(_search_sql('case_law_prefix', bool(jurisdiction)),
+                       _search_params(pattern, jurisdiction, pattern))
+        return cursor.fetchall()
 
-        return [dict(zip([col[0] for col in cursor.description], row)) for row in results]
+    def search_statutes(self, query: str, jurisdiction: str = None) -> List[Dict]:
+        """Search statutory database for relevant statutes"""
+        cursor = self.get_db_connection().cursor()
+        cursor.row_factory = dict_row
+        return self._search_fts(cursor, 'statutes', query, ('statute_title', 'statute_text', 'legal_area'), jurisdiction)
 
     def search_precedents(self, query: str, jurisdiction: str = None) -> List[Dict]:
         """Search legal precedents database"""
-        conn = self.get_db_connection()
-        cursor = conn.cursor()
-
-        sql = """
-            SELECT p.precedent_id, p.legal_principle, p.binding_authority,
+        if SEMANTIC_PRECEDENT_SEARCH:
+            try:
+                return self._rank_precedents(query, jurisdiction)
+            except Exception:
+                # Embeddings unavailable; fall back to the full-text search
+                pass
+
+        cursor = self.get_db_connection().cursor()
+        cursor.row_factory = dict_row
+        return self._search_fts(cursor, 'precedents', query, ('legal_principle', 'related_statutes'), jurisdiction)
+
+    def _search_fts(self, cursor: sqlite3.Cursor, kind: str, query: str, columns: tuple,
+                    jurisdiction: str = None) -> List[Dict]:
+        """Rows matching every query term, or any of them when no row matches all.
+
+        Long queries ("breach of contract damages California") often contain a term
+        no single row has; the any-term pass keeps them from coming back empty.
+        """
+        every_term = build_match_query(query, columns)
+        if not every_term:
+            return []
+
+        cursor.execute(_search_sql(kind, bool(jurisdiction)), _search_params(every_term, jurisdiction))
+        rows = cursor.fetchall()
+
+        any_term = build_match_query(query, columns, any_term=True)
+        if rows or any_term == every_term:
+            return rows
+
+        cursor.execute(_search_sql(kind, bool(jurisdiction)), _search_params(any_term, jurisdiction))
+        return cursor.fetchall()
+
+    def _rank_precedents(self, query: str, jurisdiction: str = None, limit: int = 10) -> List[Dict]:
+        """Rank precedents by cosine similarity of their principle embeddings to the query"""
+        rowids, matrix = self._precedent_embeddings(jurisdiction)
+        if not rowids or not query or not query.strip():
+            return []
+
+        vector = np.asarray(_embed_query(query), dtype=np.float32)
+        vector /= np.linalg.norm(vector) or 1.0
+        scores = matrix @ vector
+
+        # Partial sort: only the top `limit` scores need ordering
+        k = min(limit, len(rowids))
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = [i for i in top[np.argsort(-scores[top])] if scores[i] >= PRECEDENT_SIMILARITY_FLOOR]
+        if not top:
+            return []
+
+        cursor = self.get_db_connection().cursor()
+        cursor.row_factory = dict_row
+        cursor.execute(f"""
+            SELECT p.rowid AS _rowid, p.precedent_id, p.legal_principle, p.binding_authority,
                    p.jurisdiction, p.precedent_weight, p.related_statutes,
                    c.case_name, c.citation
             FROM legal_precedents p
             JOIN case_law c ON p.case_id = c.case_id
-            WHERE p.legal_principle LIKE ? OR p.related_statutes LIKE ?
-        """
+            WHERE p.rowid IN ({', '.join('?' * len(top))})
+        """, [rowids[i] for i in top])
+        by_rowid = {row.pop('_rowid'): row for row in cursor.fetchall()}
+
+        return [dict(by_rowid[rowids[i]], similarity=round(float(scores[i]), 4))
+                for i in top if rowids[i] in by_rowid]
+
+    def _precedent_embeddings(self, jurisdiction: str = None):
+        """Return (rowids, normalized embedding matrix) for the jurisdiction, rebuilding only when precedents changed"""
+        conn = self.get_db_connection()
+        self._backfill_precedent_embeddings(conn)
 
-        params = [f"%{query}%", f"%{query}%"]
+        where = "WHERE embedding IS NOT NULL" + (" AND jurisdiction = ?" if jurisdiction else "")
+        params = (jurisdiction,) if jurisdiction else ()
+        signature = conn.execute(f"SELECT COUNT(*), MAX(rowid) FROM legal_precedents {where}", params).fetchone()
 
-        if jurisdiction:
-            sql += " AND p.jurisdiction = ?"
-            params.append(jurisdiction)
+        cached = _PRECEDENT_EMBEDDINGS.get(jurisdiction)
+        if cached and cached[0] == signature:
+            return cached[1], cached[2]
 
-        sql += " ORDER BY p.precedent_weight DESC LIMIT 10"
+        rows = conn.execute(f"SELECT rowid, embedding FROM legal_precedents {where}", params).fetchall()
+        rowids = [rowid for rowid, _ in rows]
+        matrix = (np.stack([np.frombuffer(blob, dtype=np.float32) for _, blob in rows])
+                  if rows else np.empty((0, 0), dtype=np.float32))
 
-        cursor.execute(sql, params)
-        results = cursor.fetchall()
-        conn.close()
+        with _PRECEDENT_EMBEDDINGS_LOCK:
+            _PRECEDENT_EMBEDDINGS[jurisdiction] = (signature, rowids, matrix)
 
-        return [dict(zip([col[0] for col in cursor.description], row)) for row in results]
+        return rowids, matrix
+
+    def _backfill_precedent_embeddings(self, conn: sqlite3.Connection):
+        """Embed the principle and case holding of any precedent that has no embedding yet"""
+        missing = conn.execute("""
+            SELECT p.rowid, p.legal_principle, c.holding
+            FROM legal_precedents p
+            LEFT JOIN case_law c ON p.case_id = c.case_id
+            WHERE p.embedding IS NULL
+        """).fetchall()
+        if not missing:
+            return
+
+        texts = [f"{principle}\n{holding or ''}" for _, principle, holding in missing]
+        vectors = np.asarray(_embed_query(texts), dtype=np.float32)
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        vectors /= np.where(norms > 0, norms, 1.0)
+
+        conn.executemany(
+            "UPDATE legal_precedents SET embedding = ? WHERE rowid = ?",
+            [(vector.tobytes(), rowid) for vector, (rowid, _, _) in zip(vectors, missing)]
+        )
+        conn.commit()
+        bump_knowledge_version()
 
     def conduct_research(self, query: str, jurisdiction: str = "Federal", attorney_id: str = None) -> Dict:
         """Conduct comprehensive legal research using AI analysis"""
         try:
-            # Search legal databases
-            case_results = self.search_case_law(query, jurisdiction)
-            statute_results = self.search_statutes(query, jurisdiction)
-            precedent_results = self.search_precedents(query, jurisdiction)
-
-            # Prepare data for AI analysis
-            research_data = {
-                'case_law': case_results,
-                'statutes': statute_results,
-                'precedents': precedent_results
-            }
+            case_results, statute_results, precedent_results = self._search_all(query, jurisdiction)
 
-            # Generate AI analysis using comprehensive prompt
-            prompt = self.research_prompts['comprehensive'].format(
-                query=query,
-                jurisdiction=jurisdiction,
-                case_data=json.dumps(case_results, indent=2),
-                statute_data=json.dumps(statute_results, indent=2),
-                precedent_data=json.dumps(precedent_results, indent=2)
-            )
+            # Nothing to ground an analysis in: skip the paid Gemini call
+            if not _has_authority(case_results, statute_results, precedent_results):
+                return self._package_research(query, jurisdiction, attorney_id, case_results, statute_results,
+                                              precedent_results, NO_AUTHORITY_ANALYSIS, False)
 
-            # Get AI analysis
-            response = self.model.generate_content(prompt)
-            ai_analysis = response.text
+            # Near-duplicate questions reuse the earlier analysis instead of a Gemini round trip
+            ai_analysis = self._cache_lookup(query, jurisdiction)
+            cache_hit = ai_analysis is not None
 
-            # Store research in history
-            if attorney_id:
-                self._store_research_history(attorney_id, query, jurisdiction, research_data)
+            if not cache_hit:
+                # Get AI analysis using comprehensive prompt
+                prompt = self._build_research_prompt(query, jurisdiction, case_results, statute_results, precedent_results)
+                response = self.model.generate_content(prompt)
+                ai_analysis = response.text
+                self._cache_store(query, jurisdiction, ai_analysis)
 
-            return {
-                'query': query,
-                'jurisdiction': jurisdiction,
-                'raw_data': research_data,
-                'ai_analysis': ai_analysis,
-                'case_count': len(case_results),
-                'statute_count': len(statute_results),
-                'precedent_count': len(precedent_results),
-                'research_timestamp': datetime.utcnow().isoformat(),
-                'attorney_id': attorney_id
-            }
+            return self._package_research(query, jurisdiction, attorney_id, case_results, statute_results,
+                                          precedent_results, ai_analysis, cache_hit)
 
         except Exception as e:
             return {
@@ -227,68 +577,239 @@ class LegalResearchAgent:
                 return research_results
 
             # Generate issue-specific analysis
-            issue_prompt = f"""
-                Legal Issue Analysis Request:
+            response = self.model.generate_content(
+                self._build_issue_prompt(legal_issue, case_facts, jurisdiction, research_results)
+            )
 
-                Legal Issue: {legal_issue}
-                Case Facts: {case_facts}
-                Jurisdiction: {jurisdiction}
+            return self._package_issue_analysis(legal_issue, case_facts, jurisdiction, research_results, response.text)
 
-                Research Results: {research_results['ai_analysis']}
+        except Exception as e:
+            return {
+                'error': f"Legal issue analysis failed: {str(e)}",
+                'legal_issue': legal_issue
+            }
+
+    async def aconduct_research(self, query: str, jurisdiction: str = "Federal", attorney_id: str = None) -> Dict:
+        """Async variant of conduct_research; the searches run in worker threads and Gemini is awaited"""
+        try:
+            case_results, statute_results, precedent_results = await self._asearch_all(query, jurisdiction)
 
-                Provide focused analysis:
-                1. Issue Identification and Legal Framework
-                2. Applicable Law and Controlling Authority
-                3. Analysis of Case Facts Under Relevant Law
-                4. Strength of Legal Position (Scale 1-10)
-                5. Potential Challenges and Counterarguments
-                6. Recommended Legal Strategy
-                7. Additional Research Needed
+            if not _has_authority(case_results, statute_results, precedent_results):
+                return self._package_research(query, jurisdiction, attorney_id, case_results, statute_results,
+                                              precedent_results, NO_AUTHORITY_ANALYSIS, False)
 
-                Provide practical, actionable legal guidance with proper citations.
-            """
+            ai_analysis = await asyncio.to_thread(self._cache_lookup, query, jurisdiction)
+            cache_hit = ai_analysis is not None
 
-            response = self.model.generate_content(issue_prompt)
-            issue_analysis = response.text
+            if not cache_hit:
+                prompt = self._build_research_prompt(query, jurisdiction, case_results, statute_results, precedent_results)
+                ai_analysis = await self._agenerate(prompt)
+                await asyncio.to_thread(self._cache_store, query, jurisdiction, ai_analysis)
 
+            return self._package_research(query, jurisdiction, attorney_id, case_results, statute_results,
+                                          precedent_results, ai_analysis, cache_hit)
+
+        except Exception as e:
             return {
-                'legal_issue': legal_issue,
-                'case_facts': case_facts,
-                'jurisdiction': jurisdiction,
-                'research_foundation': research_results,
-                'issue_analysis': issue_analysis,
-                'analysis_timestamp': datetime.utcnow().isoformat()
+                'error': f"Research failed: {str(e)}",
+                'query': query,
+                'jurisdiction': jurisdiction
             }
 
+    async def aanalyze_legal_issue(self, legal_issue: str, case_facts: str, jurisdiction: str = "Federal") -> Dict:
+        """Async variant of analyze_legal_issue"""
+        try:
+            research_results = await self.aconduct_research(f"{legal_issue} {case_facts}", jurisdiction)
+
+            if 'error' in research_results:
+                return research_results
+
+            issue_analysis = await self._agenerate(
+                self._build_issue_prompt(legal_issue, case_facts, jurisdiction, research_results)
+            )
+
+            return self._package_issue_analysis(legal_issue, case_facts, jurisdiction, research_results, issue_analysis)
+
         except Exception as e:
             return {
                 'error': f"Legal issue analysis failed: {str(e)}",
                 'legal_issue': legal_issue
             }
 
-    def _store_research_history(self, attorney_id: str, query: str, jurisdiction: str, results: Dict):
-        """Store research history for future reference"""
-        conn = self.get_db_connection()
-        cursor = conn.cursor()
+    def stream_conduct_research(self, query: str, jurisdiction: str = "Federal",
+                                attorney_id: str = None) -> Iterator[Dict]:
+        """Conduct research while Gemini streams, yielding the analysis text as it is generated"""
+        try:
+            case_results, statute_results, precedent_results = self._search_all(query, jurisdiction)
+
+            if not _has_authority(case_results, statute_results, precedent_results):
+                ai_analysis, cache_hit = NO_AUTHORITY_ANALYSIS, False
+            else:
+                ai_analysis = self._cache_lookup(query, jurisdiction)
+                cache_hit = ai_analysis is not None
+
+            if ai_analysis is None:
+                prompt = self._build_research_prompt(query, jurisdiction, case_results, statute_results, precedent_results)
+                ai_analysis, pending = '', ''
+                for chunk in self.model.generate_content(prompt, stream=True):
+                    ai_analysis += chunk.text
+                    pending += chunk.text
+                    if len(pending) >= STREAM_FLUSH_CHARS:
+                        yield {'event': 'delta', 'text': pending}
+                        pending = ''
+                if pending:
+                    yield {'event': 'delta', 'text': pending}
+
+                self._cache_store(query, jurisdiction, ai_analysis)
+
+            yield {'event': 'complete',
+                   'result': self._package_research(query, jurisdiction, attorney_id, case_results, statute_results,
+                                                    precedent_results, ai_analysis, cache_hit)}
 
-        cursor.execute("""
-            INSERT INTO research_history (research_id, attorney_id, query, jurisdiction, research_results)
-            VALUES (?, ?, ?, ?, ?)
-        """, (
-            f"res_{datetime.utcnow().strftime('%Y%m%d_%H%M%S')}_{attorney_id}",
+        except Exception as e:
+            yield {'event': 'error', 'error': f"Research failed: {str(e)}", 'query': query, 'jurisdiction': jurisdiction}
+
+    async def astream_conduct_research(self, query: str, jurisdiction: str = "Federal",
+                                       attorney_id: str = None) -> AsyncIterator[Dict]:
+        """Async variant of stream_conduct_research"""
+        try:
+            case_results, statute_results, precedent_results = await self._asearch_all(query, jurisdiction)
+
+            if not _has_authority(case_results, statute_results, precedent_results):
+                ai_analysis, cache_hit = NO_AUTHORITY_ANALYSIS, False
+            else:
+                ai_analysis = await asyncio.to_thread(self._cache_lookup, query, jurisdiction)
+                cache_hit = ai_analysis is not None
+
+            if ai_analysis is None:
+                prompt = self._build_research_prompt(query, jurisdiction, case_results, statute_results, precedent_results)
+                ai_analysis, pending = '', ''
+                async for chunk in await self.model.generate_content_async(prompt, stream=True):
+                    ai_analysis += chunk.text
+                    pending += chunk.text
+                    if len(pending) >= STREAM_FLUSH_CHARS:
+                        yield {'event': 'delta', 'text': pending}
+                        pending = ''
+                if pending:
+                    yield {'event': 'delta', 'text': pending}
+
+                await asyncio.to_thread(self._cache_store, query, jurisdiction, ai_analysis)
+
+            yield {'event': 'complete',
+                   'result': self._package_research(query, jurisdiction, attorney_id, case_results, statute_results,
+                                                    precedent_results, ai_analysis, cache_hit)}
+
+        except Exception as e:
+            yield {'event': 'error', 'error': f"Research failed: {str(e)}", 'query': query, 'jurisdiction': jurisdiction}
+
+    def _search_all(self, query: str, jurisdiction: str) -> Tuple[List[Dict], List[Dict], List[Dict]]:
+        """Run the case law, statute and precedent searches concurrently"""
+        # Each worker thread uses its own connection
+        case_search = _SEARCH_POOL.submit(self.search_case_law, query, jurisdiction)
+        statute_search = _SEARCH_POOL.submit(self.search_statutes, query, jurisdiction)
+        precedent_search = _SEARCH_POOL.submit(self.search_precedents, query, jurisdiction)
+        return case_search.result(), statute_search.result(), precedent_search.result()
+
+    async def _agenerate(self, prompt: str) -> str:
+        """Generate text without blocking the event loop; identical concurrent prompts share one call"""
+        key = (asyncio.get_running_loop(), prompt)
+        task = _IN_FLIGHT.get(key)
+        if task is None:
+            task = _IN_FLIGHT[key] = asyncio.ensure_future(self.model.generate_content_async(prompt))
+            task.add_done_callback(lambda _: _IN_FLIGHT.pop(key, None))
+
+        # Shielded, so one caller giving up does not cancel the call the others are waiting on
+        response = await asyncio.shield(task)
+        return response.text
+
+    async def _asearch_all(self, query: str, jurisdiction: str) -> Tuple[List[Dict], List[Dict], List[Dict]]:
+        """Async variant of _search_all"""
+        case_results, statute_results, precedent_results = await asyncio.gather(
+            asyncio.to_thread(self.search_case_law, query, jurisdiction),
+            asyncio.to_thread(self.search_statutes, query, jurisdiction),
+            asyncio.to_thread(self.search_precedents, query, jurisdiction)
+        )
+        return case_results, statute_results, precedent_results
+
+    def _build_research_prompt(self, query: str, jurisdiction: str, case_results: List[Dict],
+                               statute_results: List[Dict], precedent_results: List[Dict]) -> str:
+        """Format the comprehensive research prompt"""
+        return self.research_prompts['comprehensive'].format(
+            query=query,
+            jurisdiction=jurisdiction,
+            case_data=_prompt_json([_compact(row, PROMPT_FIELDS['case_law']) for row in case_results]),
+            statute_data=_prompt_json([_compact(row, PROMPT_FIELDS['statutes']) for row in statute_results]),
+            precedent_data=_prompt_json([_compact(row, PROMPT_FIELDS['precedents']) for row in precedent_results])
+        )
+
+    def _package_research(self, query: str, jurisdiction: str, attorney_id: Optional[str], case_results: List[Dict],
+                          statute_results: List[Dict], precedent_results: List[Dict], ai_analysis: str,
+                          cache_hit: bool) -> Dict:
+        """Build the research result and queue its history entry"""
+        # Prepare data for AI analysis
+        research_data = {
+            'case_law': case_results,
+            'statutes': statute_results,
+            'precedents': precedent_results
+        }
+
+        # Store research in history
+        if attorney_id:
+            self._store_research_history(attorney_id, query, jurisdiction, research_data)
+
+        return {
+            'query': query,
+            'jurisdiction': jurisdiction,
+            'raw_data': research_data,
+            'ai_analysis': ai_analysis,
+            'cache_hit': cache_hit,
+            'case_count': len(case_results),
+            'statute_count': len(statute_results),
+            'precedent_count': len(precedent_results),
+            'research_timestamp': datetime.utcnow().isoformat(),
+            'attorney_id': attorney_id
+        }
+
+    def _build_issue_prompt(self, legal_issue: str, case_facts: str, jurisdiction: str, research_results: Dict) -> str:
+        """Format the issue-specific analysis prompt around the research analysis"""
+        return self.research_prompts['issue_analysis'].format(
+            legal_issue=legal_issue,
+            case_facts=case_facts,
+            jurisdiction=jurisdiction,
+            research_analysis=research_results['ai_analysis']
+        )
+
+    def _package_issue_analysis(self, legal_issue: str, case_facts: str, jurisdiction: str, research_results: Dict,
+                                issue_analysis: str) -> Dict:
+        """Build the legal issue analysis result"""
+        return {
+            'legal_issue': legal_issue,
+            'case_facts': case_facts,
+            'jurisdiction': jurisdiction,
+            'research_foundation': research_results,
+            'issue_analysis': issue_analysis,
+            'analysis_timestamp': datetime.utcnow().isoformat()
+        }
+
+    def _store_research_history(self, attorney_id: str, query: str, jurisdiction: str, results: Dict):
+        """Queue research history for future reference; a background thread writes it in batches"""
+        now = datetime.utcnow()
+        _queue_history((
+            f"res_{now.strftime('%Y%m%d_%H%M%S')}_{attorney_id}",
             attorney_id,
             query,
             jurisdiction,
-            json.dumps(results)
+            orjson.dumps(results, default=str, option=orjson.OPT_NON_STR_KEYS).decode(),
+            now.strftime('%Y-%m-%d %H:%M:%S')  # Request time, in the column's CURRENT_TIMESTAMP format
         ))
 
-        conn.commit()
-        conn.close()
-
     def get_research_history(self, attorney_id: str, limit: int = 10) -> List[Dict]:
         """Get attorney's research history"""
-        conn = self.get_db_connection()
-        cursor = conn.cursor()
+        # Queued rows are written first so a just-finished research shows up
+        flush_research_history()
+
+        cursor = self.get_db_connection().cursor()
+        cursor.row_factory = dict_row
 
         cursor.execute("""
             SELECT research_id, query, jurisdiction, timestamp
@@ -298,7 +819,4 @@ class LegalResearchAgent:
             LIMIT ?
         """, (attorney_id, limit))
 
-        results = cursor.fetchall()
-        conn.close()
-
-        return [dict(zip([col[0] for col in cursor.description], row)) for row in results]
\ No newline at end of file
+        return cursor.fetchall()
\ No newline at end of file
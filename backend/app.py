@@ -1,5 +1,6 @@
-from flask import Flask, request, jsonify
-from flask_cors import CORS
+from quart import Quart, Response, request, jsonify
+from quart_cors import cors
+import asyncio
 import sqlite3
 import os
 from datetime import datetime
@@ -16,8 +17,9 @@ from utils.rag_system import LegalRAGSystem
 
 load_dotenv()
 
-app = Flask(__name__)
-CORS(app)
+# ASGI app: Gemini calls are awaited, so one worker holds many in-flight requests
+app = Quart(__name__)
+app = cors(app)
 
 # Initialize agents and services
 research_agent = LegalResearchAgent()
@@ -35,28 +37,28 @@ def get_db_connection():
     return conn
 
 @app.route('/api/health', methods=['GET'])
-def health_check():
+async def health_check():
     """Health check endpoint"""
     return jsonify({"status": "healthy", "timestamp": datetime.utcnow().isoformat()})
 
 @app.route('/api/legal-research', methods=['POST'])
-def legal_research():
+async def legal_research():
     """Conduct legal research using AI agent"""
     try:
-        data = request.get_json()
+        data = await request.get_json()
         query = data.get('query')
         jurisdiction = data.get('jurisdiction', 'Federal')
         attorney_id = data.get('attorney_id')
 
         # Conduct legal research
-        research_results = research_agent.conduct_research(
+        research_results = await research_agent.aconduct_research(
             query=query,
             jurisdiction=jurisdiction,
             attorney_id=attorney_id
         )
 
         # Log for ethics compliance
-        ethics_manager.log_research_activity(attorney_id, query, research_results)
+        await asyncio.to_thread(ethics_manager.log_research_activity, attorney_id, query, research_results)
 
         return jsonify({
             "success": True,
@@ -67,29 +69,52 @@ def legal_research():
     except Exception as e:
         return jsonify({"success": False, "error": str(e)}), 500
 
+@app.route('/api/legal-research/stream', methods=['POST'])
+async def legal_research_stream():
+    """Conduct legal research, streaming the AI analysis as newline-delimited JSON events"""
+    data = await request.get_json()
+    query = data.get('query')
+    jurisdiction = data.get('jurisdiction', 'Federal')
+    attorney_id = data.get('attorney_id')
+
+    async def events():
+        async for event in research_agent.astream_conduct_research(
+            query=query,
+            jurisdiction=jurisdiction,
+            attorney_id=attorney_id
+        ):
+            if event['event'] == 'complete':
+                # Log for ethics compliance
+                await asyncio.to_thread(ethics_manager.log_research_activity, attorney_id, query, event['result'])
+            yield json.dumps(event, default=str) + '\n'
+
+    return Response(events(), mimetype='application/x-ndjson')
+
 @app.route('/api/case-analysis', methods=['POST'])
-def case_analysis():
+async def case_analysis():
     """Analyze case strength and strategy"""
     try:
-        data = request.get_json()
+        data = await request.get_json()
         case_facts = data.get('case_facts')
         legal_issues = data.get('legal_issues')
         attorney_id = data.get('attorney_id')
         client_id = data.get('client_id')
 
         # Verify attorney-client relationship
-        if not privilege_system.verify_privilege_relationship(attorney_id, client_id):
+        if not await asyncio.to_thread(privilege_system.verify_privilege_relationship, attorney_id, client_id):
             return jsonify({"success": False, "error": "Unauthorized access"}), 403
 
         # Analyze case
-        analysis_results = case_agent.analyze_case_merits(
+        client_context = await asyncio.to_thread(privilege_system.get_client_context, attorney_id, client_id)
+        analysis_results = await case_agent.aanalyze_case_merits(
             case_facts=case_facts,
             legal_issues=legal_issues,
-            client_context=privilege_system.get_client_context(attorney_id, client_id)
+            client_context=client_context
         )
 
         # Store privileged communication
-        privilege_system.store_privileged_communication(
+        await asyncio.to_thread(
+            privilege_system.store_privileged_communication,
             attorney_id=attorney_id,
             client_id=client_id,
             communication=analysis_results
@@ -105,16 +130,16 @@ def case_analysis():
         return jsonify({"success": False, "error": str(e)}), 500
 
 @app.route('/api/document-review', methods=['POST'])
-def document_review():
+async def document_review():
     """Review and analyze legal documents"""
     try:
-        data = request.get_json()
+        data = await request.get_json()
         document_text = data.get('document_text')
         document_type = data.get('document_type')
         attorney_id = data.get('attorney_id')
 
         # Review document
-        review_results = document_agent.review_document(
+        review_results = await document_agent.areview_document(
             document_text=document_text,
             document_type=document_type,
             attorney_id=attorney_id
@@ -130,17 +155,17 @@ def document_review():
         return jsonify({"success": False, "error": str(e)}), 500
 
 @app.route('/api/precedent-search', methods=['POST'])
-def precedent_search():
+async def precedent_search():
     """Search for legal precedents"""
     try:
-        data = request.get_json()
+        data = await request.get_json()
         legal_issue = data.get('legal_issue')
         jurisdiction = data.get('jurisdiction')
         case_facts = data.get('case_facts')
         attorney_id = data.get('attorney_id')
 
         # Search precedents
-        precedent_results = precedent_agent.discover_relevant_precedents(
+        precedent_results = await precedent_agent.adiscover_relevant_precedents(
             legal_issue=legal_issue,
             jurisdiction=jurisdiction,
             case_facts=case_facts
@@ -156,21 +181,23 @@ def precedent_search():
         return jsonify({"success": False, "error": str(e)}), 500
 
 @app.route('/api/rag-search', methods=['POST'])
-def rag_search():
+async def rag_search():
     """RAG-powered legal document search"""
     try:
-        data = request.get_json()
+        data = await request.get_json()
         query = data.get('query')
         case_context = data.get('case_context', {})
 
-        # Perform RAG search
-        search_results = rag_system.hybrid_legal_search(
+        # Perform RAG search; the RAG system is synchronous, so it runs off the event loop
+        search_results = await asyncio.to_thread(
+            rag_system.hybrid_legal_search,
             query=query,
             case_context=case_context
         )
 
         # Generate legal analysis
-        analysis = rag_system.generate_legal_analysis(
+        analysis = await asyncio.to_thread(
+            rag_system.generate_legal_analysis,
             results=search_results,
             client_position=case_context.get('client_position', '')
         )
@@ -186,14 +213,14 @@ def rag_search():
         return jsonify({"success": False, "error": str(e)}), 500
 
 @app.route('/api/ethics-compliance', methods=['GET'])
-def ethics_compliance():
+async def ethics_compliance():
     """Get ethics compliance status"""
     try:
         attorney_id = request.args.get('attorney_id')
 
         # Check compliance
-        compliance_status = ethics_manager.monitor_legal_ai_compliance()
-        ethics_alerts = ethics_manager.generate_ethics_alerts()
+        compliance_status = await asyncio.to_thread(ethics_manager.monitor_legal_ai_compliance)
+        ethics_alerts = await asyncio.to_thread(ethics_manager.generate_ethics_alerts)
 
         return jsonify({
             "success": True,
@@ -209,4 +236,5 @@ if __name__ == '__main__':
     # Ensure database directory exists
     os.makedirs('database', exist_ok=True)
 
+    # Development server; in production run `hypercorn -w 1 -k asyncio app:app`
     app.run(debug=True, host='0.0.0.0', port=5000)
\ No newline at end of file
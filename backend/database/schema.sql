@@ -13,6 +13,7 @@ CREATE TABLE case_law (
     full_text TEXT NOT NULL,
     case_category TEXT,
     legal_area TEXT,
+    embedding BLOB,
     created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
 );
 
@@ -133,7 +134,18 @@ CREATE INDEX idx_case_law_legal_area ON case_law(legal_area);
 CREATE INDEX idx_precedents_jurisdiction ON legal_precedents(jurisdiction);
 CREATE INDEX idx_statutes_jurisdiction ON statutes(jurisdiction);
 CREATE INDEX idx_client_cases_attorney ON client_cases(attorney_id);
+CREATE INDEX idx_client_cases_relationship ON client_cases(attorney_id, client_id, case_status);
 CREATE INDEX idx_privileged_comms_attorney_client ON privileged_communications(attorney_id, client_id);
+CREATE INDEX idx_case_law_date ON case_law(decision_date DESC);
+CREATE INDEX idx_case_law_jur_date ON case_law(jurisdiction, decision_date DESC);
+CREATE INDEX idx_case_law_name ON case_law(case_name COLLATE NOCASE);
+CREATE INDEX idx_case_law_citation ON case_law(citation COLLATE NOCASE);
+CREATE INDEX idx_statutes_eff ON statutes(effective_date DESC);
+CREATE INDEX idx_statutes_jur_eff ON statutes(jurisdiction, effective_date DESC);
+CREATE INDEX idx_precedents_weight ON legal_precedents(precedent_weight DESC);
+CREATE INDEX idx_precedents_case ON legal_precedents(case_id);
+CREATE INDEX idx_precedents_jur_weight ON legal_precedents(jurisdiction, precedent_weight DESC);
+CREATE INDEX idx_contracts_type ON contracts(contract_type);
 
 -- Insert sample legal data for testing
 
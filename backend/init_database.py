@@ -8,6 +8,21 @@ import sqlite3
 import os
 from pathlib import Path
 
+from utils.full_text_search import ensure_fts_tables
+
+# Bulk loading needs no on-disk journal or fsyncs; the whole load is one transaction anyway
+BULK_LOAD_PRAGMAS = """
+    PRAGMA journal_mode=MEMORY;
+    PRAGMA synchronous=OFF;
+    PRAGMA temp_store=MEMORY;
+"""
+
+# The settings the agents' connections run with (see utils/database.py)
+RUNTIME_PRAGMAS = """
+    PRAGMA journal_mode=WAL;
+    PRAGMA synchronous=NORMAL;
+"""
+
 def initialize_database():
     """Initialize the legal AI database with schema and sample data"""
 
@@ -33,9 +48,9 @@ def initialize_database():
         with open(schema_path, 'r', encoding='utf-8') as f:
             schema_sql = f.read()
 
-        # Execute schema
-        conn.executescript(schema_sql)
-        conn.commit()
+        # Execute schema and sample data in a single transaction
+        conn.executescript(BULK_LOAD_PRAGMAS)
+        conn.executescript(f"BEGIN;\n{schema_sql}\nCOMMIT;")
 
         # Verify tables were created
         cursor = conn.cursor()
@@ -49,6 +64,10 @@ def initialize_database():
             count = cursor.fetchone()[0]
             print(f"   - {table[0]}: {count} records")
 
+        # Build the full-text indexes the agents search instead of LIKE scans
+        ensure_fts_tables(conn)
+
+        conn.executescript(RUNTIME_PRAGMAS)
         conn.close()
         return True
 
@@ -4,23 +4,143 @@ Legal AI System Integration Tests
 Tests core functionality and compliance features
 """
 
+import sys
 import unittest
+import pytest
 import json
+import importlib
+from dataclasses import asdict, dataclass
+from functools import lru_cache
+from types import MappingProxyType
 import sqlite3
+import threading
+import numpy as np
 from pathlib import Path
-import sys
-import os
 
-# Add backend to path
-sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+# agents/ and utils/ import as top-level packages: run from backend/, where both
+# `python test_legal_system.py` and pytest already put this directory on sys.path
+
+# Components under test, imported and built only when a test first asks for them
+# (the RAG system alone loads an embedding model and a vector store)
+COMPONENTS = {
+    'research': ('agents.research_agent', 'LegalResearchAgent'),
+    'case': ('agents.case_agent', 'CaseAnalysisAgent'),
+    'document': ('agents.document_agent', 'DocumentReviewAgent'),
+    'precedent': ('agents.precedent_agent', 'PrecedentMiningAgent'),
+    'privilege': ('utils.privilege_protection', 'AttorneyClientPrivilege'),
+    'ethics': ('utils.ethics_compliance', 'LegalEthicsManager'),
+    'rag': ('utils.rag_system', 'LegalRAGSystem'),
+}
+
+
+# Tests whose queries are near-duplicate contract-breach questions; xdist runs them on one
+# worker, back to back, so the embedding, search and response caches filled by the first serve the rest
+CONTRACT_QUERIES = pytest.mark.xdist_group("contract-queries")
+
+# Query strings the tests send through the embedding-backed components
+FIXED_QUERIES = (
+    "breach of contract damages",
+    "Breach of contract, damages calculation",
+    "contract breach remedies",
+    "Software licensing dispute",
+)
+
+
+# Read-only fixtures shared by every test instead of being rebuilt per call
+CLIENT_CONTEXT = MappingProxyType({"client_id": "CLIENT_001", "privilege_level": "high"})
+CASE_CONTEXT = MappingProxyType({"client_position": "plaintiff", "jurisdiction": "California"})
+
+
+@dataclass(frozen=True)
+class Communication:
+    """Privileged communication payload sent to the privilege store"""
+    # Explicit __slots__: dataclass(slots=True) needs Python 3.10 and the project supports 3.9
+    __slots__ = ('type', 'content')
+    type: str
+    content: str
+
+
+COMMUNICATION = Communication(type="case_strategy", content="Confidential legal advice")
+
+
+# One row per agent check, keyed by component: (label, method, kwargs, expected result keys, failure message)
+# (the case agent writes client_context into its prompt, so it gets a plain dict copy, made once here)
+AGENT_CASES = {
+    "research": ("Legal Research Agent", "conduct_research",
+                 {"query": "breach of contract damages", "jurisdiction": "California", "attorney_id": "att_001"},
+                 ("research_summary", "relevant_cases", "applicable_statutes"), "Legal research"),
+    "case": ("Case Analysis Agent", "analyze_case_merits",
+             {"case_facts": "Contract dispute over software licensing agreement",
+              "legal_issues": "Breach of contract, damages calculation",
+              "client_context": dict(CLIENT_CONTEXT)},
+             ("case_strength", "legal_strategy", "risk_assessment"), "Case analysis"),
+    "document": ("Document Review Agent", "review_document",
+                 {"document_text": "This Software License Agreement governs the use of proprietary software...",
+                  "document_type": "license", "attorney_id": "att_001"},
+                 ("document_analysis", "risk_factors", "recommendations"), "Document review"),
+    "precedent": ("Precedent Mining Agent", "discover_relevant_precedents",
+                  {"legal_issue": "breach of contract damages", "jurisdiction": "Federal",
+                   "case_facts": "Software licensing dispute"},
+                  ("relevant_precedents", "binding_authority"), "Precedent discovery"),
+}
+
+
+# lru_cache alone lets two threads (a test and the RAG warm-up) run a build at once, so
+# each build runs under its own lock; the sentence model is wrapped once under its own
+_EMBEDDING_CACHE_LOCK = threading.Lock()
+_BUILD_LOCKS = {name: threading.Lock() for name in COMPONENTS}
+
+
+def _install_embedding_cache():
+    """Serve repeated sentence embeddings from memory, embedding the fixed queries in one batch"""
+    with _EMBEDDING_CACHE_LOCK:
+        _wrap_sentence_model()
+
+
+@lru_cache(maxsize=None)
+def _wrap_sentence_model():
+    """Replace the shared sentence model's encode with the cached one (once per process)"""
+    from utils.models import sentence_model
+
+    model = sentence_model()
+    encode = model.encode
+    cache = dict(zip(FIXED_QUERIES, encode(list(FIXED_QUERIES))))
+
+    def cached_encode(sentences, **kwargs):
+        texts = [sentences] if isinstance(sentences, str) else list(sentences)
+        if kwargs or not texts:
+            return encode(sentences, **kwargs)
+
+        missing = [text for text in dict.fromkeys(texts) if text not in cache]
+        if missing:
+            cache.update(zip(missing, encode(missing)))
+
+        # np.stack copies, so callers normalizing in place never touch the cache
+        vectors = np.stack([cache[text] for text in texts])
+        return vectors[0] if isinstance(sentences, str) else vectors
+
+    model.encode = cached_encode
+
+
+def _build_component(name):
+    """Import and construct a component once per test process"""
+    with _BUILD_LOCKS[name]:
+        return _construct_component(name)
+
+
+@lru_cache(maxsize=None)
+def _construct_component(name):
+    """Import and construct a component; callers hold its build lock"""
+    module_name, class_name = COMPONENTS[name]
+    if name in ('research', 'rag'):
+        _install_embedding_cache()
+
+    component = getattr(importlib.import_module(module_name), class_name)()
+    if name == 'case':
+        # Similar-case ranking embeds the same legal issues through Gemini on every analysis
+        component._embed_prompt = lru_cache(maxsize=None)(component._embed_prompt)
+    return component
 
-from agents.research_agent import LegalResearchAgent
-from agents.case_agent import CaseAnalysisAgent
-from agents.document_agent import DocumentReviewAgent
-from agents.precedent_agent import PrecedentMiningAgent
-from utils.privilege_protection import AttorneyClientPrivilege
-from utils.ethics_compliance import LegalEthicsManager
-from utils.rag_system import LegalRAGSystem
 
 class TestLegalAISystem(unittest.TestCase):
     """Test suite for Legal AI system components"""
@@ -28,211 +148,193 @@ class TestLegalAISystem(unittest.TestCase):
     @classmethod
     def setUpClass(cls):
         """Set up test environment"""
-        cls.test_db = "database/test_legal_data.db"
+        cls.test_db = "database/legal_data.db"
         cls.setup_test_database()
-
-        # Initialize agents
-        cls.research_agent = LegalResearchAgent()
-        cls.case_agent = CaseAnalysisAgent()
-        cls.document_agent = DocumentReviewAgent()
-        cls.precedent_agent = PrecedentMiningAgent()
-        cls.privilege_system = AttorneyClientPrivilege()
-        cls.ethics_manager = LegalEthicsManager()
-        cls.rag_system = LegalRAGSystem()
+        cls._rag_warmup = None
 
     @classmethod
-    def setup_test_database(cls):
-        """Set up test database with sample data"""
-        # Use main database for testing
-        pass
+    def tearDownClass(cls):
+        """Close the in-memory test database"""
+        cls._conn.close()
 
-    def test_legal_research_agent(self):
-        """Test legal research functionality"""
-        query = "breach of contract damages"
-        jurisdiction = "California"
-        attorney_id = "att_001"
+    def setUp(self):
+        """Start collecting this test's progress lines"""
+        self._logs = []
 
-        try:
-            results = self.research_agent.conduct_research(
-                query=query,
-                jurisdiction=jurisdiction,
-                attorney_id=attorney_id
-            )
+    def tearDown(self):
+        """Write the test's progress lines in a single call"""
+        if self._logs:
+            sys.stdout.write("\n".join(self._logs) + "\n")
 
-            self.assertIsInstance(results, dict)
-            self.assertIn("research_summary", results)
-            self.assertIn("relevant_cases", results)
-            self.assertIn("applicable_statutes", results)
-            print("✅ Legal Research Agent: PASSED")
+    def _log(self, message):
+        """Buffer a progress line until the test finishes"""
+        self._logs.append(message)
 
-        except Exception as e:
-            print(f"❌ Legal Research Agent: FAILED - {e}")
-            self.fail(f"Legal research failed: {e}")
+    @classmethod
+    def _start_rag_warmup(cls):
+        """Load the RAG system's embedding model and vector store in the background, once.
 
-    def test_case_analysis_agent(self):
-        """Test case analysis functionality"""
-        case_facts = "Contract dispute over software licensing agreement"
-        legal_issues = "Breach of contract, damages calculation"
-        client_context = {"client_id": "CLIENT_001", "privilege_level": "high"}
+        Only the contract-queries tests, test_rag_system among them, call this, so a run
+        that selects none of them never loads the RAG system.
+        """
+        if cls._rag_warmup is None:
+            cls._rag_warmup = threading.Thread(target=cls._warm_rag, name='rag-warmup', daemon=True)
+            cls._rag_warmup.start()
 
+    @classmethod
+    def _warm_rag(cls):
+        """Build the RAG system and run one search so the first real query skips the cold start"""
         try:
-            analysis = self.case_agent.analyze_case_merits(
-                case_facts=case_facts,
-                legal_issues=legal_issues,
-                client_context=client_context
-            )
+            cls._get_agent("rag").hybrid_legal_search(query="contract")
+        except Exception:
+            pass  # test_rag_system reports any failure itself
 
-            self.assertIsInstance(analysis, dict)
-            self.assertIn("case_strength", analysis)
-            self.assertIn("legal_strategy", analysis)
-            self.assertIn("risk_assessment", analysis)
-            print("✅ Case Analysis Agent: PASSED")
-
-        except Exception as e:
-            print(f"❌ Case Analysis Agent: FAILED - {e}")
-            self.fail(f"Case analysis failed: {e}")
-
-    def test_document_review_agent(self):
-        """Test document review functionality"""
-        document_text = "This Software License Agreement governs the use of proprietary software..."
-        document_type = "license"
-        attorney_id = "att_001"
+    @classmethod
+    def _get_agent(cls, name):
+        """Shared instance of a component, constructed on first use"""
+        return _build_component(name)
 
+    @classmethod
+    def setup_test_database(cls):
+        """Set up test database with sample data"""
+        # Snapshot the main database into memory: the database checks read RAM, not disk,
+        # and nothing they do can touch the shared file
+        source = sqlite3.connect(cls.test_db)
         try:
-            review = self.document_agent.review_document(
-                document_text=document_text,
-                document_type=document_type,
-                attorney_id=attorney_id
-            )
+            cls._conn = sqlite3.connect(':memory:', check_same_thread=False)
+            source.backup(cls._conn)
+        finally:
+            source.close()
+
+    def _check_agent(self, agent):
+        """Call an agent's primary method from its AGENT_CASES row and check the result's sections"""
+        label, method_name, kwargs, expected_keys, failure = AGENT_CASES[agent]
+        try:
+            result = getattr(self._get_agent(agent), method_name)(**kwargs)
 
-            self.assertIsInstance(review, dict)
-            self.assertIn("document_analysis", review)
-            self.assertIn("risk_factors", review)
-            self.assertIn("recommendations", review)
-            print("✅ Document Review Agent: PASSED")
+            self.assertIsInstance(result, dict)
+            for key in expected_keys:
+                self.assertIn(key, result)
+            self._log(f"✅ {label}: PASSED")
 
         except Exception as e:
-            print(f"❌ Document Review Agent: FAILED - {e}")
-            self.fail(f"Document review failed: {e}")
+            self._log(f"❌ {label}: FAILED - {e}")
+            self.fail(f"{failure} failed: {e}")
 
-    def test_precedent_mining_agent(self):
-        """Test precedent discovery functionality"""
-        legal_issue = "breach of contract damages"
-        jurisdiction = "Federal"
-        case_facts = "Software licensing dispute"
+    @CONTRACT_QUERIES
+    def test_legal_research_agent(self):
+        """Test legal research functionality"""
+        self._start_rag_warmup()
+        self._check_agent("research")
 
-        try:
-            precedents = self.precedent_agent.discover_relevant_precedents(
-                legal_issue=legal_issue,
-                jurisdiction=jurisdiction,
-                case_facts=case_facts
-            )
+    @CONTRACT_QUERIES
+    def test_case_analysis_agent(self):
+        """Test case analysis functionality"""
+        self._start_rag_warmup()
+        self._check_agent("case")
 
-            self.assertIsInstance(precedents, dict)
-            self.assertIn("relevant_precedents", precedents)
-            self.assertIn("binding_authority", precedents)
-            print("✅ Precedent Mining Agent: PASSED")
+    def test_document_review_agent(self):
+        """Test document review functionality"""
+        self._check_agent("document")
 
-        except Exception as e:
-            print(f"❌ Precedent Mining Agent: FAILED - {e}")
-            self.fail(f"Precedent discovery failed: {e}")
+    @CONTRACT_QUERIES
+    def test_precedent_mining_agent(self):
+        """Test precedent discovery functionality"""
+        self._start_rag_warmup()
+        self._check_agent("precedent")
 
     def test_privilege_protection(self):
         """Test attorney-client privilege protection"""
         attorney_id = "att_001"
         client_id = "CLIENT_001"
-        communication = {"type": "case_strategy", "content": "Confidential legal advice"}
 
         try:
             # Test privilege verification
-            has_privilege = self.privilege_system.verify_privilege_relationship(
+            has_privilege = self._get_agent("privilege").verify_privilege_relationship(
                 attorney_id, client_id
             )
             self.assertTrue(has_privilege)
 
             # Test communication storage
-            stored = self.privilege_system.store_privileged_communication(
+            stored = self._get_agent("privilege").store_privileged_communication(
                 attorney_id=attorney_id,
                 client_id=client_id,
-                communication=communication
+                communication=asdict(COMMUNICATION)
             )
             self.assertTrue(stored)
-            print("✅ Privilege Protection: PASSED")
+            self._log("✅ Privilege Protection: PASSED")
 
         except Exception as e:
-            print(f"❌ Privilege Protection: FAILED - {e}")
+            self._log(f"❌ Privilege Protection: FAILED - {e}")
             self.fail(f"Privilege protection failed: {e}")
 
     def test_ethics_compliance(self):
         """Test ethics compliance monitoring"""
         try:
             # Test compliance monitoring
-            compliance = self.ethics_manager.monitor_legal_ai_compliance()
+            compliance = self._get_agent("ethics").monitor_legal_ai_compliance()
             self.assertIsInstance(compliance, dict)
             self.assertIn("overall_compliance", compliance)
 
             # Test ethics alerts
-            alerts = self.ethics_manager.generate_ethics_alerts()
+            alerts = self._get_agent("ethics").generate_ethics_alerts()
             self.assertIsInstance(alerts, list)
-            print("✅ Ethics Compliance: PASSED")
+            self._log("✅ Ethics Compliance: PASSED")
 
         except Exception as e:
-            print(f"❌ Ethics Compliance: FAILED - {e}")
+            self._log(f"❌ Ethics Compliance: FAILED - {e}")
             self.fail(f"Ethics compliance failed: {e}")
 
+    @CONTRACT_QUERIES
     def test_rag_system(self):
         """Test RAG legal search system"""
         query = "contract breach remedies"
-        case_context = {"client_position": "plaintiff", "jurisdiction": "California"}
+
+        # The warm-up thread may still be building the RAG system
+        self._start_rag_warmup()
+        self._rag_warmup.join()
 
         try:
             # Test hybrid search
-            results = self.rag_system.hybrid_legal_search(
+            results = self._get_agent("rag").hybrid_legal_search(
                 query=query,
-                case_context=case_context
+                case_context=CASE_CONTEXT
             )
             self.assertIsInstance(results, dict)
             self.assertIn("cases", results)
             self.assertIn("statutes", results)
 
             # Test legal analysis generation
-            analysis = self.rag_system.generate_legal_analysis(
+            analysis = self._get_agent("rag").generate_legal_analysis(
                 results=results,
-                client_position=case_context.get("client_position", "")
+                client_position=CASE_CONTEXT.get("client_position", "")
             )
             self.assertIsInstance(analysis, dict)
-            print("✅ RAG System: PASSED")
+            self._log("✅ RAG System: PASSED")
 
         except Exception as e:
-            print(f"❌ RAG System: FAILED - {e}")
+            self._log(f"❌ RAG System: FAILED - {e}")
             self.fail(f"RAG system failed: {e}")
 
     def test_database_connectivity(self):
         """Test database connectivity and data integrity"""
         try:
-            conn = sqlite3.connect('database/legal_data.db')
-            cursor = conn.cursor()
-
-            # Test case law table
-            cursor.execute("SELECT COUNT(*) FROM case_law")
-            case_count = cursor.fetchone()[0]
-            self.assertGreater(case_count, 0)
+            # Check the case law, statutes and precedents tables are non-empty in one round trip;
+            # EXISTS stops at the first row where COUNT(*) would scan the whole table
+            has_cases, has_statutes, has_precedents = self._conn.execute("""
+                SELECT EXISTS(SELECT 1 FROM case_law),
+                       EXISTS(SELECT 1 FROM statutes),
+                       EXISTS(SELECT 1 FROM legal_precedents)
+            """).fetchone()
 
-            # Test statutes table
-            cursor.execute("SELECT COUNT(*) FROM statutes")
-            statute_count = cursor.fetchone()[0]
-            self.assertGreater(statute_count, 0)
+            self.assertTrue(has_cases)
+            self.assertTrue(has_statutes)
+            self.assertTrue(has_precedents)
 
-            # Test precedents table
-            cursor.execute("SELECT COUNT(*) FROM legal_precedents")
-            precedent_count = cursor.fetchone()[0]
-            self.assertGreater(precedent_count, 0)
-
-            conn.close()
-            print("✅ Database Connectivity: PASSED")
+            self._log("✅ Database Connectivity: PASSED")
 
         except Exception as e:
-            print(f"❌ Database Connectivity: FAILED - {e}")
+            self._log(f"❌ Database Connectivity: FAILED - {e}")
             self.fail(f"Database connectivity failed: {e}")
 
 def run_integration_tests():
@@ -251,21 +353,18 @@ def run_integration_tests():
         print("❌ Database not found. Run: python init_database.py")
         return False
 
-    # Run tests
-    suite = unittest.TestLoader().loadTestsFromTestCase(TestLegalAISystem)
-    runner = unittest.TextTestRunner(verbosity=2)
-    result = runner.run(suite)
+    # Run tests: they wait on Gemini, SQLite and the vector store rather than the CPU,
+    # so one pytest-xdist worker per test runs them side by side (grouped tests share a worker)
+    test_count = unittest.TestLoader().loadTestsFromTestCase(TestLegalAISystem).countTestCases()
+    exit_code = pytest.main(["-n", str(test_count), "--dist=loadgroup", "-v", __file__])
 
-    print("\n" + "=" * 50)
-    if result.wasSuccessful():
-        print("✅ All Legal AI System Tests PASSED!")
-        print("🚀 System ready for deployment")
-        return True
+    passed = exit_code == pytest.ExitCode.OK
+    if passed:
+        summary = ["✅ All Legal AI System Tests PASSED!", "🚀 System ready for deployment"]
     else:
-        print("❌ Some tests FAILED")
-        print(f"Failures: {len(result.failures)}")
-        print(f"Errors: {len(result.errors)}")
-        return False
+        summary = ["❌ Some tests FAILED", f"pytest exit code: {int(exit_code)}"]
+    print("\n" + "=" * 50 + "\n" + "\n".join(summary))
+    return passed
 
 if __name__ == "__main__":
     success = run_integration_tests()
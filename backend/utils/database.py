@@ -0,0 +1,132 @@
+import sqlite3
+import threading
+import atexit
+import functools
+from cachetools import Cache
+
+DEFAULT_DB_PATH = 'database/legal_data.db'
+
+# Applied once per connection: WAL keeps readers from blocking on writers,
+# the larger page cache and mmap let repeated SELECTs skip read() syscalls.
+CONNECTION_PRAGMAS = (
+    'PRAGMA journal_mode=WAL',
+    'PRAGMA synchronous=NORMAL',
+    'PRAGMA cache_size=-64000',
+    'PRAGMA mmap_size=268435456',
+    'PRAGMA temp_store=MEMORY',
+)
+
+_local = threading.local()
+
+
+def _optimize_and_close():
+    """At exit, let SQLite refresh planner statistics, then close the main thread's connections.
+
+    Worker threads' connections are closed when the thread's local storage is discarded.
+    """
+    connections = getattr(_local, 'connections', None) or {}
+    for conn in connections.values():
+        try:
+            conn.execute('PRAGMA optimize')
+            conn.close()
+        except sqlite3.Error:
+            pass
+    connections.clear()
+
+
+atexit.register(_optimize_and_close)
+
+
+def dict_row(cursor: sqlite3.Cursor, row: tuple) -> dict:
+    """Row factory building a column-name keyed dict directly from SQLite's row tuple"""
+    return {description[0]: value for description, value in zip(cursor.description, row)}
+
+
+def get_connection(db_path: str = DEFAULT_DB_PATH) -> sqlite3.Connection:
+    """Return this thread's persistent connection to db_path, opening and tuning it on first use.
+
+    SQLite connections must not be shared across threads, so each thread keeps its
+    own. Callers must not close the returned connection.
+    """
+    connections = getattr(_local, 'connections', None)
+    if connections is None:
+        connections = _local.connections = {}
+
+    conn = connections.get(db_path)
+    if conn is None:
+        conn = sqlite3.connect(db_path)
+        for pragma in CONNECTION_PRAGMAS:
+            conn.execute(pragma)
+        connections[db_path] = conn
+
+    return conn
+
+
+# Read-only handles skip the WAL setup (a writer owns that) and refuse writes outright
+READONLY_PRAGMAS = (
+    'PRAGMA query_only=ON',
+    'PRAGMA cache_size=-64000',
+    'PRAGMA mmap_size=268435456',
+)
+
+
+def get_readonly_connection(db_path: str = DEFAULT_DB_PATH) -> sqlite3.Connection:
+    """Return this thread's persistent read-only connection to db_path for lookup helpers.
+
+    Opened with mode=ro, so SQLite never takes a write lock and, under WAL, readers
+    never contend with the writer connection. Callers must not close it.
+    """
+    connections = getattr(_local, 'readonly_connections', None)
+    if connections is None:
+        connections = _local.readonly_connections = {}
+
+    conn = connections.get(db_path)
+    if conn is None:
+        conn = sqlite3.connect(f'file:{db_path}?mode=ro', uri=True)
+        for pragma in READONLY_PRAGMAS:
+            conn.execute(pragma)
+        connections[db_path] = conn
+
+    return conn
+
+# Bumped by anything that writes case_law, statutes or legal_precedents, so memoized
+# lookups over those tables are never served across a knowledge-base change.
+_knowledge_version = 0
+
+
+def knowledge_version() -> int:
+    """Current knowledge-base version used to key cached lookups"""
+    return _knowledge_version
+
+
+def bump_knowledge_version():
+    """Invalidate every cached knowledge-base lookup after an ingestion write"""
+    global _knowledge_version
+    _knowledge_version += 1
+
+
+def cached_lookup(cache: Cache):
+    """Memoize a read-only lookup method in cache, keyed by its arguments and the knowledge version.
+
+    The instance is left out of the key, so agents share results. Cached lists are
+    returned as-is and must not be mutated by callers.
+    """
+    lock = threading.Lock()
+
+    def decorator(method):
+        @functools.wraps(method)
+        def wrapper(self, *args, **kwargs):
+            key = (method.__name__, knowledge_version(), args, tuple(sorted(kwargs.items())))
+            with lock:
+                if key in cache:
+                    return cache[key]
+
+            result = method(self, *args, **kwargs)
+            with lock:
+                cache[key] = result
+            return result
+
+        wrapper.cache = cache
+        return wrapper
+
+    return decorator
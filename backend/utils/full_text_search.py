@@ -0,0 +1,100 @@
+import sqlite3
+import re
+from typing import Iterable, Optional
+
+from utils.database import bump_knowledge_version
+
+# External-content FTS5 indexes over the knowledge base tables. The column sets
+# are supersets of what any single agent searches; callers narrow them with
+# column filters in the MATCH expression.
+FTS_TABLES = {
+    'case_law_fts': ('case_law', ('case_name', 'legal_issues', 'holding', 'citation')),
+    'statutes_fts': ('statutes', ('statute_title', 'statute_text', 'legal_area')),
+    'legal_precedents_fts': ('legal_precedents', ('legal_principle', 'related_statutes')),
+    'contracts_fts': ('contracts', ('contract_type', 'contract_name', 'standard_clauses', 'risk_factors')),
+}
+
+# Porter stemming lets plural and inflected forms match ("patent" finds "patents");
+# indexes built before this tokenizer are rebuilt by ensure_fts_tables
+FTS_TOKENIZER = 'porter unicode61'
+
+# Terms at least this long are also matched as prefixes, recovering most of the
+# substring recall the old LIKE '%term%' searches had
+PREFIX_MIN_LENGTH = 3
+
+_TOKEN_RE = re.compile(r'\w+')
+
+_STOP_WORDS = frozenset({'a', 'an', 'and', 'or', 'not', 'of', 'the', 'in', 'on', 'at', 'for', 'to', 'with', 'by', 'v', 'vs'})
+
+
+def _fts_table_sql(fts_table: str, content_table: str, columns: Iterable[str]) -> str:
+    """DDL for one external-content FTS5 table plus the triggers keeping it in sync"""
+    cols = ', '.join(columns)
+    new_cols = ', '.join(f'new.{c}' for c in columns)
+    old_cols = ', '.join(f'old.{c}' for c in columns)
+
+    return f"""
+        CREATE VIRTUAL TABLE IF NOT EXISTS {fts_table}
+            USING fts5({cols}, content='{content_table}', content_rowid='rowid', tokenize='{FTS_TOKENIZER}');
+
+        CREATE TRIGGER IF NOT EXISTS {fts_table}_ai AFTER INSERT ON {content_table} BEGIN
+            INSERT INTO {fts_table}(rowid, {cols}) VALUES (new.rowid, {new_cols});
+        END;
+
+        CREATE TRIGGER IF NOT EXISTS {fts_table}_ad AFTER DELETE ON {content_table} BEGIN
+            INSERT INTO {fts_table}({fts_table}, rowid, {cols}) VALUES ('delete', old.rowid, {old_cols});
+        END;
+
+        CREATE TRIGGER IF NOT EXISTS {fts_table}_au AFTER UPDATE OF {cols} ON {content_table} BEGIN
+            INSERT INTO {fts_table}({fts_table}, rowid, {cols}) VALUES ('delete', old.rowid, {old_cols});
+            INSERT INTO {fts_table}(rowid, {cols}) VALUES (new.rowid, {new_cols});
+        END;
+    """
+
+
+def ensure_fts_tables(conn: sqlite3.Connection):
+    """Create missing FTS5 indexes, rebuild ones made with an older tokenizer, and backfill them"""
+    cursor = conn.cursor()
+    cursor.execute("SELECT name, sql FROM sqlite_master WHERE type = 'table' AND name LIKE '%_fts'")
+    existing = dict(cursor.fetchall())
+
+    changed = False
+    for fts_table, (content_table, columns) in FTS_TABLES.items():
+        if fts_table in existing:
+            if f"tokenize='{FTS_TOKENIZER}'" in (existing[fts_table] or ''):
+                continue
+            # Made before stemming was enabled: drop the index and its sync triggers, then rebuild
+            conn.executescript(f"""
+                DROP TRIGGER IF EXISTS {fts_table}_ai;
+                DROP TRIGGER IF EXISTS {fts_table}_ad;
+                DROP TRIGGER IF EXISTS {fts_table}_au;
+                DROP TABLE {fts_table};
+            """)
+
+        conn.executescript(_fts_table_sql(fts_table, content_table, columns))
+        conn.execute(f"INSERT INTO {fts_table}({fts_table}) VALUES ('rebuild')")
+        changed = True
+
+    conn.commit()
+    if changed:
+        # Lookups memoized against the old index must not be served any more
+        bump_knowledge_version()
+
+
+def build_match_query(text: str, columns: Iterable[str] = None, any_term: bool = False) -> Optional[str]:
+    """Turn free text into an FTS5 MATCH expression requiring every significant term.
+
+    Terms of PREFIX_MIN_LENGTH or more also match as prefixes. With any_term, a row
+    matching at least one of the terms qualifies instead. Returns None when the text
+    has no searchable terms.
+    """
+    terms = [t for t in _TOKEN_RE.findall((text or '').lower()) if t not in _STOP_WORDS]
+    if not terms:
+        return None
+
+    expression = (' OR ' if any_term else ' ').join(
+        f'"{t}"*' if len(t) >= PREFIX_MIN_LENGTH else f'"{t}"' for t in dict.fromkeys(terms)
+    )
+    if columns:
+        return '{' + ' '.join(columns) + '} : (' + expression + ')'
+    return expression
@@ -0,0 +1,163 @@
+import hashlib
+import threading
+import time
+from typing import Callable, List, Optional
+import numpy as np
+from cachetools import LRUCache
+
+from utils.database import DEFAULT_DB_PATH, get_connection
+
+# Expired entries are deleted by put() at most this often per cache instance
+PURGE_INTERVAL_SECONDS = 3600
+
+
+class SemanticResponseCache:
+    """SQLite-backed cache of LLM responses with exact and semantic (embedding) lookup"""
+
+    def __init__(self, embed_fn: Callable[[str], List[float]] = None, prompt_version: str = "v1",
+                 similarity_threshold: float = 0.92, ttl_seconds: int = 7 * 24 * 3600,
+                 scan_limit: int = 500, db_path: str = DEFAULT_DB_PATH):
+        self.embed_fn = embed_fn
+        self.prompt_version = prompt_version
+        self.similarity_threshold = similarity_threshold
+        self.ttl_seconds = ttl_seconds
+        self.scan_limit = scan_limit
+        self.db_path = db_path
+        self._table_ready = False
+        self._last_purge = 0.0
+
+        # Embeddings computed by a missed get(), handed to the put() that follows it
+        self._pending_embeddings = LRUCache(maxsize=256)
+        self._pending_lock = threading.Lock()
+
+    def get_db_connection(self):
+        """Get this thread's persistent database connection (do not close)"""
+        return get_connection(self.db_path)
+
+    def _ensure_table(self):
+        """Create the cache table and its indexes if missing"""
+        if self._table_ready:
+            return
+
+        conn = self.get_db_connection()
+        conn.executescript("""
+            CREATE TABLE IF NOT EXISTS llm_cache (
+                input_hash TEXT NOT NULL,
+                prompt_version TEXT NOT NULL,
+                embedding BLOB,
+                response TEXT NOT NULL,
+                created_at REAL NOT NULL,
+                expires_at REAL NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS idx_llm_cache_version ON llm_cache(prompt_version);
+        """)
+
+        # One row per prompt and version: tables written before the unique index may hold
+        # duplicates from concurrent misses, so keep only the newest of each before adding it
+        has_unique = conn.execute(
+            "SELECT 1 FROM sqlite_master WHERE type = 'index' AND name = 'idx_llm_cache_key'"
+        ).fetchone()
+        if not has_unique:
+            conn.executescript("""
+                DELETE FROM llm_cache WHERE rowid NOT IN (
+                    SELECT MAX(rowid) FROM llm_cache GROUP BY input_hash, prompt_version
+                );
+                DROP INDEX IF EXISTS idx_llm_cache_hash;
+                CREATE UNIQUE INDEX IF NOT EXISTS idx_llm_cache_key ON llm_cache(input_hash, prompt_version);
+            """)
+        conn.commit()
+        self._table_ready = True
+
+    @staticmethod
+    def hash_prompt(prompt: str) -> str:
+        """Stable key for exact-match lookups"""
+        return hashlib.sha256(prompt.encode('utf-8')).hexdigest()
+
+    def _embed(self, prompt: str) -> Optional[np.ndarray]:
+        """Embed and L2-normalize a prompt, or None when no embedder is configured or embedding fails"""
+        if not self.embed_fn:
+            return None
+
+        try:
+            vector = np.asarray(self.embed_fn(prompt), dtype=np.float32)
+        except Exception:
+            # Embeddings unavailable: exact-hash caching still works without them
+            return None
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm > 0 else vector
+
+    def get_by_hash(self, input_hash: str) -> Optional[str]:
+        """Return an unexpired response stored for exactly this prompt hash"""
+        self._ensure_table()
+        conn = self.get_db_connection()
+        row = conn.execute("""
+            SELECT response FROM llm_cache
+            WHERE input_hash = ? AND prompt_version = ? AND expires_at > ?
+            LIMIT 1
+        """, (input_hash, self.prompt_version, time.time())).fetchone()
+        return row[0] if row else None
+
+    def get(self, prompt: str) -> Optional[str]:
+        """Return a cached response for an identical or semantically similar prompt"""
+        # Exact hit avoids the embedding call entirely
+        input_hash = self.hash_prompt(prompt)
+        cached = self.get_by_hash(input_hash)
+        if cached is not None or not self.embed_fn:
+            return cached
+
+        now = time.time()
+        rows = self.get_db_connection().execute("""
+            SELECT embedding, response FROM llm_cache
+            WHERE prompt_version = ? AND expires_at > ? AND embedding IS NOT NULL
+            ORDER BY created_at DESC
+            LIMIT ?
+        """, (self.prompt_version, now, self.scan_limit)).fetchall()
+
+        if not rows:
+            return None
+
+        query = self._embed(prompt)
+        if query is None:
+            return None
+
+        # The put() after this miss reuses the vector instead of embedding the prompt again
+        with self._pending_lock:
+            self._pending_embeddings[input_hash] = query
+
+        candidates = [row for row in rows if len(row[0]) == query.nbytes]
+        if not candidates:
+            return None
+
+        matrix = np.stack([np.frombuffer(row[0], dtype=np.float32) for row in candidates])
+        similarities = matrix @ query
+        best = int(np.argmax(similarities))
+
+        return candidates[best][1] if similarities[best] >= self.similarity_threshold else None
+
+    def put(self, prompt: str, response: str):
+        """Store a model response for later reuse; without an embedding it is still served by exact hash"""
+        self._ensure_table()
+        input_hash = self.hash_prompt(prompt)
+        with self._pending_lock:
+            embedding = self._pending_embeddings.pop(input_hash, None)
+        if embedding is None:
+            embedding = self._embed(prompt)
+        now = time.time()
+
+        conn = self.get_db_connection()
+        if now - self._last_purge >= PURGE_INTERVAL_SECONDS:
+            conn.execute("DELETE FROM llm_cache WHERE expires_at <= ?", (now,))
+            self._last_purge = now
+
+        conn.execute("""
+            INSERT OR REPLACE INTO llm_cache (input_hash, prompt_version, embedding, response, created_at, expires_at)
+            VALUES (?, ?, ?, ?, ?, ?)
+        """, (
+            input_hash,
+            self.prompt_version,
+            embedding.tobytes() if embedding is not None else None,
+            response,
+            now,
+            now + self.ttl_seconds
+        ))
+        conn.commit()
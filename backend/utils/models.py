@@ -0,0 +1,62 @@
+import google.generativeai as genai
+import os
+import threading
+from typing import Dict, Optional
+
+# Flash answers the enumerated legal prompts much faster than gemini-pro and, unlike the
+# Gemini 1.0 models, accepts response_mime_type/response_schema for structured output
+GEMINI_MODEL = os.getenv('GEMINI_MODEL', 'gemini-1.5-flash')
+
+# Default output budget per call; latency grows with output length. Multi-section and
+# batched calls raise it per request through their generation_config.
+MAX_OUTPUT_TOKENS = int(os.getenv('GEMINI_MAX_OUTPUT_TOKENS', '1024'))
+
+# Models that reject JSON mode and response schemas
+_NO_JSON_MODE_MODELS = ('gemini-pro', 'gemini-1.0')
+SENTENCE_MODEL = 'all-MiniLM-L6-v2'
+
+# Process-wide model instances shared by every agent and the RAG system
+_GEMINI = None
+_SENTENCE_MODEL = None
+_LOCK = threading.Lock()
+
+
+def shared_model():
+    """Configure Gemini and build the generative model once per process"""
+    global _GEMINI
+    if _GEMINI is None:
+        with _LOCK:
+            if _GEMINI is None:
+                genai.configure(api_key=os.getenv('GEMINI_API_KEY'))
+                _GEMINI = genai.GenerativeModel(
+                    GEMINI_MODEL, generation_config={'max_output_tokens': MAX_OUTPUT_TOKENS}
+                )
+    return _GEMINI
+
+
+def supports_json_mode(model_name: str = GEMINI_MODEL) -> bool:
+    """Whether the model accepts response_mime_type='application/json' with a response_schema"""
+    name = model_name.split('/')[-1]
+    return not name.startswith(_NO_JSON_MODE_MODELS)
+
+
+def json_config(schema: Dict, max_output_tokens: int = None) -> Optional[Dict]:
+    """Generation config requesting JSON matching schema, or None when the model has no JSON mode"""
+    if not supports_json_mode():
+        return None
+
+    config = {'response_mime_type': 'application/json', 'response_schema': schema}
+    if max_output_tokens:
+        config['max_output_tokens'] = max_output_tokens
+    return config
+
+
+def sentence_model():
+    """Load the local sentence embedding model on first use; it is only kept in memory once"""
+    global _SENTENCE_MODEL
+    if _SENTENCE_MODEL is None:
+        with _LOCK:
+            if _SENTENCE_MODEL is None:
+                from sentence_transformers import SentenceTransformer
+                _SENTENCE_MODEL = SentenceTransformer(SENTENCE_MODEL)
+    return _SENTENCE_MODEL
@@ -10,6 +10,8 @@ import json
 import hashlib
 import secrets
 
+from utils.database import dict_row, get_readonly_connection
+
 class AttorneyClientPrivilege:
     """Attorney-Client Privilege Protection and Management System"""
 
@@ -56,19 +58,19 @@ class AttorneyClientPrivilege:
 
     def verify_privilege_relationship(self, attorney_id: str, client_id: str) -> bool:
         """Verify valid attorney-client relationship exists"""
-        conn = self.get_db_connection()
-        cursor = conn.cursor()
+        # Runs before every privileged read and write: a read-only per-thread connection and an
+        # EXISTS probe of the (attorney_id, client_id, case_status) index, never a fresh connect
+        conn = get_readonly_connection()
 
         # Check if attorney-client relationship exists and is active
-        cursor.execute("""
-            SELECT COUNT(*) FROM client_cases
-            WHERE attorney_id = ? AND client_id = ? AND case_status = 'Active'
-        """, (attorney_id, client_id))
-
-        result = cursor.fetchone()
-        conn.close()
+        result = conn.execute("""
+            SELECT EXISTS(
+                SELECT 1 FROM client_cases
+                WHERE attorney_id = ? AND client_id = ? AND case_status = 'Active'
+            )
+        """, (attorney_id, client_id)).fetchone()
 
-        return result[0] > 0 if result else False
+        return bool(result and result[0])
 
     def create_privilege_relationship(self, attorney_id: str, client_id: str, case_id: str, privilege_scope: str = "FULL") -> Dict:
         """Create new attorney-client privilege relationship"""
@@ -416,6 +418,7 @@ class AttorneyClientPrivilege:
         try:
             conn = self.get_db_connection()
             cursor = conn.cursor()
+            cursor.row_factory = dict_row
 
             # Build audit query
             query = "SELECT * FROM ethics_audit_log WHERE 1=1"
@@ -443,8 +446,7 @@ class AttorneyClientPrivilege:
             audit_entries = []
             action_summary = {}
 
-            for row in results:
-                entry = dict(zip([col[0] for col in cursor.description], row))
+            for entry in results:
                 audit_entries.append(entry)
 
                 action_type = entry.get('action_type', 'UNKNOWN')
@@ -1,29 +1,23 @@
-import google.generativeai as genai
 import sqlite3
-import os
 from datetime import datetime
 from typing import Dict, List, Optional, Tuple, Any
 import json
 import numpy as np
-from sentence_transformers import SentenceTransformer
 import chromadb
 from chromadb.config import Settings
 
+from utils.database import dict_row
+from utils.models import shared_model, sentence_model
+
 class LegalRAGSystem:
     """RAG (Retrieval-Augmented Generation) system for legal documents"""
 
     def __init__(self):
-        # Configure Gemini AI
-        genai.configure(api_key=os.getenv('GEMINI_API_KEY'))
-        self.model = genai.GenerativeModel('gemini-pro')
+        # Process-wide Gemini model shared with the agents
+        self.model = shared_model()
 
-        # Initialize embedding model for legal text
-        try:
-            # Try to use legal-specific embedding model if available
-            self.embedding_model = SentenceTransformer('all-MiniLM-L6-v2')  # Fallback to general model
-        except:
-            # Use a smaller model if resources are limited
-            self.embedding_model = SentenceTransformer('all-MiniLM-L6-v2')
+        # Embedding model for legal text, one copy shared with the research agent
+        self.embedding_model = sentence_model()
 
         # Initialize vector database (ChromaDB)
         self.chroma_client = chromadb.Client(Settings(
@@ -363,6 +357,7 @@ class LegalRAGSystem:
         """Perform traditional keyword search in SQLite database"""
         conn = self.get_db_connection()
         cursor = conn.cursor()
+        cursor.row_factory = dict_row
 
         keyword_results = {}
 
@@ -375,10 +370,7 @@ class LegalRAGSystem:
             LIMIT ?
         """, (f"%{query}%", f"%{query}%", f"%{query}%", limit))
 
-        keyword_results['case_law'] = [
-            dict(zip([col[0] for col in cursor.description], row))
-            for row in cursor.fetchall()
-        ]
+        keyword_results['case_law'] = cursor.fetchall()
 
         # Search statutes
         cursor.execute("""
@@ -388,10 +380,7 @@ class LegalRAGSystem:
             LIMIT ?
         """, (f"%{query}%", f"%{query}%", f"%{query}%", limit))
 
-        keyword_results['statutes'] = [
-            dict(zip([col[0] for col in cursor.description], row))
-            for row in cursor.fetchall()
-        ]
+        keyword_results['statutes'] = cursor.fetchall()
 
         conn.close()
         return keyword_results
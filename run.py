@@ -15,7 +15,9 @@ def check_dependencies():
     print("🔍 Checking dependencies...")
 
     try:
-        import flask
+        import quart
+        import quart_cors
+        import hypercorn
         import google.generativeai
         import sqlite3
         print("✅ Backend dependencies OK")
@@ -88,12 +90,12 @@ SECRET_KEY=your_secret_key_here
     return True
 
 def start_backend():
-    """Start Flask backend server"""
+    """Start Quart backend server"""
     print("🚀 Starting legal AI backend...")
 
     try:
         os.chdir("backend")
-        # Start Flask server in background
+        # Start Quart server in background
         process = subprocess.Popen([sys.executable, "app.py"],
                                  stdout=subprocess.PIPE,
                                  stderr=subprocess.PIPE)